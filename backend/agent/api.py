@@ -13,6 +13,7 @@ import tempfile
 import os
 
 from agentpress.thread_manager import ThreadManager
+from agentpress import latest_messages
 from services.supabase import DBConnection
 from services import redis
 from utils.auth_utils import get_current_user_id_from_jwt, get_user_id_from_stream_auth, verify_thread_access, verify_admin_api_key
@@ -26,6 +27,7 @@ from utils.constants import MODEL_NAME_ALIASES
 from flags.flags import is_enabled
 
 from .config_helper import extract_agent_config, build_unified_config
+from .config_snapshot import get_agent_config_snapshot, invalidate_agent_config
 from .utils import check_agent_run_limit
 from .versioning.version_service import get_version_service
 from .versioning.api import router as version_router, initialize as initialize_versioning
@@ -429,24 +431,11 @@ async def start_agent(
                     effective_agent_id = None
             else:
                 agent_data = agent_result.data[0]
-                version_data = None
-                if agent_data.get('current_version_id'):
-                    try:
-                        version_service = await _get_version_service()
-                        version_obj = await version_service.get_version(
-                            agent_id=effective_agent_id,
-                            version_id=agent_data['current_version_id'],
-                            user_id=user_id
-                        )
-                        version_data = version_obj.to_dict()
-                        logger.debug(f"[AGENT LOAD] Got version data from version manager: {version_data.get('version_name')}")
-                    except Exception as e:
-                        logger.warning(f"[AGENT LOAD] Failed to get version data: {e}")
-                
-                logger.debug(f"[AGENT LOAD] About to call extract_agent_config with agent_data keys: {list(agent_data.keys())}")
-                logger.debug(f"[AGENT LOAD] version_data type: {type(version_data)}, has data: {version_data is not None}")
-                
-                agent_config = await extract_agent_config(agent_data, version_data)
+                agent_config = await get_agent_config_snapshot(effective_agent_id, agent_data=agent_data)
+                version_data = agent_config if agent_config and agent_data.get('current_version_id') else None
+                if not agent_config:
+                    logger.warning(f"[AGENT LOAD] Failed to get version data for agent {effective_agent_id}")
+                    agent_config = await extract_agent_config(agent_data, None)
             
             if version_data:
                 logger.debug(f"Using agent {agent_config['name']} ({effective_agent_id}) version {agent_config.get('version_name', 'v1')}")
@@ -464,24 +453,11 @@ async def start_agent(
         if default_agent_result.data:
             agent_data = default_agent_result.data[0]
             
-            # Use versioning system to get current version
-            version_data = None
-            if agent_data.get('current_version_id'):
-                try:
-                    version_service = await _get_version_service()
-                    version_obj = await version_service.get_version(
-                        agent_id=agent_data['agent_id'],
-                        version_id=agent_data['current_version_id'],
-                        user_id=user_id
-                    )
-                    version_data = version_obj.to_dict()
-                    logger.debug(f"[AGENT LOAD] Got default agent version from version manager: {version_data.get('version_name')}")
-                except Exception as e:
-                    logger.warning(f"[AGENT LOAD] Failed to get default agent version data: {e}")
-            
-            logger.debug(f"[AGENT LOAD] About to call extract_agent_config for DEFAULT agent with version data: {version_data is not None}")
-            
-            agent_config = await extract_agent_config(agent_data, version_data)
+            agent_config = await get_agent_config_snapshot(agent_data['agent_id'], agent_data=agent_data)
+            version_data = agent_config if agent_config and agent_data.get('current_version_id') else None
+            if not agent_config:
+                logger.warning(f"[AGENT LOAD] Failed to get default agent version data")
+                agent_config = await extract_agent_config(agent_data, None)
             
             if version_data:
                 logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config.get('version_name', 'v1')}")
@@ -1366,11 +1342,13 @@ async def initiate_agent_with_files(
         # 5. Add initial user message to thread
         message_id = str(uuid.uuid4())
         message_payload = {"role": "user", "content": message_content}
-        await client.table('messages').insert({
+        message_result = await client.table('messages').insert({
             "message_id": message_id, "thread_id": thread_id, "type": "user",
             "is_llm_message": True, "content": json.dumps(message_payload),
             "created_at": datetime.now(timezone.utc).isoformat()
         }).execute()
+        if message_result.data:
+            await latest_messages.record_message(thread_id, message_result.data[0])
 
 
         effective_model = model_name
@@ -2481,6 +2459,7 @@ async def update_agent(
                         'current_version_id': version_id,
                         'version_count': 1
                     }).eq('agent_id', agent_id).execute()
+                    await invalidate_agent_config(agent_id)
                     current_version_data = initial_version_data
                     logger.debug(f"Created initial version for agent {agent_id}")
                 else:
@@ -2599,6 +2578,7 @@ async def update_agent(
                 
                 if not update_result.data:
                     raise HTTPException(status_code=500, detail="Failed to update agent - no rows affected")
+                await invalidate_agent_config(agent_id)
             except Exception as e:
                 logger.error(f"Error updating agent {agent_id}: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Failed to update agent: {str(e)}")
@@ -3632,6 +3612,7 @@ async def add_message_to_thread(
               "content": message
             }
         }).execute()
+        await latest_messages.record_message(thread_id, message_result.data[0])
         return message_result.data[0]
     except Exception as e:
         logger.error(f"Error adding message to thread {thread_id}: {str(e)}")
@@ -3670,6 +3651,7 @@ async def create_message(
         if not message_result.data:
             raise HTTPException(status_code=500, detail="Failed to create message")
         
+        await latest_messages.record_message(thread_id, message_result.data[0])
         logger.debug(f"Created message: {message_result.data[0]['message_id']}")
         return message_result.data[0]
         
@@ -3693,6 +3675,7 @@ async def delete_message(
     try:
         # Don't allow users to delete the "status" messages
         await client.table('messages').delete().eq('message_id', message_id).eq('is_llm_message', True).eq('thread_id', thread_id).execute()
+        await latest_messages.invalidate(thread_id)
         return {"message": "Message deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting message {message_id} from thread {thread_id}: {str(e)}")
@@ -0,0 +1,100 @@
+"""
+Versioned agent config snapshots.
+
+The resolved run config of an agent (``extract_agent_config`` over the agent
+row and its current version) is cached under ``(agent_id, version_id)``.
+Version content is immutable, so a snapshot only goes stale when the agent
+row itself is edited or a different version becomes current; both paths call
+``invalidate_agent_config``. The agent -> current version pointer is cached
+separately so trigger fires resolve a config without touching the database.
+"""
+
+import copy
+from typing import Any, Dict, Optional
+
+from services.supabase import DBConnection
+from utils.cache import Cache
+from utils.logger import logger
+
+from .config_helper import extract_agent_config
+
+SNAPSHOT_TTL = 60 * 60
+CURRENT_VERSION_TTL = 10 * 60
+
+
+def _snapshot_key(agent_id: str, version_id: Optional[str]) -> str:
+    return f"agent_config_snapshot:{agent_id}:{version_id or 'none'}"
+
+
+def _pointer_key(agent_id: str) -> str:
+    return f"agent_current_version:{agent_id}"
+
+
+async def _load_agent_row(agent_id: str) -> Optional[Dict[str, Any]]:
+    client = await DBConnection().client
+    result = await client.table('agents').select('*').eq('agent_id', agent_id).execute()
+    return result.data[0] if result.data else None
+
+
+async def get_current_version_id(agent_id: str) -> Optional[Dict[str, Any]]:
+    """Return ``{"version_id": ..., "account_id": ...}`` for the agent, or None if it doesn't exist."""
+    async def load():
+        row = await _load_agent_row(agent_id)
+        if not row:
+            return None
+        return {"version_id": row.get('current_version_id'), "account_id": row.get('account_id')}
+
+    return await Cache.get_or_load(_pointer_key(agent_id), load, ttl=CURRENT_VERSION_TTL)
+
+
+async def get_agent_config_snapshot(
+    agent_id: str,
+    version_id: Optional[str] = None,
+    agent_data: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Resolved run config for ``agent_id`` at ``version_id`` (current version by default).
+
+    ``agent_data`` is the already-fetched agent row, if the caller has one; it is
+    only used to build the snapshot on a miss. Returns a private copy.
+    """
+    if version_id is None and agent_data is not None:
+        version_id = agent_data.get('current_version_id')
+    elif version_id is None:
+        pointer = await get_current_version_id(agent_id)
+        if not pointer:
+            return None
+        version_id = pointer.get('version_id')
+
+    async def load():
+        row = agent_data or await _load_agent_row(agent_id)
+        if not row:
+            return None
+        version_data = None
+        if version_id:
+            try:
+                from agent.versioning.version_service import get_version_service
+                version_service = await get_version_service()
+                version = await version_service.get_version(agent_id, version_id, "system")
+                version_data = version.to_dict()
+            except Exception as e:
+                logger.warning(f"Failed to load version {version_id} for agent {agent_id} snapshot: {e}")
+                return None
+        return await extract_agent_config(row, version_data)
+
+    snapshot = await Cache.get_or_load(_snapshot_key(agent_id, version_id), load, ttl=SNAPSHOT_TTL)
+    return copy.deepcopy(snapshot) if snapshot is not None else None
+
+
+async def invalidate_agent_config(agent_id: str, version_id: Optional[str] = None):
+    """Drop the current-version pointer and the snapshot(s) built from the agent row."""
+    try:
+        version_ids = {version_id}
+        pointer = await Cache.get(_pointer_key(agent_id))
+        if pointer:
+            version_ids.add(pointer.get('version_id'))
+        await Cache.invalidate(_pointer_key(agent_id))
+        for vid in version_ids:
+            await Cache.invalidate(_snapshot_key(agent_id, vid))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate agent config snapshot for {agent_id}: {e}")
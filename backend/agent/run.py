@@ -1,9 +1,9 @@
 import os
 import json
+import time
 import asyncio
 import datetime
-import jwt
-from typing import Optional, Dict, List, Any, AsyncGenerator
+from typing import Optional, Dict, List, Any, AsyncGenerator, Awaitable, Callable, Tuple
 from dataclasses import dataclass
 
 from agent.tools.message_tool import MessageTool
@@ -15,6 +15,7 @@ from utils.config import config
 from agent.agent_builder_prompt import get_agent_builder_prompt
 from agentpress.thread_manager import ThreadManager
 from agentpress.response_processor import ProcessorConfig
+from agentpress import latest_messages
 from agent.tools.sb_shell_tool import SandboxShellTool
 from agent.tools.sb_files_tool import SandboxFilesTool
 from agent.tools.data_providers_tool import DataProvidersTool
@@ -23,23 +24,29 @@ from agent.prompt import get_system_prompt
 
 from utils.logger import logger
 from utils.auth_utils import get_account_id_from_thread, _get_user_id_from_account_cached
+from utils.jwt_verifier import create_user_jwt
 from services.billing import check_billing_status
 from agent.tools.sb_vision_tool import SandboxVisionTool
 from agent.tools.sb_image_edit_tool import SandboxImageEditTool
 from agent.tools.sb_presentation_outline_tool import SandboxPresentationOutlineTool
 from agent.tools.sb_presentation_tool_v2 import SandboxPresentationToolV2
 from services.langfuse import langfuse
+from services.image_variants import image_variants, preset_for_model
 from langfuse.client import StatefulTraceClient
 
 from agent.tools.mcp_tool_wrapper import MCPToolWrapper
 from agent.tools.task_list_tool import TaskListTool
 from agentpress.tool import SchemaType
+from agentpress.prompt_cache import build_system_message
+from knowledge_base.retrieval import retrieve_context
+from flags.flags import is_enabled
 from agent.tools.sb_sheets_tool import SandboxSheetsTool
 from agent.tools.sb_web_dev_tool import SandboxWebDevTool
 from agent.tools.youtube_complete_mcp_tool import YouTubeTool
 from agent.tools.twitter_complete_mcp_tool import TwitterTool
 from agent.tools.instagram_complete_mcp_tool import InstagramTool
 from agent.tools.pinterest_complete_mcp_tool import PinterestTool
+from agent.social_accounts import AgentSocialAccounts
 
 load_dotenv()
 
@@ -69,6 +76,7 @@ class ToolManager:
         self.user_id = user_id
         self.agent_id = agent_id
         self.agent_config = agent_config
+        self.social_accounts = AgentSocialAccounts(user_id, agent_id)
     
     async def register_all_tools(self, agent_id: Optional[str] = None, disabled_tools: Optional[List[str]] = None):
         """Register all available tools by default, with optional exclusions.
@@ -124,7 +132,7 @@ class ToolManager:
         self.thread_manager.add_tool(TaskListTool, project_id=self.project_id, thread_manager=self.thread_manager, thread_id=self.thread_id)
     
     def _register_sandbox_tools(self, disabled_tools: List[str]):
-        """Register sandbox-related tools."""
+        """Register sandbox-related tools (instantiated on first use)."""
         sandbox_tools = [
             ('sb_shell_tool', SandboxShellTool, {'project_id': self.project_id, 'thread_manager': self.thread_manager}),
             ('sb_files_tool', SandboxFilesTool, {'project_id': self.project_id, 'thread_manager': self.thread_manager}),
@@ -141,13 +149,43 @@ class ToolManager:
         
         for tool_name, tool_class, kwargs in sandbox_tools:
             if tool_name not in disabled_tools:
-                self.thread_manager.add_tool(tool_class, **kwargs)
+                self.thread_manager.add_lazy_tool(tool_class, **kwargs)
                 logger.debug(f"Registered {tool_name}")
     
+    def _create_tool_jwt(self) -> Optional[str]:
+        """JWT the social media tools use for their backend API calls."""
+        return create_user_jwt(self.user_id)
+    
+    def _register_social_tool(self, tool_class, platform: str):
+        """Register a social media tool; its account lookup runs when the tool is first called."""
+        async def build_tool():
+            # Pre-computed accounts from agent config take precedence over a lookup
+            if self.agent_config and f'{platform}_accounts' in self.agent_config:
+                account_metadata = self.agent_config[f'{platform}_accounts']
+                logger.info(f"Using pre-computed {platform} accounts from agent config: {len(account_metadata)} accounts for agent {self.agent_id}")
+            else:
+                account_metadata = await self.social_accounts.get(platform)
+            
+            # Store account metadata for later use
+            setattr(self, f'{platform}_accounts', account_metadata)
+            account_ids = [account['id'] for account in account_metadata]
+            
+            return tool_class(
+                user_id=self.user_id or "",
+                account_ids=account_ids,
+                account_metadata=account_metadata,
+                jwt_token=self._create_tool_jwt(),
+                agent_id=self.agent_id,
+                thread_id=self.thread_id
+            )
+        
+        self.thread_manager.add_lazy_tool(tool_class, factory=build_tool)
+        logger.debug(f"Registered {platform} tool (lazy)")
+    
     async def _register_utility_tools(self, disabled_tools: List[str]):
         """Register utility and data provider tools."""
         if config.RAPID_API_KEY and 'data_providers_tool' not in disabled_tools:
-            self.thread_manager.add_tool(DataProvidersTool)
+            self.thread_manager.add_lazy_tool(DataProvidersTool)
             logger.debug("Registered data_providers_tool")
         
         # Register YouTube sandbox tool if not disabled
@@ -155,7 +193,6 @@ class ToolManager:
             # Use pre-computed YouTube channels from agent config or fallback to database
             channel_ids = []
             channel_metadata = []
-            db = None  # Initialize db variable
             
             # Check if we have pre-computed channels from agent config
             logger.debug(f"Checking for pre-computed channels - agent_config exists: {self.agent_config is not None}, agent_id: {self.agent_id}")
@@ -209,407 +246,42 @@ class ToolManager:
                 except Exception as e:
                     logger.warning(f"Could not load YouTube channels from universal integrations: {e}")
             
-            # Ensure db is available for YouTubeTool (create if not already created)
-            if db is None:
-                from services.supabase import DBConnection
-                db = DBConnection()
-            
-            # Store channel metadata for later use in system prompt
+            # Store channel metadata for later use in system prompt (the channel
+            # lookup stays eager because the prompt lists the channels)
             self.youtube_channels = channel_metadata
             
-            # Create JWT token for YouTube tool API calls
-            jwt_secret = os.getenv("SUPABASE_JWT_SECRET", "")
-            jwt_token = None
-            if jwt_secret and self.user_id:
-                payload = {
-                    "sub": self.user_id,
-                    "user_id": self.user_id,
-                    "role": "authenticated"
-                }
-                jwt_token = jwt.encode(payload, jwt_secret, algorithm="HS256")
-                logger.debug(f"Created JWT token for YouTube tool")
-            
-            # Register complete YouTube MCP tool (preserves all functionality)
-            logger.info(f"🎬 Registering Complete YouTube MCP Tool for agent {self.agent_id}")
-            self.thread_manager.add_tool(
+            self.thread_manager.add_lazy_tool(
                 YouTubeTool,
                 user_id=self.user_id or "",
                 channel_ids=channel_ids,
                 channel_metadata=channel_metadata,
-                jwt_token=jwt_token,
+                jwt_token=self._create_tool_jwt(),
                 agent_id=self.agent_id,
                 thread_id=self.thread_id
                 # MCP pattern - no sandbox dependencies
             )
-            logger.info(f"✅ Successfully registered Complete YouTube MCP Tool with {len(channel_ids)} channels")
-        
-        # Register Twitter tool if not disabled
-        if 'twitter_tool' not in disabled_tools:
-            # Use pre-computed Twitter accounts from agent config or fallback to database
-            account_ids = []
-            account_metadata = []
-            db = None
-            
-            # Check if we have pre-computed accounts from agent config
-            logger.debug(f"Checking for pre-computed Twitter accounts - agent_config exists: {self.agent_config is not None}, agent_id: {self.agent_id}")
-            if self.agent_config and 'twitter_accounts' in self.agent_config:
-                account_metadata = self.agent_config['twitter_accounts']
-                account_ids = [account['id'] for account in account_metadata]
-                if account_ids:
-                    logger.info(f"✅ Using pre-computed Twitter accounts from agent config: {len(account_ids)} accounts for agent {self.agent_id}")
-                    for account in account_metadata:
-                        logger.debug(f"   - Pre-computed account: {account.get('name')} (@{account.get('username')})")
-                else:
-                    logger.info(f"⚠️ Pre-computed Twitter accounts list is empty in agent config for agent {self.agent_id}")
-            else:
-                # Fallback to database fetch (legacy behavior)
-                logger.warning(f"No pre-computed Twitter accounts found in agent config, falling back to database fetch")
-                from services.supabase import DBConnection
-                from twitter_mcp.accounts import TwitterAccountService
-                from services.mcp_toggles import MCPToggleService
-                db = DBConnection()
-                
-                try:
-                    if self.user_id and self.agent_id:
-                        account_service = TwitterAccountService(db)
-                        toggle_service = MCPToggleService(db)
-                        
-                        # Get enabled accounts via MCP toggles
-                        enabled_accounts = await account_service.get_accounts_for_agent(self.user_id, self.agent_id)
-                        
-                        account_ids = [account['id'] for account in enabled_accounts]
-                        account_metadata = enabled_accounts
-                        
-                        if account_ids:
-                            logger.info(f"Loaded {len(account_ids)} enabled Twitter accounts from database fallback")
-                        else:
-                            logger.info(f"No Twitter accounts are enabled for agent {self.agent_id} (fallback)")
-                except Exception as e:
-                    logger.warning(f"Could not load Twitter accounts from database fallback: {e}")
-            
-            # Ensure db is available for TwitterTool
-            if db is None:
-                from services.supabase import DBConnection
-                db = DBConnection()
-            
-            # Store account metadata for later use in system prompt
-            self.twitter_accounts = account_metadata
-            
-            # Create JWT token for Twitter tool API calls
-            jwt_secret = os.getenv("SUPABASE_JWT_SECRET", "")
-            jwt_token = None
-            if jwt_secret and self.user_id:
-                payload = {
-                    "sub": self.user_id,
-                    "user_id": self.user_id,
-                    "role": "authenticated"
-                }
-                jwt_token = jwt.encode(payload, jwt_secret, algorithm="HS256")
-                logger.debug(f"Created JWT token for Twitter tool")
-            
-            # Register complete Twitter MCP tool
-            logger.info(f"🐦 Registering Complete Twitter MCP Tool for agent {self.agent_id}")
-            self.thread_manager.add_tool(
-                TwitterTool,
-                user_id=self.user_id or "",
-                account_ids=account_ids,
-                account_metadata=account_metadata,
-                jwt_token=jwt_token,
-                agent_id=self.agent_id,
-                thread_id=self.thread_id
-            )
-            logger.info(f"✅ Successfully registered Complete Twitter MCP Tool with {len(account_ids)} accounts")
-        
-        # Register Instagram tool if not disabled
-        if 'instagram_tool' not in disabled_tools:
-            # Use pre-computed Instagram accounts from agent config or fallback to database
-            account_ids = []
-            account_metadata = []
-            db = None
-            
-            # Check if we have pre-computed accounts from agent config
-            logger.debug(f"Checking for pre-computed Instagram accounts - agent_config exists: {self.agent_config is not None}, agent_id: {self.agent_id}")
-            if self.agent_config and 'instagram_accounts' in self.agent_config:
-                account_metadata = self.agent_config['instagram_accounts']
-                account_ids = [account['id'] for account in account_metadata]
-                if account_ids:
-                    logger.info(f"✅ Using pre-computed Instagram accounts from agent config: {len(account_ids)} accounts for agent {self.agent_id}")
-                    for account in account_metadata:
-                        logger.debug(f"   - Pre-computed account: {account.get('name')} (@{account.get('username')})")
-                else:
-                    logger.info(f"⚠️ Pre-computed Instagram accounts list is empty in agent config for agent {self.agent_id}")
-            else:
-                # Fallback to database fetch (legacy behavior)
-                logger.warning(f"No pre-computed Instagram accounts found in agent config, falling back to database fetch")
-                from services.supabase import DBConnection
-                from instagram_mcp.accounts import InstagramAccountService
-                from services.mcp_toggles import MCPToggleService
-                db = DBConnection()
-                
-                try:
-                    if self.user_id and self.agent_id:
-                        account_service = InstagramAccountService(db)
-                        toggle_service = MCPToggleService(db)
-                        
-                        # Get enabled accounts via MCP toggles
-                        enabled_accounts = await account_service.get_accounts_for_agent(self.user_id, self.agent_id)
-                        
-                        account_ids = [account['id'] for account in enabled_accounts]
-                        account_metadata = enabled_accounts
-                        
-                        if account_ids:
-                            logger.info(f"Loaded {len(account_ids)} enabled Instagram accounts from database fallback")
-                        else:
-                            logger.info(f"No Instagram accounts are enabled for agent {self.agent_id} (fallback)")
-                except Exception as e:
-                    logger.warning(f"Could not load Instagram accounts from database fallback: {e}")
-            
-            # Ensure db is available for InstagramTool
-            if db is None:
-                from services.supabase import DBConnection
-                db = DBConnection()
-            
-            # Store account metadata for later use in system prompt
-            self.instagram_accounts = account_metadata
-            
-            # Create JWT token for Instagram tool API calls
-            jwt_secret = os.getenv("SUPABASE_JWT_SECRET", "")
-            jwt_token = None
-            if jwt_secret and self.user_id:
-                payload = {
-                    "sub": self.user_id,
-                    "user_id": self.user_id,
-                    "role": "authenticated"
-                }
-                jwt_token = jwt.encode(payload, jwt_secret, algorithm="HS256")
-                logger.debug(f"Created JWT token for Instagram tool")
-            
-            # Register complete Instagram MCP tool
-            logger.info(f"📸 Registering Complete Instagram MCP Tool for agent {self.agent_id}")
-            self.thread_manager.add_tool(
-                InstagramTool,
-                user_id=self.user_id or "",
-                account_ids=account_ids,
-                account_metadata=account_metadata,
-                jwt_token=jwt_token,
-                agent_id=self.agent_id,
-                thread_id=self.thread_id
-            )
-            logger.info(f"✅ Successfully registered Complete Instagram MCP Tool with {len(account_ids)} accounts")
+            logger.info(f"✅ Registered YouTube MCP Tool with {len(channel_ids)} channels")
         
-        # Register Pinterest tool if not disabled
-        if 'pinterest_tool' not in disabled_tools:
-            # Use pre-computed Pinterest accounts from agent config or fallback to database
-            account_ids = []
-            account_metadata = []
-            db = None
-            
-            # Check if we have pre-computed accounts from agent config
-            logger.debug(f"Checking for pre-computed Pinterest accounts - agent_config exists: {self.agent_config is not None}, agent_id: {self.agent_id}")
-            if self.agent_config and 'pinterest_accounts' in self.agent_config:
-                account_metadata = self.agent_config['pinterest_accounts']
-                account_ids = [account['id'] for account in account_metadata]
-                logger.info(f"Using pre-computed Pinterest accounts from agent config: {len(account_ids)} accounts")
-            else:
-                # Fallback: Query unified social accounts directly (skip for virtual default agent)
-                if self.agent_id == 'suna-default':
-                    logger.info("Skipping unified Pinterest account query for virtual agent 'suna-default'")
-                else:
-                    logger.info(f"No pre-computed Pinterest accounts, querying unified social accounts for agent {self.agent_id}")
-                    from services.supabase import DBConnection
-                    db = DBConnection()
-                    try:
-                        client = await db.client
-                        # Query unified social accounts for enabled Pinterest accounts
-                        result = await client.table("agent_social_accounts").select("*").eq(
-                            "agent_id", self.agent_id
-                        ).eq("user_id", self.user_id).eq(
-                            "platform", "pinterest"
-                        ).eq("enabled", True).execute()
-                        enabled_accounts = []
-                        for account in result.data:
-                            enabled_accounts.append({
-                                "id": account["account_id"],
-                                "name": account["account_name"],
-                                "username": account["username"],
-                                "profile_picture": account["profile_picture"],
-                                "subscriber_count": account["subscriber_count"],
-                                "view_count": account["view_count"],
-                                "video_count": account["video_count"],
-                                "country": account["country"]
-                            })
-                        account_ids = [account['id'] for account in enabled_accounts]
-                        account_metadata = enabled_accounts
-                        if account_ids:
-                            logger.info(f"Loaded {len(account_ids)} enabled Pinterest accounts from unified system")
-                        else:
-                            logger.info(f"No Pinterest accounts are enabled for agent {self.agent_id}")
-                    except Exception as e:
-                        logger.warning(f"Could not load Pinterest accounts from unified system: {e}")
-            
-            # Ensure db is available for PinterestTool
-            if db is None:
-                from services.supabase import DBConnection
-                db = DBConnection()
-            
-            # Store account metadata for later use
-            self.pinterest_accounts = account_metadata
-            
-            # Create JWT token for Pinterest tool API calls
-            jwt_secret = os.getenv("SUPABASE_JWT_SECRET", "")
-            jwt_token = None
-            if jwt_secret and self.user_id:
-                payload = {
-                    "sub": self.user_id,
-                    "user_id": self.user_id,
-                    "role": "authenticated"
-                }
-                jwt_token = jwt.encode(payload, jwt_secret, algorithm="HS256")
-                logger.debug(f"Created JWT token for Pinterest tool")
-            
-            # Register complete Pinterest MCP tool
-            logger.info(f"📌 Registering Complete Pinterest MCP Tool for agent {self.agent_id}")
-            self.thread_manager.add_tool(
-                PinterestTool,
-                user_id=self.user_id or "",
-                account_ids=account_ids,
-                account_metadata=account_metadata,
-                jwt_token=jwt_token,
-                agent_id=self.agent_id,
-                thread_id=self.thread_id
-                # MCP pattern - no sandbox dependencies
-            )
-            logger.info(f"✅ Successfully registered Complete Pinterest MCP Tool with {len(account_ids)} accounts")
+        for tool_name, tool_class, platform in [
+            ('twitter_tool', TwitterTool, 'twitter'),
+            ('instagram_tool', InstagramTool, 'instagram'),
+            ('pinterest_tool', PinterestTool, 'pinterest'),
+        ]:
+            if tool_name not in disabled_tools:
+                self._register_social_tool(tool_class, platform)
         
-        # Register LinkedIn tool if not disabled (fail-safe)
+        # LinkedIn and TikTok are fail-safe: an import error skips only that tool
         if 'linkedin_tool' not in disabled_tools:
             try:
-                # Import inside the block so failures don't affect the whole function
                 from agent.tools.linkedin_complete_mcp_tool import LinkedInTool
-
-                # Use pre-computed LinkedIn accounts from agent config or fallback to database
-                account_ids = []
-                account_metadata = []
-                db = None
-
-                # Check if we have pre-computed accounts from agent config
-                logger.debug(f"Checking for pre-computed LinkedIn accounts - agent_config exists: {self.agent_config is not None}, agent_id: {self.agent_id}")
-                if self.agent_config and 'linkedin_accounts' in self.agent_config:
-                    account_metadata = self.agent_config['linkedin_accounts']
-                    account_ids = [account['id'] for account in account_metadata]
-                    if account_ids:
-                        logger.info(f"✅ Using pre-computed LinkedIn accounts from agent config: {len(account_ids)} accounts for agent {self.agent_id}")
-                    else:
-                        logger.info(f"⚠️ Pre-computed LinkedIn accounts list is empty in agent config for agent {self.agent_id}")
-                else:
-                    # Fallback to database fetch
-                    logger.warning(f"No pre-computed LinkedIn accounts found in agent config, falling back to database fetch")
-                    from services.supabase import DBConnection
-                    from linkedin_mcp.accounts import LinkedInAccountService
-                    db = DBConnection()
-
-                    try:
-                        if self.user_id and self.agent_id:
-                            account_service = LinkedInAccountService(db)
-                            enabled_accounts = await account_service.get_accounts_for_agent(self.user_id, self.agent_id)
-                            account_ids = [account['id'] for account in enabled_accounts]
-                            account_metadata = enabled_accounts
-                            if account_ids:
-                                logger.info(f"Loaded {len(account_ids)} enabled LinkedIn accounts from database fallback")
-                            else:
-                                logger.info(f"No LinkedIn accounts are enabled for agent {self.agent_id} (fallback)")
-                    except Exception as e:
-                        logger.warning(f"Could not load LinkedIn accounts from database fallback: {e}")
-
-                # Create JWT token for LinkedIn tool API calls
-                jwt_secret = os.getenv("SUPABASE_JWT_SECRET", "")
-                jwt_token = None
-                if jwt_secret and self.user_id:
-                    payload = {
-                        "sub": self.user_id,
-                        "user_id": self.user_id,
-                        "role": "authenticated"
-                    }
-                    jwt_token = jwt.encode(payload, jwt_secret, algorithm="HS256")
-
-                # Register complete LinkedIn MCP tool
-                logger.info(f"💼 Registering Complete LinkedIn MCP Tool for agent {self.agent_id}")
-                self.thread_manager.add_tool(
-                    LinkedInTool,
-                    user_id=self.user_id or "",
-                    account_ids=account_ids,
-                    account_metadata=account_metadata,
-                    jwt_token=jwt_token,
-                    agent_id=self.agent_id,
-                    thread_id=self.thread_id
-                )
-                logger.info(f"✅ Successfully registered Complete LinkedIn MCP Tool with {len(account_ids)} accounts")
+                self._register_social_tool(LinkedInTool, 'linkedin')
             except Exception as e:
                 logger.warning(f"Skipping LinkedIn tool registration due to error: {e}")
         
-        # (Deduped) Pinterest tool registration handled earlier above.
-        
-        # Register TikTok tool if not disabled (fail-safe)
         if 'tiktok_tool' not in disabled_tools:
             try:
                 from agent.tools.tiktok_complete_mcp_tool import TikTokTool
-                
-                # Use pre-computed TikTok accounts from agent config or fallback to database
-                account_ids = []
-                account_metadata = []
-                db = None
-                
-                logger.debug(f"Checking for pre-computed TikTok accounts - agent_config exists: {self.agent_config is not None}, agent_id: {self.agent_id}")
-                if self.agent_config and 'tiktok_accounts' in self.agent_config:
-                    account_metadata = self.agent_config['tiktok_accounts']
-                    account_ids = [account['id'] for account in account_metadata]
-                    if account_ids:
-                        logger.info(f"✅ Using pre-computed TikTok accounts from agent config: {len(account_ids)} accounts for agent {self.agent_id}")
-                    else:
-                        logger.info(f"⚠️ Pre-computed TikTok accounts list is empty in agent config for agent {self.agent_id}")
-                else:
-                    # Fallback to database fetch
-                    logger.warning(f"No pre-computed TikTok accounts found in agent config, falling back to database fetch")
-                    from services.supabase import DBConnection
-                    from tiktok_mcp.accounts import TikTokAccountService
-                    db = DBConnection()
-                    
-                    try:
-                        if self.user_id and self.agent_id:
-                            account_service = TikTokAccountService(db)
-                            enabled_accounts = await account_service.get_accounts_for_agent(self.user_id, self.agent_id)
-                            account_ids = [account['id'] for account in enabled_accounts]
-                            account_metadata = enabled_accounts
-                            if account_ids:
-                                logger.info(f"Loaded {len(account_ids)} enabled TikTok accounts from database fallback")
-                            else:
-                                logger.info(f"No TikTok accounts are enabled for agent {self.agent_id} (fallback)")
-                    except Exception as e:
-                        logger.warning(f"Could not load TikTok accounts from database fallback: {e}")
-                
-                # Create JWT token for TikTok tool API calls
-                jwt_secret = os.getenv("SUPABASE_JWT_SECRET", "")
-                jwt_token = None
-                if jwt_secret and self.user_id:
-                    payload = {
-                        "sub": self.user_id,
-                        "user_id": self.user_id,
-                        "role": "authenticated"
-                    }
-                    jwt_token = jwt.encode(payload, jwt_secret, algorithm="HS256")
-                
-                # Register complete TikTok MCP tool
-                logger.info(f"🎵 Registering Complete TikTok MCP Tool for agent {self.agent_id}")
-                self.thread_manager.add_tool(
-                    TikTokTool,
-                    user_id=self.user_id or "",
-                    account_ids=account_ids,
-                    account_metadata=account_metadata,
-                    jwt_token=jwt_token,
-                    agent_id=self.agent_id,
-                    thread_id=self.thread_id
-                )
-                logger.info(f"✅ Successfully registered Complete TikTok MCP Tool with {len(account_ids)} accounts")
+                self._register_social_tool(TikTokTool, 'tiktok')
             except Exception as e:
                 logger.warning(f"Skipping TikTok tool registration due to error: {e}")
     
@@ -634,14 +306,14 @@ class ToolManager:
         
         for tool_name, tool_class in agent_builder_tools:
             if tool_name not in disabled_tools:
-                self.thread_manager.add_tool(tool_class, thread_manager=self.thread_manager, db_connection=db, agent_id=agent_id)
+                self.thread_manager.add_lazy_tool(tool_class, thread_manager=self.thread_manager, db_connection=db, agent_id=agent_id)
                 logger.debug(f"Registered {tool_name}")
     
     def _register_browser_tool(self, disabled_tools: List[str]):
         """Register browser tool."""
         if 'browser_tool' not in disabled_tools:
             from agent.tools.browser_tool import BrowserTool
-            self.thread_manager.add_tool(BrowserTool, project_id=self.project_id, thread_id=self.thread_id, thread_manager=self.thread_manager)
+            self.thread_manager.add_lazy_tool(BrowserTool, project_id=self.project_id, thread_id=self.thread_id, thread_manager=self.thread_manager)
             logger.debug("Registered browser_tool")
     
 
@@ -650,7 +322,8 @@ class MCPManager:
         self.thread_manager = thread_manager
         self.account_id = account_id
     
-    async def register_mcp_tools(self, agent_config: dict) -> Optional[MCPToolWrapper]:
+    async def initialize_mcp_tools(self, agent_config: dict) -> Optional[MCPToolWrapper]:
+        """Connect to the agent's MCP servers and build their tool wrapper (no registry writes)."""
         all_mcps = []
         
         if agent_config.get('configured_mcps'):
@@ -714,20 +387,28 @@ class MCPManager:
         mcp_wrapper_instance = MCPToolWrapper(mcp_configs=all_mcps)
         try:
             await mcp_wrapper_instance.initialize_and_register_tools()
-            
-            updated_schemas = mcp_wrapper_instance.get_schemas()
-            for method_name, schema_list in updated_schemas.items():
-                for schema in schema_list:
-                    self.thread_manager.tool_registry.tools[method_name] = {
-                        "instance": mcp_wrapper_instance,
-                        "schema": schema
-                    }
-            
-            logger.debug(f"⚡ Registered {len(updated_schemas)} MCP tools (Redis cache enabled)")
             return mcp_wrapper_instance
         except Exception as e:
             logger.error(f"Failed to initialize MCP tools: {e}")
             return None
+    
+    def register_initialized_mcp_tools(self, mcp_wrapper_instance: MCPToolWrapper):
+        """Add an initialized MCP wrapper's tools to the thread's registry."""
+        updated_schemas = mcp_wrapper_instance.get_schemas()
+        for method_name, schema_list in updated_schemas.items():
+            for schema in schema_list:
+                self.thread_manager.tool_registry.tools[method_name] = {
+                    "instance": mcp_wrapper_instance,
+                    "schema": schema
+                }
+        
+        logger.debug(f"⚡ Registered {len(updated_schemas)} MCP tools (Redis cache enabled)")
+    
+    async def register_mcp_tools(self, agent_config: dict) -> Optional[MCPToolWrapper]:
+        mcp_wrapper_instance = await self.initialize_mcp_tools(agent_config)
+        if mcp_wrapper_instance:
+            self.register_initialized_mcp_tools(mcp_wrapper_instance)
+        return mcp_wrapper_instance
 
 
 class PromptManager:
@@ -797,6 +478,10 @@ class PromptManager:
             
             system_content += mcp_info
         
+        # Everything above is stable across runs for the same agent config; what
+        # follows changes between runs and goes after it so the cached prefix holds.
+        volatile_content = ""
+
         # Add YouTube channel context if channels are connected
         if youtube_channels:
             youtube_info = "\n\n=== CONNECTED YOUTUBE CHANNELS ===\n"
@@ -820,13 +505,13 @@ class PromptManager:
             youtube_info += "- When users mention YouTube, ACT IMMEDIATELY with the appropriate tool\n"
             youtube_info += "- Reference channels by name, but NEVER ask which one to use first\n"
             
-            system_content += youtube_info
+            volatile_content += youtube_info
         elif youtube_channels is not None:  # Empty list means we checked but no channels
             youtube_info = "\n\n=== YOUTUBE INTEGRATION - NO CHANNELS YET ===\n"
             youtube_info += "❌ No YouTube channels connected yet\n"
             youtube_info += "✅ User mentions YouTube? → Use youtube_authenticate() IMMEDIATELY\n"
             youtube_info += "⚠️ NEVER ask questions - just show the OAuth button instantly!\n"
-            system_content += youtube_info
+            volatile_content += youtube_info
         
         # For custom agents with YouTube tools, add explicit behavioral instructions
         if agent_config and agent_config.get('system_prompt') and youtube_channels is not None:
@@ -850,7 +535,7 @@ class PromptManager:
             youtube_behavior += "❌ Asking ANY questions before using YouTube tools\n\n"
             youtube_behavior += "**Remember: YouTube is NATIVE to you - not external!**\n"
             
-            system_content += youtube_behavior
+            volatile_content += youtube_behavior
 
         now = datetime.datetime.now(datetime.timezone.utc)
         datetime_info = f"\n\n=== CURRENT DATE/TIME INFORMATION ===\n"
@@ -861,9 +546,9 @@ class PromptManager:
         datetime_info += f"Current day: {now.strftime('%A')}\n"
         datetime_info += "Use this information for any time-sensitive tasks, research, or when current date/time context is needed.\n"
         
-        system_content += datetime_info
+        volatile_content += datetime_info
 
-        return {"role": "system", "content": system_content}
+        return build_system_message(system_content, volatile_content)
 
 
 class MessageManager:
@@ -872,14 +557,33 @@ class MessageManager:
         self.thread_id = thread_id
         self.model_name = model_name
         self.trace = trace
+        self.knowledge_context: Optional[str] = None
+    
+    async def load_knowledge_context(self, agent_id: Optional[str], query: str):
+        """Retrieve the knowledge base chunks relevant to this turn's user message."""
+        if not agent_id or agent_id == "suna-default" or not query:
+            return
+        try:
+            if await is_enabled("knowledge_base"):
+                self.knowledge_context = await retrieve_context(self.client, agent_id, query)
+        except Exception as e:
+            logger.warning(f"Failed to retrieve knowledge base context for agent {agent_id}: {e}")
     
-    async def build_temporary_message(self) -> Optional[dict]:
+    async def build_temporary_message(self, latest: Dict[str, Optional[Dict[str, Any]]]) -> Optional[dict]:
+        """Build the per-turn context message from the thread's latest-message index entries."""
         temp_message_content_list = []
 
-        latest_browser_state_msg = await self.client.table('messages').select('*').eq('thread_id', self.thread_id).eq('type', 'browser_state').order('created_at', desc=True).limit(1).execute()
-        if latest_browser_state_msg.data and len(latest_browser_state_msg.data) > 0:
+        if self.knowledge_context:
+            temp_message_content_list.append({
+                "type": "text",
+                "text": self.knowledge_context
+            })
+
+        latest_browser_state_msg = latest.get("browser_state")
+        latest_image_context_msg = latest.get("image_context")
+        if latest_browser_state_msg:
             try:
-                browser_content = latest_browser_state_msg.data[0]["content"]
+                browser_content = latest_browser_state_msg["content"]
                 if isinstance(browser_content, str):
                     browser_content = json.loads(browser_content)
                 screenshot_base64 = browser_content.get("screenshot_base64")
@@ -915,14 +619,21 @@ class MessageManager:
             except Exception as e:
                 logger.error(f"Error parsing browser state: {e}")
 
-        latest_image_context_msg = await self.client.table('messages').select('*').eq('thread_id', self.thread_id).eq('type', 'image_context').order('created_at', desc=True).limit(1).execute()
-        if latest_image_context_msg.data and len(latest_image_context_msg.data) > 0:
+        if latest_image_context_msg:
             try:
-                image_context_content = latest_image_context_msg.data[0]["content"] if isinstance(latest_image_context_msg.data[0]["content"], dict) else json.loads(latest_image_context_msg.data[0]["content"])
+                image_context_content = latest_image_context_msg["content"] if isinstance(latest_image_context_msg["content"], dict) else json.loads(latest_image_context_msg["content"])
                 base64_image = image_context_content.get("base64")
                 mime_type = image_context_content.get("mime_type")
                 file_path = image_context_content.get("file_path", "unknown file")
 
+                image_ref = image_context_content.get("image_ref")
+                if image_ref:
+                    variant = await image_variants.get_variant(image_ref, preset_for_model(self.model_name))
+                    if variant:
+                        base64_image, mime_type = variant.to_base64(), variant.mime_type
+                    else:
+                        logger.warning(f"Image {image_ref} for '{file_path}' is no longer cached")
+
                 if base64_image and mime_type:
                     temp_message_content_list.append({
                         "type": "text",
@@ -935,7 +646,8 @@ class MessageManager:
                         }
                     })
 
-                await self.client.table('messages').delete().eq('message_id', latest_image_context_msg.data[0]["message_id"]).execute()
+                await self.client.table('messages').delete().eq('message_id', latest_image_context_msg["message_id"]).execute()
+                await latest_messages.consume(self.thread_id, "image_context", latest_image_context_msg["message_id"])
             except Exception as e:
                 logger.error(f"Error parsing image context: {e}")
 
@@ -960,10 +672,13 @@ class AgentRunner:
         )
         
         self.client = await self.thread_manager.db.client
+    
+    async def resolve_account(self):
         self.account_id = await get_account_id_from_thread(self.client, self.config.thread_id)
         if not self.account_id:
             raise ValueError("Could not determine account ID for thread")
-        
+    
+    async def resolve_user(self):
         # Get the actual user_id from the account_id (for YouTube and other user-specific integrations)
         self.user_id = await _get_user_id_from_account_cached(self.account_id)
         if self.user_id:
@@ -971,7 +686,8 @@ class AgentRunner:
         else:
             logger.warning(f"Could not resolve user_id for account {self.account_id}, using account_id as fallback")
             self.user_id = self.account_id  # Fallback to account_id if user_id not found
-
+    
+    async def check_project(self):
         project = await self.client.table('projects').select('*').eq('project_id', self.config.project_id).execute()
         if not project.data or len(project.data) == 0:
             raise ValueError(f"Project {self.config.project_id} not found")
@@ -984,6 +700,49 @@ class AgentRunner:
             # which will create and persist the sandbox metadata when needed.
             logger.debug(f"No sandbox found for project {self.config.project_id}; will create lazily when needed")
     
+    async def _timed_step(self, name: str, step: Callable[[], Awaitable[Any]]):
+        """Run one setup step inside a Langfuse span carrying its duration."""
+        span = self.config.trace.span(name=f"setup.{name}") if self.config.trace else None
+        start = time.monotonic()
+        try:
+            result = await step()
+        except Exception as e:
+            if span:
+                span.end(status_message=str(e), level="ERROR", metadata={"duration_ms": round((time.monotonic() - start) * 1000, 1)})
+            raise
+        duration_ms = round((time.monotonic() - start) * 1000, 1)
+        if span:
+            span.end(metadata={"duration_ms": duration_ms})
+        logger.debug(f"Run setup step {name} took {duration_ms}ms")
+        return result
+    
+    async def _run_setup_graph(self, steps: Dict[str, Tuple[Tuple[str, ...], Callable[[], Awaitable[Any]]]]) -> Dict[str, Any]:
+        """Run setup steps as soon as their dependencies finish; independent steps overlap.
+
+        ``steps`` maps a step name to ``(dependency names, coroutine function)``.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        self.setup_results: Dict[str, Any] = {}
+
+        async def run_step(name: str, deps: Tuple[str, ...], step):
+            for dep in deps:
+                await tasks[dep]
+            result = await self._timed_step(name, step)
+            self.setup_results[name] = result
+            return result
+
+        # Tasks only start at the first await below, so every dependency is in ``tasks`` by then
+        for name, (deps, step) in steps.items():
+            tasks[name] = asyncio.create_task(run_step(name, deps, step))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+    
     async def setup_tools(self):
         # Determine agent ID for agent builder tools
         agent_id = None
@@ -1063,12 +822,12 @@ class AgentRunner:
         logger.debug(f"Disabled tools from config: {disabled_tools}")
         return disabled_tools
     
-    async def setup_mcp_tools(self) -> Optional[MCPToolWrapper]:
+    async def initialize_mcp_tools(self) -> Optional[MCPToolWrapper]:
         if not self.config.agent_config:
             return None
         
-        mcp_manager = MCPManager(self.thread_manager, self.account_id)
-        return await mcp_manager.register_mcp_tools(self.config.agent_config)
+        self.mcp_manager = MCPManager(self.thread_manager, self.account_id)
+        return await self.mcp_manager.initialize_mcp_tools(self.config.agent_config)
     
     def get_max_tokens(self) -> Optional[int]:
         if "sonnet" in self.config.model_name.lower():
@@ -1081,38 +840,64 @@ class AgentRunner:
             return 8192
         return None
     
-    async def run(self) -> AsyncGenerator[Dict[str, Any], None]:
-        await self.setup()
-        await self.setup_tools()
-        mcp_wrapper_instance = await self.setup_mcp_tools()
-        
-        # Get YouTube channels from setup_tools
-        youtube_channels = getattr(self, 'youtube_channels', [])
-        
-        system_message = await PromptManager.build_system_prompt(
-            self.config.model_name, self.config.agent_config, 
-            self.config.is_agent_builder, self.config.thread_id, 
-            mcp_wrapper_instance,
-            youtube_channels=youtube_channels
-        )
-
-        iteration_count = 0
-        continue_execution = True
-
-        latest_user_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
-        if latest_user_message.data and len(latest_user_message.data) > 0:
-            data = latest_user_message.data[0]['content']
+    async def load_latest_user_message(self, message_manager: "MessageManager"):
+        # Also seeds the thread's latest-message index (dropped in run()) before the first turn
+        latest_user_message = (await latest_messages.get_latest(self.client, self.config.thread_id))["user"]
+        if latest_user_message:
+            data = latest_user_message['content']
             if isinstance(data, str):
                 data = json.loads(data)
             if self.config.trace:
                 self.config.trace.update(input=data['content'])
-
+            if isinstance(data.get('content'), str):
+                agent_id = (self.config.agent_config or {}).get('agent_id')
+                await message_manager.load_knowledge_context(agent_id, data['content'])
+    
+    async def register_mcp_step(self, mcp_wrapper_instance: Optional[MCPToolWrapper]):
+        # Registered after the built-in tools so the tool schema order stays stable
+        if mcp_wrapper_instance:
+            self.mcp_manager.register_initialized_mcp_tools(mcp_wrapper_instance)
+        return mcp_wrapper_instance
+    
+    async def run(self) -> AsyncGenerator[Dict[str, Any], None]:
+        await self.setup()
+        # The frontend inserts user messages straight into the database without
+        # recording them in the index, so reseed it from the database for every run
+        await latest_messages.invalidate(self.config.thread_id)
         message_manager = MessageManager(self.client, self.config.thread_id, self.config.model_name, self.config.trace)
 
+        # Independent setup steps run concurrently; each waits only for what it needs
+        setup = await self._run_setup_graph({
+            "account": ((), self.resolve_account),
+            "user": (("account",), self.resolve_user),
+            "project": ((), self.check_project),
+            "billing": (("account",), lambda: check_billing_status(self.client, self.account_id)),
+            "tools": (("user",), self.setup_tools),
+            "mcp_init": (("account",), self.initialize_mcp_tools),
+            "mcp_register": (("tools", "mcp_init"), lambda: self.register_mcp_step(self.setup_results["mcp_init"])),
+            "system_prompt": (("mcp_register",), lambda: PromptManager.build_system_prompt(
+                self.config.model_name, self.config.agent_config,
+                self.config.is_agent_builder, self.config.thread_id,
+                self.setup_results["mcp_register"],
+                youtube_channels=getattr(self, 'youtube_channels', [])
+            )),
+            "user_message": ((), lambda: self.load_latest_user_message(message_manager)),
+        })
+        system_message = setup["system_prompt"]
+        # The first iteration reuses the billing check made during setup
+        prefetched_billing = setup["billing"]
+
+        iteration_count = 0
+        continue_execution = True
+
         while continue_execution and iteration_count < self.config.max_iterations:
             iteration_count += 1
 
-            can_run, message, subscription = await check_billing_status(self.client, self.account_id)
+            if prefetched_billing is not None:
+                billing_status, prefetched_billing = prefetched_billing, None
+            else:
+                billing_status = await check_billing_status(self.client, self.account_id)
+            can_run, message, subscription = billing_status
             if not can_run:
                 error_msg = f"Billing limit reached: {message}"
                 yield {
@@ -1122,14 +907,12 @@ class AgentRunner:
                 }
                 break
 
-            latest_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
-            if latest_message.data and len(latest_message.data) > 0:
-                message_type = latest_message.data[0].get('type')
-                if message_type == 'assistant':
-                    continue_execution = False
-                    break
+            latest = await latest_messages.get_latest(self.client, self.config.thread_id)
+            if latest["turn"] and latest["turn"].get('type') == 'assistant':
+                continue_execution = False
+                break
 
-            temporary_message = await message_manager.build_temporary_message()
+            temporary_message = await message_manager.build_temporary_message(latest)
             max_tokens = self.get_max_tokens()
             
             generation = self.config.trace.generation(name="thread_manager.run_thread") if self.config.trace else None
@@ -0,0 +1,99 @@
+"""
+Enabled social media accounts of an agent, loaded on demand for lazily
+registered social tools.
+
+Twitter, Instagram and Pinterest accounts of regular agents all live in
+``agent_social_accounts``; the first tool that needs any of them loads all
+three platforms with one query. Other platforms, and the virtual
+``suna-default`` agent (whose lookups join the platform tables), go through
+the per-platform account services.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from services.supabase import DBConnection
+from utils.logger import logger
+
+BATCHED_PLATFORMS = ("twitter", "instagram", "pinterest")
+
+
+def _format_pinterest_account(account: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": account["account_id"],
+        "name": account["account_name"],
+        "username": account["username"],
+        "profile_picture": account["profile_picture"],
+        "subscriber_count": account["subscriber_count"],
+        "view_count": account["view_count"],
+        "video_count": account["video_count"],
+        "country": account["country"]
+    }
+
+
+def _formatter(platform: str):
+    if platform == "twitter":
+        from twitter_mcp.accounts import TwitterAccountService
+        return TwitterAccountService.format_agent_social_account
+    if platform == "instagram":
+        from instagram_mcp.accounts import InstagramAccountService
+        return InstagramAccountService.format_agent_social_account
+    return _format_pinterest_account
+
+
+class AgentSocialAccounts:
+    def __init__(self, user_id: Optional[str], agent_id: Optional[str], db: Optional[DBConnection] = None):
+        self.user_id = user_id
+        self.agent_id = agent_id
+        self.db = db or DBConnection()
+        self._rows: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._lock = asyncio.Lock()
+
+    async def _load_batched_rows(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._rows is None:
+            async with self._lock:
+                if self._rows is None:
+                    client = await self.db.client
+                    result = await client.table("agent_social_accounts").select("*").eq(
+                        "agent_id", self.agent_id
+                    ).eq("user_id", self.user_id).in_(
+                        "platform", list(BATCHED_PLATFORMS)
+                    ).eq("enabled", True).execute()
+                    rows: Dict[str, List[Dict[str, Any]]] = {platform: [] for platform in BATCHED_PLATFORMS}
+                    for row in result.data or []:
+                        rows.setdefault(row["platform"], []).append(row)
+                    self._rows = rows
+        return self._rows
+
+    async def _load_from_service(self, platform: str) -> List[Dict[str, Any]]:
+        if platform == "twitter":
+            from twitter_mcp.accounts import TwitterAccountService
+            return await TwitterAccountService(self.db).get_accounts_for_agent(self.user_id, self.agent_id)
+        if platform == "instagram":
+            from instagram_mcp.accounts import InstagramAccountService
+            return await InstagramAccountService(self.db).get_accounts_for_agent(self.user_id, self.agent_id)
+        if platform == "linkedin":
+            from linkedin_mcp.accounts import LinkedInAccountService
+            return await LinkedInAccountService(self.db).get_accounts_for_agent(self.user_id, self.agent_id)
+        if platform == "tiktok":
+            from tiktok_mcp.accounts import TikTokAccountService
+            return await TikTokAccountService(self.db).get_accounts_for_agent(self.user_id, self.agent_id)
+        # Pinterest has no separate lookup for the virtual default agent
+        return []
+
+    async def get(self, platform: str) -> List[Dict[str, Any]]:
+        """Enabled accounts of ``platform`` for this agent, in the shape its tool expects."""
+        if not self.user_id or not self.agent_id:
+            return []
+        try:
+            if platform in BATCHED_PLATFORMS and self.agent_id != "suna-default":
+                rows = await self._load_batched_rows()
+                format_account = _formatter(platform)
+                accounts = [format_account(row) for row in rows.get(platform, [])]
+            else:
+                accounts = await self._load_from_service(platform)
+        except Exception as e:
+            logger.warning(f"Could not load {platform} accounts for agent {self.agent_id}: {e}")
+            return []
+        logger.info(f"Loaded {len(accounts)} enabled {platform} accounts for agent {self.agent_id}")
+        return accounts
@@ -138,6 +138,8 @@ class AgentConfigTool(AgentBuilderBaseTool):
                 result = await client.table('agents').update(agent_update_fields).eq('agent_id', self.agent_id).execute()
                 if not result.data:
                     return self.fail_response("Failed to update agent")
+                from agent.config_snapshot import invalidate_agent_config
+                await invalidate_agent_config(self.agent_id)
             
             version_created = False
             if config_changed:
@@ -53,12 +53,10 @@ class MCPSearchTool(AgentBuilderBaseTool):
             integration_service = get_integration_service()
             
             if query:
-                toolkits = await integration_service.search_toolkits(query, category=category)
+                result = await integration_service.search_toolkits(query, category=category, limit=limit)
             else:
-                toolkits = await toolkit_service.list_toolkits(limit=limit, category=category)
-            
-            if len(toolkits) > limit:
-                toolkits = toolkits[:limit]
+                result = await toolkit_service.list_catalog_toolkits(limit=limit, category=category)
+            toolkits = result.get("items", [])
             
             formatted_toolkits = []
             for toolkit in toolkits:
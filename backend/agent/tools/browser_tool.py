@@ -2,13 +2,10 @@ from agentpress.tool import ToolResult, openapi_schema, usage_example
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
-from utils.s3_upload_utils import upload_base64_image
+from agent.tools.utils.browser_screenshots import process_screenshot, screenshot_options
 import asyncio
 import json
-import base64
-import io
 import traceback
-from PIL import Image
 from utils.config import config
 
 class BrowserTool(SandboxToolsBase):
@@ -30,74 +27,6 @@ class BrowserTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
     
-    def _validate_base64_image(self, base64_string: str, max_size_mb: int = 10) -> tuple[bool, str]:
-        """
-        Comprehensive validation of base64 image data.
-        
-        Args:
-            base64_string (str): The base64 encoded image data
-            max_size_mb (int): Maximum allowed image size in megabytes
-            
-        Returns:
-            tuple[bool, str]: (is_valid, error_message)
-        """
-        try:
-            # Check if data exists and has reasonable length
-            if not base64_string or len(base64_string) < 10:
-                return False, "Base64 string is empty or too short"
-            
-            # Remove data URL prefix if present (data:image/jpeg;base64,...)
-            if base64_string.startswith('data:'):
-                try:
-                    base64_string = base64_string.split(',', 1)[1]
-                except (IndexError, ValueError):
-                    return False, "Invalid data URL format"
-            
-            # Check if string contains only valid base64 characters
-            # Base64 alphabet: A-Z, a-z, 0-9, +, /, = (padding)
-            import re
-            if not re.match(r'^[A-Za-z0-9+/]*={0,2}$', base64_string):
-                return False, "Invalid base64 characters detected"
-            
-            # Check if base64 string length is valid (must be multiple of 4)
-            if len(base64_string) % 4 != 0:
-                return False, "Invalid base64 string length"
-            
-            # Attempt to decode base64
-            try:
-                image_data = base64.b64decode(base64_string, validate=True)
-            except Exception as e:
-                return False, f"Base64 decoding failed: {str(e)}"
-            
-            # Check decoded data size
-            if len(image_data) == 0:
-                return False, "Decoded image data is empty"
-            
-            # Check if decoded data size exceeds limit
-            max_size_bytes = max_size_mb * 1024 * 1024
-            if len(image_data) > max_size_bytes:
-                return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
-            
-            # Validate that decoded data is actually a valid image using PIL
-            try:
-                image_stream = io.BytesIO(image_data)
-                with Image.open(image_stream) as img:
-                    # Verify the image by attempting to load it
-                    img.verify()
-                    
-                    # Check if image format is supported
-                    supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
-                    if img.format not in supported_formats:
-                        return False, f"Unsupported image format: {img.format}"
-                    
-                    return True, "Image validation successful"
-                    
-            except Exception as e:
-                return False, f"Image validation failed: {str(e)}"
-                
-        except Exception as e:
-            return False, f"Image validation error: {str(e)}"
-    
     async def _debug_sandbox_services(self) -> str:
         """Debug method to check what services are running in the sandbox"""
         try:
@@ -203,6 +132,8 @@ class BrowserTool(SandboxToolsBase):
                 curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
             else:
                 curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
+                # Have the screenshot written to a file rather than inlined as base64
+                params = {**(params or {}), "screenshot": screenshot_options(self.thread_id)}
                 if params:
                     json_data = json.dumps(params)
                     curl_cmd += f" -d '{json_data}'"
@@ -218,25 +149,7 @@ class BrowserTool(SandboxToolsBase):
 
                     logger.debug("Stagehand API request completed successfully")
 
-                    if "screenshot_base64" in result:
-                        try:
-                            screenshot_data = result["screenshot_base64"]
-                            is_valid, validation_message = self._validate_base64_image(screenshot_data)
-                            
-                            if is_valid:
-                                logger.debug(f"Screenshot validation passed: {validation_message}")
-                                image_url = await upload_base64_image(screenshot_data)
-                                result["image_url"] = image_url
-                                logger.debug(f"Uploaded screenshot to {image_url}")
-                            else:
-                                logger.warning(f"Screenshot validation failed: {validation_message}")
-                                result["image_validation_error"] = validation_message
-                                
-                            del result["screenshot_base64"]
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to process screenshot: {e}")
-                            result["image_upload_error"] = str(e)
+                    await process_screenshot(self.sandbox, result)
 
                     added_message = await self.thread_manager.add_message(
                         thread_id=self.thread_id,
@@ -4,6 +4,8 @@ from agent.tools.data_providers.RapidDataProviderBase import RapidDataProviderBa
 
 
 class ActiveJobsProvider(RapidDataProviderBase):
+    default_cache_ttl = 60 * 60
+
     def __init__(self):
         endpoints: Dict[str, EndpointSchema] = {
             "active_jobs": {
@@ -39,19 +41,24 @@ class ActiveJobsProvider(RapidDataProviderBase):
 
 
 if __name__ == "__main__":
+    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
-    tool = ActiveJobsProvider()
-
-    # Example for searching active jobs
-    jobs = tool.call_endpoint(
-        route="active_jobs",
-        payload={
-            "limit": "10",
-            "offset": "0",
-            "title_filter": "\"Data Engineer\"",
-            "location_filter": "\"United States\" OR \"United Kingdom\"",
-            "description_type": "text"
-        }
-    )
-    print("Active Jobs:", jobs)
\ No newline at end of file
+
+    async def main():
+        tool = ActiveJobsProvider()
+
+        # Example for searching active jobs
+        jobs = await tool.call_endpoint(
+            route="active_jobs",
+            payload={
+                "limit": "10",
+                "offset": "0",
+                "title_filter": "\"Data Engineer\"",
+                "location_filter": "\"United States\" OR \"United Kingdom\"",
+                "description_type": "text"
+            }
+        )
+        print("Active Jobs:", jobs)
+
+    asyncio.run(main())
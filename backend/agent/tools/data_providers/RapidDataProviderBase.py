@@ -1,7 +1,16 @@
+import asyncio
+import hashlib
+import json
 import os
-import requests
+import random
+import time
 from typing import Dict, Any, Optional, TypedDict, Literal
 
+import httpx
+
+from utils.cache import Cache
+from utils.logger import logger
+
 
 class EndpointSchema(TypedDict):
     route: str
@@ -11,27 +20,144 @@ class EndpointSchema(TypedDict):
     payload: Dict[str, Any]
 
 
+REQUEST_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# One connection pool for every provider; RapidAPI hosts are few and reused a lot
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+class RateLimiter:
+    """Caps concurrent requests and spaces request starts to ``per_second``."""
+
+    def __init__(self, per_second: float, max_concurrency: int):
+        self._interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_start = 0.0
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+    async def __aenter__(self):
+        self._bind()
+        await self._semaphore.acquire()
+        if self._interval:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_start - now
+                self._next_start = max(now, self._next_start) + self._interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+class _UncachedResponse(Exception):
+    """Carries a non-2xx response body out of the cache loader without caching it."""
+
+    def __init__(self, data: Any):
+        self.data = data
+
+
 class RapidDataProviderBase:
+    # Per-provider limits, overridden by subclasses to match their RapidAPI plans
+    requests_per_second: float = 5.0
+    max_concurrency: int = 5
+    # Seconds a response stays fresh; routes missing from cache_ttls use default_cache_ttl (0 disables)
+    default_cache_ttl: int = 15 * 60
+    cache_ttls: Dict[str, int] = {}
+
     def __init__(self, base_url: str, endpoints: Dict[str, EndpointSchema]):
         self.base_url = base_url
         self.endpoints = endpoints
-    
+        self.rate_limiter = RateLimiter(self.requests_per_second, self.max_concurrency)
+
     def get_endpoints(self):
         return self.endpoints
-    
-    def call_endpoint(
+
+    def _cache_key(self, route: str, payload: Optional[Dict[str, Any]]) -> str:
+        # Query parameters are strings on the wire, so 1 and "1" are the same request
+        normalized = {
+            str(k): v if isinstance(v, (dict, list)) else str(v)
+            for k, v in (payload or {}).items()
+            if v is not None
+        }
+        digest = hashlib.sha256(
+            f"{self.base_url}|{route}|{json.dumps(normalized, sort_keys=True)}".encode()
+        ).hexdigest()
+        return f"rapid_data_provider:{self.__class__.__name__}:{route}:{digest[:32]}"
+
+    async def _request(self, url: str, method: str, payload: Optional[Dict[str, Any]]) -> httpx.Response:
+        headers = {
+            "x-rapidapi-key": os.getenv("RAPID_API_KEY"),
+            "x-rapidapi-host": url.split("//")[1].split("/")[0],
+            "Content-Type": "application/json"
+        }
+        client = get_http_client()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                async with self.rate_limiter:
+                    if method == 'GET':
+                        response = await client.get(url, params=payload, headers=headers)
+                    else:
+                        response = await client.post(url, json=payload, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                logger.warning(f"RapidAPI request to {url} failed ({e!r}), retrying")
+                await asyncio.sleep(RETRY_BASE_DELAY * 2 ** (attempt - 1) + random.random() * 0.1)
+                continue
+
+            if response.status_code in RETRYABLE_STATUS and attempt < MAX_ATTEMPTS:
+                try:
+                    delay = float(response.headers.get("Retry-After", ""))
+                except ValueError:
+                    delay = RETRY_BASE_DELAY * 2 ** (attempt - 1) + random.random() * 0.1
+                logger.warning(f"RapidAPI request to {url} returned {response.status_code}, retrying in {delay:.1f}s")
+                await asyncio.sleep(min(delay, 10.0))
+                continue
+            return response
+        return response
+
+    async def call_endpoint(
             self,
             route: str,
             payload: Optional[Dict[str, Any]] = None
     ):
         """
         Call an API endpoint with the given parameters and data.
-        
+
+        Successful responses are cached for the route's TTL (see ``cache_ttls``),
+        and identical concurrent calls share one upstream request.
+
         Args:
-            endpoint (EndpointSchema): The endpoint configuration dictionary
-            params (dict, optional): Query parameters for GET requests
-            payload (dict, optional): JSON payload for POST requests
-            
+            route (str): The key of the endpoint to call
+            payload (dict, optional): Query parameters for GET requests or JSON payload for POST requests
+
         Returns:
             dict: The JSON response from the API
         """
@@ -41,21 +167,28 @@ class RapidDataProviderBase:
         endpoint = self.endpoints.get(route)
         if not endpoint:
             raise ValueError(f"Endpoint {route} not found")
-        
+
         url = f"{self.base_url}{endpoint['route']}"
-        
-        headers = {
-            "x-rapidapi-key": os.getenv("RAPID_API_KEY"),
-            "x-rapidapi-host": url.split("//")[1].split("/")[0],
-            "Content-Type": "application/json"
-        }
 
         method = endpoint.get('method', 'GET').upper()
-        
-        if method == 'GET':
-            response = requests.get(url, params=payload, headers=headers)
-        elif method == 'POST':
-            response = requests.post(url, json=payload, headers=headers)
-        else:
+        if method not in ('GET', 'POST'):
             raise ValueError(f"Unsupported HTTP method: {method}")
-        return response.json()
+
+        async def load():
+            response = await self._request(url, method, payload)
+            data = response.json()
+            if not response.is_success:
+                raise _UncachedResponse(data)
+            return data
+
+        ttl = self.cache_ttls.get(route, self.default_cache_ttl)
+        if ttl <= 0:
+            try:
+                return await load()
+            except _UncachedResponse as e:
+                return e.data
+
+        try:
+            return await Cache.get_or_load(self._cache_key(route, payload), load, ttl=ttl, stale_ttl=ttl // 10)
+        except _UncachedResponse as e:
+            return e.data
@@ -5,11 +5,11 @@ import aiohttp
 import json
 import os
 import re
-import jwt
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta, timezone
 from agentpress.tool import Tool, ToolResult, openapi_schema
 from utils.logger import logger
+from utils.jwt_verifier import create_user_jwt
 
 
 class PinterestTool(Tool):
@@ -39,18 +39,11 @@ class PinterestTool(Tool):
     
     def _create_jwt_token(self) -> str:
         """Create a JWT token for API authentication"""
-        jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
-        if not jwt_secret:
+        token = create_user_jwt(self.user_id)
+        if not token:
             logger.warning("SUPABASE_JWT_SECRET not set, authentication may fail")
             return ""
-        
-        payload = {
-            "sub": self.user_id,
-            "user_id": self.user_id,
-            "role": "authenticated"
-        }
-        
-        return jwt.encode(payload, jwt_secret, algorithm="HS256")
+        return token
     
     async def _check_enabled_accounts(self) -> tuple[bool, List[Dict[str, Any]], str]:
         """Query the universal integrations system for enabled Pinterest accounts."""
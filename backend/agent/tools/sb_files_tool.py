@@ -1,6 +1,7 @@
 from agentpress.tool import ToolResult, openapi_schema, usage_example
 from sandbox.tool_base import SandboxToolsBase
 from utils.files_utils import should_exclude_file, clean_path
+from agent.tools.utils.sandbox_files import REMOTE_EDIT_THRESHOLD, SandboxFileOps, StaleFileError
 from agentpress.thread_manager import ThreadManager
 from utils.logger import logger
 from utils.config import config
@@ -18,6 +19,7 @@ class SandboxFilesTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.SNIPPET_LINES = 4  # Number of context lines to show around edits
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
+        self._file_ops: Optional[SandboxFileOps] = None
 
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace"""
@@ -29,11 +31,21 @@ class SandboxFilesTool(SandboxToolsBase):
 
     async def _file_exists(self, path: str) -> bool:
         """Check if a file exists in the sandbox"""
+        return await self._file_info(path) is not None
+
+    async def _file_info(self, path: str):
+        """File info from the sandbox, or None if the file does not exist"""
         try:
-            await self.sandbox.fs.get_file_info(path)
-            return True
+            return await self.sandbox.fs.get_file_info(path)
         except Exception:
-            return False
+            return None
+
+    @property
+    def file_ops(self) -> SandboxFileOps:
+        """Editing engine (and read cache) bound to the current sandbox"""
+        if self._file_ops is None or self._file_ops.sandbox is not self.sandbox:
+            self._file_ops = SandboxFileOps(self.sandbox)
+        return self._file_ops
 
     async def get_workspace_state(self) -> dict:
         """Get the current workspace state by reading all files"""
@@ -125,21 +137,15 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if await self._file_exists(full_path):
-                return self.fail_response(f"File '{file_path}' already exists. Use update_file to modify existing files.")
-            
-            # Create parent directories if needed
-            parent_dir = '/'.join(full_path.split('/')[:-1])
-            if parent_dir:
-                await self.sandbox.fs.create_folder(parent_dir, "755")
             
             # convert to json string if file_contents is a dict
             if isinstance(file_contents, dict):
                 file_contents = json.dumps(file_contents, indent=4)
             
-            # Write the file content
-            await self.sandbox.fs.upload_file(file_contents.encode(), full_path)
-            await self.sandbox.fs.set_file_permissions(full_path, permissions)
+            # Existence check, parent directories, content and permissions in one sandbox call
+            result = await self.file_ops.write(full_path, file_contents.encode(), mode=permissions, exists=False)
+            if result.get("error") == "exists":
+                return self.fail_response(f"File '{file_path}' already exists. Use update_file to modify existing files.")
             
             message = f"File '{file_path}' created successfully."
             
@@ -198,13 +204,28 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if not await self._file_exists(full_path):
+            info = await self._file_info(full_path)
+            if info is None:
                 return self.fail_response(f"File '{file_path}' does not exist")
             
-            content = (await self.sandbox.fs.download_file(full_path)).decode()
             old_str = old_str.expandtabs()
             new_str = new_str.expandtabs()
             
+            if info.size >= REMOTE_EDIT_THRESHOLD and self.file_ops.cached(full_path, info) is None:
+                # Large file we don't have locally: replace inside the sandbox instead of transferring it
+                result = await self.file_ops.replace(full_path, old_str.encode(), new_str.encode())
+                if result.get("error") == "not_found":
+                    return self.fail_response(f"String '{old_str}' not found in file")
+                if result.get("error") == "multiple":
+                    return self.fail_response(f"Multiple occurrences found in lines {result['lines']}. Please ensure string is unique")
+                if result.get("error") == "missing":
+                    return self.fail_response(f"File '{file_path}' does not exist")
+                return self.success_response("Replacement successful.")
+            
+            from_cache = self.file_ops.cached(full_path, info) is not None
+            original = await self.file_ops.read(full_path, info)
+            content = original.decode()
+            
             occurrences = content.count(old_str)
             if occurrences == 0:
                 return self.fail_response(f"String '{old_str}' not found in file")
@@ -214,7 +235,13 @@ class SandboxFilesTool(SandboxToolsBase):
             
             # Perform replacement
             new_content = content.replace(old_str, new_str)
-            await self.sandbox.fs.upload_file(new_content.encode(), full_path)
+            try:
+                await self.file_ops.update(full_path, original, new_content.encode())
+            except StaleFileError:
+                if not from_cache:
+                    raise
+                # Changed underneath the cached copy; redo the edit against the current file
+                return await self.str_replace(file_path, old_str, new_str)
             
             # Show snippet around the edit
             replacement_line = content.split(old_str)[0].count('\n')
@@ -279,11 +306,23 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if not await self._file_exists(full_path):
+            info = await self._file_info(full_path)
+            if info is None:
                 return self.fail_response(f"File '{file_path}' does not exist. Use create_file to create a new file.")
             
-            await self.sandbox.fs.upload_file(file_contents.encode(), full_path)
-            await self.sandbox.fs.set_file_permissions(full_path, permissions)
+            # Unchanged content is not rewritten; a cached large file only gets the changed range
+            data = file_contents.encode()
+            original = self.file_ops.cached(full_path, info)
+            result = None
+            if original is not None:
+                try:
+                    result = await self.file_ops.update(full_path, original, data, mode=permissions)
+                except StaleFileError:
+                    result = None
+            if result is None:
+                result = await self.file_ops.write(full_path, data, mode=permissions, exists=True)
+            if result.get("error") == "missing":
+                return self.fail_response(f"File '{file_path}' does not exist. Use create_file to create a new file.")
             
             message = f"File '{file_path}' completely rewritten successfully."
             
@@ -488,11 +527,13 @@ def authenticate_user(username, password):
             
             target_file = self.clean_path(target_file)
             full_path = f"{self.workspace_path}/{target_file}"
-            if not await self._file_exists(full_path):
+            info = await self._file_info(full_path)
+            if info is None:
                 return self.fail_response(f"File '{target_file}' does not exist")
             
-            # Read current content
-            original_content = (await self.sandbox.fs.download_file(full_path)).decode()
+            # Read current content (reused from earlier reads in this run while unchanged)
+            original_bytes = await self.file_ops.read(full_path, info)
+            original_content = original_bytes.decode()
             
             # Try Morph AI editing first
             logger.debug(f"Attempting AI-powered edit for file '{target_file}' with instructions: {instructions[:100]}...")
@@ -522,8 +563,8 @@ def authenticate_user(username, password):
                     "updated_content": original_content
                 }))
 
-            # AI editing successful
-            await self.sandbox.fs.upload_file(new_content.encode(), full_path)
+            # AI editing successful; large files only get the changed range written
+            await self.file_ops.update(full_path, original_bytes, new_content.encode())
             
             # Return rich data for frontend diff view
             return ToolResult(success=True, output=json.dumps({
@@ -539,8 +580,9 @@ def authenticate_user(username, password):
             original_content_on_error = None
             try:
                 full_path_on_error = f"{self.workspace_path}/{self.clean_path(target_file)}"
-                if await self._file_exists(full_path_on_error):
-                    original_content_on_error = (await self.sandbox.fs.download_file(full_path_on_error)).decode()
+                info_on_error = await self._file_info(full_path_on_error)
+                if info_on_error is not None:
+                    original_content_on_error = (await self.file_ops.read(full_path_on_error, info_on_error)).decode()
             except:
                 pass
             
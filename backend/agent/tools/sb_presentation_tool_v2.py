@@ -21,6 +21,11 @@ import re
 import asyncio
 import random
 import httpx
+from daytona_sdk import FileUpload
+
+
+# Concurrent image downloads per deck
+IMAGE_FETCH_CONCURRENCY = 6
 
 
 class SandboxPresentationToolV2(SandboxToolsBase):
@@ -46,91 +51,135 @@ class SandboxPresentationToolV2(SandboxToolsBase):
         
         return image_url
     
-    async def _download_and_cache_image(self, image_url: str, presentation_dir: str) -> Optional[str]:
-        """Download an image and cache it locally. Returns the relative path from workspace root."""
-        if not image_url:
-            return None
-            
-        # Check if already cached
-        if image_url in self.images_cache:
-            return self.images_cache[image_url]
-        
+    @staticmethod
+    def _image_filename(image_url: str) -> str:
+        return f"img_{hashlib.md5(image_url.encode()).hexdigest()[:8]}.jpg"
+
+    @staticmethod
+    def _normalize_image(image_data: bytes) -> bytes:
+        """Re-encode as RGB JPEG; returns the input unchanged if it can't be decoded."""
         try:
-            download_url = self._get_display_url(image_url)
-            
-            # Generate unique filename based on URL
-            url_hash = hashlib.md5(image_url.encode()).hexdigest()[:8]
-            images_dir = f"{presentation_dir}/images"
-            full_images_dir = f"{self.workspace_path}/{images_dir}"
-            
-            # Ensure images directory exists
-            try:
-                await self.sandbox.fs.create_folder(full_images_dir, "755")
-            except:
-                pass
-            
-            image_data: bytes | None = None
+            img = Image.open(io.BytesIO(image_data))
+            output = io.BytesIO()
+            
+            # Convert to RGB if necessary
+            if img.mode in ("RGBA", "LA", "P"):
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                if img.mode == "P":
+                    img = img.convert("RGBA")
+                background.paste(img, mask=img.split()[-1] if img.mode in ("RGBA", "LA") else None)
+                img = background
+            else:
+                img = img.convert("RGB")
             
-            # Try to download the image
+            img.save(output, format="JPEG", quality=90)
+            return output.getvalue()
+        except Exception:
+            # If image processing fails, save as-is
+            return image_data
+
+    async def _fetch_image(self, client: httpx.AsyncClient, image_url: str) -> Optional[bytes]:
+        download_url = self._get_display_url(image_url)
+        try:
+            resp = await client.get(download_url)
+            resp.raise_for_status()
+            return resp.content
+        except Exception:
+            pass
+
+        # Fallback to curl inside the sandbox if httpx fails
+        try:
+            tmp_path = f"/tmp/{self._image_filename(image_url)}"
+            cmd = f"/bin/sh -c 'curl -fsSL -A \"Mozilla/5.0\" \"{download_url}\" -o {tmp_path}'"
+            res = await self.sandbox.process.exec(cmd, timeout=30)
+            if getattr(res, "exit_code", 1) == 0:
+                image_data = await self.sandbox.fs.download_file(tmp_path)
+                try:
+                    await self.sandbox.process.exec(f"/bin/sh -c 'rm -f {tmp_path}'", timeout=10)
+                except:
+                    pass
+                return image_data
+        except Exception:
+            pass
+        return None
+
+    async def _acquire_images(self, image_urls: List[str], presentation_dir: str) -> Dict[str, str]:
+        """
+        Make every image available under ``{presentation_dir}/images``.
+
+        URLs are deduplicated; files already in the sandbox (same URL hash) are reused,
+        the rest are fetched concurrently over one client and uploaded in one batch.
+        Returns url -> path relative to the workspace for the images that succeeded.
+        """
+        paths: Dict[str, str] = {}
+        pending = []
+        for image_url in dict.fromkeys(url for url in image_urls if url):
+            if image_url in self.images_cache:
+                paths[image_url] = self.images_cache[image_url]
+            else:
+                pending.append(image_url)
+        if not pending:
+            return paths
+
+        images_dir = f"{presentation_dir}/images"
+        full_images_dir = f"{self.workspace_path}/{images_dir}"
+        try:
+            await self.sandbox.fs.create_folder(full_images_dir, "755")
+        except:
+            pass
+
+        try:
+            existing = {file.name for file in await self.sandbox.fs.list_files(full_images_dir)}
+        except Exception:
+            existing = set()
+
+        to_fetch = []
+        for image_url in pending:
+            filename = self._image_filename(image_url)
+            if filename in existing:
+                paths[image_url] = self.images_cache[image_url] = f"{images_dir}/{filename}"
+            else:
+                to_fetch.append(image_url)
+
+        if to_fetch:
+            semaphore = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
             headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-            try:
-                async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as client:
-                    resp = await client.get(download_url, headers=headers)
-                    resp.raise_for_status()
-                    image_data = resp.content
-            except Exception as e:
-                # Fallback to curl if httpx fails
+
+            async with httpx.AsyncClient(follow_redirects=True, timeout=20.0, headers=headers) as client:
+                async def fetch(image_url: str) -> Optional[bytes]:
+                    async with semaphore:
+                        image_data = await self._fetch_image(client, image_url)
+                    if not image_data:
+                        print(f"Failed to download image from {self._get_display_url(image_url)}")
+                        return None
+                    return await asyncio.to_thread(self._normalize_image, image_data)
+
+                results = await asyncio.gather(*(fetch(image_url) for image_url in to_fetch))
+
+            uploads = {}
+            for image_url, image_data in zip(to_fetch, results):
+                if image_data:
+                    uploads[image_url] = FileUpload(
+                        source=image_data,
+                        destination=f"{full_images_dir}/{self._image_filename(image_url)}"
+                    )
+            if uploads:
                 try:
-                    tmp_path = f"/tmp/img_{url_hash}"
-                    cmd = f"/bin/sh -c 'curl -fsSL -A \"Mozilla/5.0\" \"{download_url}\" -o {tmp_path}'"
-                    res = await self.sandbox.process.exec(cmd, timeout=30)
-                    if getattr(res, "exit_code", 1) == 0:
-                        image_data = await self.sandbox.fs.download_file(tmp_path)
-                        try:
-                            await self.sandbox.process.exec(f"/bin/sh -c 'rm -f {tmp_path}'", timeout=10)
-                        except:
-                            pass
-                except Exception:
-                    image_data = None
-            
-            if not image_data:
-                print(f"Failed to download image from {download_url}")
-                return None
-            
-            # Process and save the image
-            try:
-                img = Image.open(io.BytesIO(image_data))
-                output = io.BytesIO()
-                
-                # Convert to RGB if necessary
-                if img.mode in ("RGBA", "LA", "P"):
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    if img.mode == "P":
-                        img = img.convert("RGBA")
-                    background.paste(img, mask=img.split()[-1] if img.mode in ("RGBA", "LA") else None)
-                    img = background
-                else:
-                    img = img.convert("RGB")
-                
-                img.save(output, format="JPEG", quality=90)
-                image_data = output.getvalue()
-                filename = f"img_{url_hash}.jpg"
-            except Exception:
-                # If image processing fails, save as-is
-                filename = f"img_{url_hash}.jpg"
-            
-            # Save the image
-            image_path = f"{images_dir}/{filename}"
-            full_image_path = f"{self.workspace_path}/{image_path}"
-            await self.sandbox.fs.upload_file(image_data, full_image_path)
-            
-            # Cache and return the relative path
-            self.images_cache[image_url] = image_path
-            return image_path
-            
-        except Exception as e:
-            print(f"Failed to download image {image_url}: {e}")
+                    await self.sandbox.fs.upload_files(list(uploads.values()))
+                except Exception as e:
+                    print(f"Failed to upload presentation images: {e}")
+                    uploads = {}
+            for image_url in uploads:
+                paths[image_url] = self.images_cache[image_url] = f"{images_dir}/{self._image_filename(image_url)}"
+
+        return paths
+
+    async def _download_and_cache_image(self, image_url: str, presentation_dir: str) -> Optional[str]:
+        """Download an image and cache it locally. Returns the relative path from workspace root."""
+        if not image_url:
             return None
+        paths = await self._acquire_images([image_url], presentation_dir)
+        return paths.get(image_url)
 
     def _safe_name_variants(self, name: str) -> List[str]:
         """Generate safe name variants for file/folder naming."""
@@ -147,8 +196,25 @@ class SandboxPresentationToolV2(SandboxToolsBase):
                 variants.append(v)
         return variants
     
-    async def _process_slide_images(self, slide: Dict, presentation_dir: str) -> Dict:
-        """Process all images in a slide and download them if needed."""
+    @staticmethod
+    def _slide_image_urls(slide: Dict) -> List[str]:
+        """URLs of the images in a slide that don't have a local copy yet."""
+        content = slide.get("content", {})
+        urls = []
+        image_info = content.get("image")
+        if isinstance(image_info, str):
+            urls.append(image_info)
+        elif isinstance(image_info, dict) and "url" in image_info and "local_path" not in image_info:
+            urls.append(image_info["url"])
+        for img in content.get("images", []) or []:
+            if isinstance(img, str):
+                urls.append(img)
+            elif isinstance(img, dict) and "url" in img and "local_path" not in img:
+                urls.append(img["url"])
+        return urls
+
+    def _apply_slide_images(self, slide: Dict, image_paths: Dict[str, str]) -> Dict:
+        """Point the images in a slide at their downloaded copies."""
         content = slide.get("content", {})
         
         # Process single image
@@ -156,28 +222,22 @@ class SandboxPresentationToolV2(SandboxToolsBase):
             image_info = content["image"]
             if isinstance(image_info, str):
                 # Convert string to dict format
-                local_path = await self._download_and_cache_image(image_info, presentation_dir)
+                local_path = image_paths.get(image_info)
                 if local_path:
                     content["image"] = {
                         "url": image_info,
                         "local_path": local_path
                     }
             elif isinstance(image_info, dict) and "url" in image_info:
-                # Download if not already downloaded
-                if "local_path" not in image_info:
-                    local_path = await self._download_and_cache_image(
-                        image_info["url"], 
-                        presentation_dir
-                    )
-                    if local_path:
-                        image_info["local_path"] = local_path
+                if "local_path" not in image_info and image_info["url"] in image_paths:
+                    image_info["local_path"] = image_paths[image_info["url"]]
         
         # Process image grid
         if "images" in content:
             processed_images = []
             for img in content["images"]:
                 if isinstance(img, str):
-                    local_path = await self._download_and_cache_image(img, presentation_dir)
+                    local_path = image_paths.get(img)
                     if local_path:
                         processed_images.append({
                             "url": img,
@@ -186,13 +246,8 @@ class SandboxPresentationToolV2(SandboxToolsBase):
                     else:
                         processed_images.append({"url": img})
                 elif isinstance(img, dict):
-                    if "url" in img and "local_path" not in img:
-                        local_path = await self._download_and_cache_image(
-                            img["url"],
-                            presentation_dir
-                        )
-                        if local_path:
-                            img["local_path"] = local_path
+                    if "url" in img and "local_path" not in img and img["url"] in image_paths:
+                        img["local_path"] = image_paths[img["url"]]
                     processed_images.append(img)
             content["images"] = processed_images
         
@@ -431,14 +486,22 @@ class SandboxPresentationToolV2(SandboxToolsBase):
             except:
                 pass
             
-            # Process all images in slides (download them during creation)
+            # Download every image in the deck up front (deduplicated, concurrently)
             download_errors = []
             processed_slides = []
             
+            try:
+                image_paths = await self._acquire_images(
+                    [url for slide in slides for url in self._slide_image_urls(slide)],
+                    presentation_dir
+                )
+            except Exception as e:
+                download_errors.append(f"Error processing slide images: {str(e)}")
+                image_paths = {}
+            
             for slide in slides:
                 try:
-                    processed_slide = await self._process_slide_images(slide.copy(), presentation_dir)
-                    processed_slides.append(processed_slide)
+                    processed_slides.append(self._apply_slide_images(slide.copy(), image_paths))
                 except Exception as e:
                     download_errors.append(f"Error processing slide images: {str(e)}")
                     processed_slides.append(slide)
@@ -1358,35 +1421,13 @@ class SandboxPresentationToolV2(SandboxToolsBase):
             
             # Images should already be downloaded, but check and download any missing ones
             presentation_dir = f"{self.presentations_dir}/{resolved_name}"
-            download_errors = []
-            
+            missing_urls = [url for slide in presentation_data["slides"] for url in self._slide_image_urls(slide)]
+            image_paths = await self._acquire_images(missing_urls, presentation_dir)
             for slide in presentation_data["slides"]:
-                content = slide.get("content", {})
-                
-                # Check for missing images and download them
-                if "image" in content:
-                    image_info = content["image"]
-                    if isinstance(image_info, dict) and "url" in image_info and "local_path" not in image_info:
-                        local_path = await self._download_and_cache_image(
-                            image_info["url"], 
-                            presentation_dir
-                        )
-                        if local_path:
-                            image_info["local_path"] = local_path
-                        else:
-                            download_errors.append(f"Failed to download image: {image_info.get('url', 'unknown')}")
-                
-                if "images" in content:
-                    for img in content["images"]:
-                        if isinstance(img, dict) and "url" in img and "local_path" not in img:
-                            local_path = await self._download_and_cache_image(
-                                img["url"],
-                                presentation_dir
-                            )
-                            if local_path:
-                                img["local_path"] = local_path
-                            else:
-                                download_errors.append(f"Failed to download image: {img.get('url', 'unknown')}")
+                self._apply_slide_images(slide, image_paths)
+            download_errors = [
+                f"Failed to download image: {url}" for url in dict.fromkeys(missing_urls) if url not in image_paths
+            ]
             
             # Create PPTX
             pptx_bytes = await self._create_pptx_from_json(presentation_data)
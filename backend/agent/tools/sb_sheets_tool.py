@@ -1,15 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import csv
 import io
 import json
 from dataclasses import dataclass
 from io import BytesIO
-from statistics import mean
 from typing import Any, Dict, List, Optional, Tuple
 
-import chardet
 from agentpress.tool import ToolResult, openapi_schema, usage_example
+from agent.tools.utils.sheet_table import AGGREGATIONS, SheetTable
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
 
@@ -32,6 +32,8 @@ class SheetData:
 class SandboxSheetsTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_manager):
         super().__init__(project_id, thread_manager)
+        # Parsed tables for this run, keyed by (full_path, sheet_name) and checked against the file's mtime
+        self._tables: Dict[Tuple[str, Optional[str]], Tuple[Any, SheetTable]] = {}
 
     async def _file_exists(self, full_path: str) -> bool:
         try:
@@ -44,26 +46,14 @@ class SandboxSheetsTool(SandboxToolsBase):
         return await self.sandbox.fs.download_file(full_path)
 
     async def _upload_bytes(self, full_path: str, data: bytes, permissions: str = "644") -> None:
+        for key in [k for k in self._tables if k[0] == full_path]:
+            del self._tables[key]
         await self.sandbox.fs.upload_file(data, full_path)
         await self.sandbox.fs.set_file_permissions(full_path, permissions)
 
-    def _detect_encoding(self, data: bytes) -> str:
-        try:
-            result = chardet.detect(data)
-            return result.get("encoding") or "utf-8"
-        except Exception:
-            return "utf-8"
-
     def _read_csv_bytes(self, data: bytes) -> SheetData:
-        encoding = self._detect_encoding(data)
-        text = data.decode(encoding, errors="replace")
-        reader = csv.reader(io.StringIO(text))
-        rows = [list(r) for r in reader]
-        if not rows:
-            return SheetData(headers=[], rows=[])
-        headers = [str(h) for h in rows[0]]
-        data_rows = rows[1:] if len(rows) > 1 else []
-        return SheetData(headers=headers, rows=data_rows)
+        table = SheetTable.from_csv_bytes(data)
+        return SheetData(headers=table.headers, rows=table.rows())
 
     def _write_csv_bytes(self, sheet: SheetData) -> bytes:
         buf = io.StringIO()
@@ -74,17 +64,24 @@ class SandboxSheetsTool(SandboxToolsBase):
             writer.writerow(["" if v is None else v for v in r])
         return buf.getvalue().encode("utf-8")
 
-    def _read_xlsx_bytes(self, data: bytes, sheet_name: Optional[str]) -> SheetData:
+    def _read_xlsx_table(self, data: bytes, sheet_name: Optional[str]) -> SheetTable:
         if not openpyxl:
             raise RuntimeError("openpyxl not available; cannot read XLSX")
-        wb = openpyxl.load_workbook(BytesIO(data), data_only=False)
-        ws = wb[sheet_name] if sheet_name else wb.active
-        rows = [list(row) for row in ws.iter_rows(values_only=True)]
-        if not rows:
-            return SheetData(headers=[], rows=[])
-        headers = ["" if h is None else str(h) for h in rows[0]]
-        data_rows = [[c for c in r] for r in rows[1:]] if len(rows) > 1 else []
-        return SheetData(headers=headers, rows=data_rows)
+        wb = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=False)
+        try:
+            ws = wb[sheet_name] if sheet_name else wb.active
+            rows = ws.iter_rows(values_only=True)
+            header_row = next(rows, None)
+            if header_row is None:
+                return SheetTable.from_rows([], [])
+            headers = ["" if h is None else str(h) for h in header_row]
+            return SheetTable.from_rows(headers, rows)
+        finally:
+            wb.close()
+
+    def _read_xlsx_bytes(self, data: bytes, sheet_name: Optional[str]) -> SheetData:
+        table = self._read_xlsx_table(data, sheet_name)
+        return SheetData(headers=table.headers, rows=table.rows())
 
     def _write_xlsx_bytes(self, sheet: SheetData, sheet_name: Optional[str]) -> bytes:
         if not openpyxl:
@@ -101,15 +98,33 @@ class SandboxSheetsTool(SandboxToolsBase):
         wb.save(out)
         return out.getvalue()
 
-    async def _load_sheet(self, file_path: str, sheet_name: Optional[str]) -> Tuple[str, SheetData]:
+    async def _load_table(self, file_path: str, sheet_name: Optional[str]) -> Tuple[str, SheetTable]:
         file_path = self.clean_path(file_path)
         full_path = f"{self.workspace_path}/{file_path}"
+        if not file_path.lower().endswith((".csv", ".xlsx")):
+            raise ValueError("Unsupported file extension. Use .csv or .xlsx")
+        key = (full_path, sheet_name)
+        try:
+            mtime = (await self.sandbox.fs.get_file_info(full_path)).mod_time
+        except Exception:
+            mtime = None
+        cached = self._tables.get(key)
+        if cached and mtime is not None and cached[0] == mtime:
+            return full_path, cached[1]
         data = await self._download_bytes(full_path)
+        # Parsing large sheets is CPU bound; keep it off the event loop
         if file_path.lower().endswith(".csv"):
-            return full_path, self._read_csv_bytes(data)
-        if file_path.lower().endswith(".xlsx"):
-            return full_path, self._read_xlsx_bytes(data, sheet_name)
-        raise ValueError("Unsupported file extension. Use .csv or .xlsx")
+            table = await asyncio.to_thread(SheetTable.from_csv_bytes, data)
+        else:
+            table = await asyncio.to_thread(self._read_xlsx_table, data, sheet_name)
+        if mtime is not None:
+            self._tables[key] = (mtime, table)
+        return full_path, table
+
+    async def _load_sheet(self, file_path: str, sheet_name: Optional[str]) -> Tuple[str, SheetData]:
+        # Fresh row lists, so callers can edit them without touching the cached table
+        full_path, table = await self._load_table(file_path, sheet_name)
+        return full_path, SheetData(headers=list(table.headers), rows=table.rows())
 
     async def _save_sheet(self, file_path: str, sheet: SheetData, sheet_name: Optional[str]) -> str:
         file_path = self.clean_path(file_path)
@@ -128,35 +143,7 @@ class SandboxSheetsTool(SandboxToolsBase):
         return full_path
 
     def _infer_column_types(self, rows: List[List[Any]], headers: List[str]) -> Dict[str, str]:
-        types: Dict[str, str] = {}
-        if not headers:
-            return types
-        col_count = max((len(r) for r in rows), default=0)
-        col_count = max(col_count, len(headers))
-        for i in range(col_count):
-            col_values = [r[i] for r in rows if len(r) > i]
-            detected = "string"
-            numeric_count = 0
-            date_like = 0
-            for v in col_values:
-                if isinstance(v, (int, float)):
-                    numeric_count += 1
-                elif isinstance(v, str):
-                    v_strip = v.strip()
-                    try:
-                        float(v_strip)
-                        numeric_count += 1
-                        continue
-                    except Exception:
-                        pass
-                    if any(sep in v_strip for sep in ("-", "/")) and any(ch.isdigit() for ch in v_strip):
-                        date_like += 1
-            if numeric_count >= max(1, len(col_values) // 2):
-                detected = "number"
-            elif date_like >= max(1, len(col_values) // 2):
-                detected = "date"
-            types[headers[i] if i < len(headers) else f"col_{i+1}"] = detected
-        return types
+        return SheetTable.from_rows(headers, rows).infer_types()
 
     def _to_index_map(self, headers: List[str]) -> Dict[str, int]:
         return {h: i for i, h in enumerate(headers)}
@@ -460,20 +447,20 @@ class SandboxSheetsTool(SandboxToolsBase):
     async def view_sheet(self, file_path: str, sheet_name: Optional[str] = None, max_rows: int = 100, export_csv_path: Optional[str] = None) -> ToolResult:
         try:
             await self._ensure_sandbox()
-            full_path, sheet = await self._load_sheet(file_path, sheet_name)
+            full_path, table = await self._load_table(file_path, sheet_name)
             exported_to = None
             if export_csv_path:
                 rel = self.clean_path(export_csv_path)
                 if not rel.lower().endswith(".csv"):
                     rel += ".csv"
                 export_full = f"{self.workspace_path}/{rel}"
-                await self._upload_bytes(export_full, self._write_csv_bytes(sheet))
+                await self._upload_bytes(export_full, self._write_csv_bytes(SheetData(headers=table.headers, rows=table.rows())))
                 exported_to = export_full
-            sample_rows = sheet.rows[: max(0, max_rows)]
+            sample_rows = table.rows(0, max(0, max_rows))
             return self.success_response({
                 "file_path": full_path,
-                "headers": sheet.headers,
-                "row_count": len(sheet.rows),
+                "headers": table.headers,
+                "row_count": table.row_count,
                 "sample_rows": sample_rows,
                 "exported_csv": exported_to
             })
@@ -568,93 +555,22 @@ class SandboxSheetsTool(SandboxToolsBase):
     async def analyze_sheet(self, file_path: str, sheet_name: Optional[str] = None, target_columns: Optional[List[str]] = None, group_by: Optional[str] = None, aggregations: Optional[List[str]] = None, export_csv_path: Optional[str] = None) -> ToolResult:
         try:
             await self._ensure_sandbox()
-            full_path, sheet = await self._load_sheet(file_path, sheet_name)
-            headers = sheet.headers
+            full_path, table = await self._load_table(file_path, sheet_name)
+            headers = table.headers
             idx_map = self._to_index_map(headers)
 
-            def to_float(v: Any) -> Optional[float]:
-                if v is None:
-                    return None
-                if isinstance(v, (int, float)):
-                    return float(v)
-                try:
-                    return float(str(v).strip())
-                except Exception:
-                    return None
-
             numeric_cols = [c for c in (target_columns or headers) if c in idx_map]
             if group_by and group_by in idx_map:
-                g_idx = idx_map[group_by]
-                groups: Dict[Any, List[List[Any]]] = {}
-                for row in sheet.rows:
-                    key = row[g_idx] if len(row) > g_idx else None
-                    groups.setdefault(key, []).append(row)
                 out_headers = [group_by]
-                aggs = aggregations or ["count", "sum", "avg", "min", "max"]
+                aggs = aggregations or list(AGGREGATIONS)
                 for col in numeric_cols:
                     for agg in aggs:
                         out_headers.append(f"{col}_{agg}")
-                summary_rows: List[List[Any]] = []
-                for key, rows in groups.items():
-                    row_out = [key]
-                    for col in numeric_cols:
-                        c_idx = idx_map[col]
-                        vals = [to_float(r[c_idx]) for r in rows if len(r) > c_idx]
-                        vals = [v for v in vals if v is not None]
-                        count_v = len(vals)
-                        sum_v = sum(vals) if vals else None
-                        avg_v = mean(vals) if vals else None
-                        min_v = min(vals) if vals else None
-                        max_v = max(vals) if vals else None
-                        for agg in aggs:
-                            row_out.append({
-                                "count": count_v,
-                                "sum": sum_v,
-                                "avg": avg_v,
-                                "min": min_v,
-                                "max": max_v
-                            }[agg])
-                    summary_rows.append(row_out)
+                summary_rows = table.group_aggregate(group_by, numeric_cols, aggs)
                 result_sheet = SheetData(headers=out_headers, rows=summary_rows)
             else:
                 out_headers = ["metric"] + numeric_cols
-                rows_out: List[List[Any]] = []
-                counts = []
-                for col in numeric_cols:
-                    c_idx = idx_map[col]
-                    vals = [to_float(r[c_idx]) for r in sheet.rows if len(r) > c_idx]
-                    vals = [v for v in vals if v is not None]
-                    counts.append(len(vals))
-                rows_out.append(["count", *counts])
-                sums = []
-                for col in numeric_cols:
-                    c_idx = idx_map[col]
-                    vals = [to_float(r[c_idx]) for r in sheet.rows if len(r) > c_idx]
-                    vals = [v for v in vals if v is not None]
-                    sums.append(sum(vals) if vals else None)
-                rows_out.append(["sum", *sums])
-                avgs = []
-                for col in numeric_cols:
-                    c_idx = idx_map[col]
-                    vals = [to_float(r[c_idx]) for r in sheet.rows if len(r) > c_idx]
-                    vals = [v for v in vals if v is not None]
-                    avgs.append(mean(vals) if vals else None)
-                rows_out.append(["avg", *avgs])
-                mins = []
-                for col in numeric_cols:
-                    c_idx = idx_map[col]
-                    vals = [to_float(r[c_idx]) for r in sheet.rows if len(r) > c_idx]
-                    vals = [v for v in vals if v is not None]
-                    mins.append(min(vals) if vals else None)
-                rows_out.append(["min", *mins])
-                maxs = []
-                for col in numeric_cols:
-                    c_idx = idx_map[col]
-                    vals = [to_float(r[c_idx]) for r in sheet.rows if len(r) > c_idx]
-                    vals = [v for v in vals if v is not None]
-                    maxs.append(max(vals) if vals else None)
-                rows_out.append(["max", *maxs])
-                result_sheet = SheetData(headers=out_headers, rows=rows_out)
+                result_sheet = SheetData(headers=out_headers, rows=table.summarize(numeric_cols))
 
             exported = None
             if export_csv_path:
@@ -711,8 +627,8 @@ class SandboxSheetsTool(SandboxToolsBase):
             await self._ensure_sandbox()
             rel = self.clean_path(file_path)
             full = f"{self.workspace_path}/{rel}"
-            _, sheet = await self._load_sheet(file_path, sheet_name)
-            headers = sheet.headers
+            _, table = await self._load_table(file_path, sheet_name)
+            headers = table.headers
             idx_map = self._to_index_map(headers)
             if x_column not in idx_map:
                 return self.fail_response(f"x_column '{x_column}' not found")
@@ -732,7 +648,7 @@ class SandboxSheetsTool(SandboxToolsBase):
             ws.title = sheet_name or "Data"
             if headers:
                 ws.append(headers)
-            for r in sheet.rows:
+            for r in table.rows():
                 ws.append(r)
 
             if chart_type == "bar":
@@ -747,7 +663,7 @@ class SandboxSheetsTool(SandboxToolsBase):
             x_col_idx = idx_map[x_column] + 1
             y_col_indices = [idx_map[c] + 1 for c in y_columns]
             min_row = 2
-            max_row = len(sheet.rows) + 1
+            max_row = table.row_count + 1
             x_ref = Reference(ws, min_col=x_col_idx, min_row=min_row, max_row=max_row)
 
             if chart_type == "pie" and len(y_col_indices) == 1:
@@ -770,21 +686,7 @@ class SandboxSheetsTool(SandboxToolsBase):
             await self._upload_bytes(target_full, out.getvalue())
 
             dataset_headers = [x_column] + y_columns
-            dataset_rows: List[List[Any]] = []
-            x_idx = idx_map[x_column]
-            y_idx_list = [idx_map[y] for y in y_columns]
-            for row in sheet.rows:
-                if len(row) <= x_idx:
-                    continue
-                vals = [row[x_idx]]
-                ok = True
-                for yi in y_idx_list:
-                    if len(row) <= yi:
-                        ok = False
-                        break
-                    vals.append(row[yi])
-                if ok:
-                    dataset_rows.append(vals)
+            dataset_rows = table.select(dataset_headers)
 
             csv_rel = None
             if export_csv_path:
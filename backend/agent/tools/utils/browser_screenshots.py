@@ -0,0 +1,128 @@
+"""
+Screenshot handling shared by the browser tools.
+
+Browser actions ask the sandbox browser API to write the screenshot to a file
+in a compact format (JPEG at ``BROWSER_SCREENSHOT_QUALITY`` by default) and
+return its path instead of inlining it base64-encoded in the JSON response.
+The file is downloaded once as raw bytes, validated by sniffing its header
+(no full decode), and uploaded to storage. Responses from sandbox images that
+still inline ``screenshot_base64`` are handled the same way after one decode.
+"""
+
+import base64
+import binascii
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from utils.config import config
+from utils.logger import logger
+from utils.s3_upload_utils import upload_image_bytes
+
+SCREENSHOT_DIR = "/tmp/browser-screenshots"
+SCREENSHOT_BUCKET = "browser-screenshots"
+MAX_SCREENSHOT_BYTES = 10 * 1024 * 1024
+MAX_DIMENSION = 8192  # 8K resolution limit
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+# Fields the browser APIs use to carry the screenshot
+_SCREENSHOT_FIELDS = ("screenshot_base64", "screenshot_path", "screenshot_mime_type", "screenshot_size")
+
+
+def screenshot_options(thread_id: str) -> Dict[str, Any]:
+    """Request options asking the browser API to write the screenshot to a file."""
+    image_format = "png" if (config.BROWSER_SCREENSHOT_FORMAT or "").lower() == "png" else "jpeg"
+    extension = "png" if image_format == "png" else "jpg"
+    return {
+        "format": image_format,
+        "quality": config.BROWSER_SCREENSHOT_QUALITY,
+        # One file per thread, overwritten by each action
+        "path": f"{SCREENSHOT_DIR}/{thread_id}.{extension}",
+    }
+
+
+def sniff_image(data: bytes, max_bytes: int = MAX_SCREENSHOT_BYTES) -> Tuple[bool, str, Optional[str]]:
+    """
+    Validate image bytes from their header only.
+
+    Returns:
+        tuple[bool, str, Optional[str]]: (is_valid, message, mime_type)
+    """
+    if not data:
+        return False, "Image data is empty", None
+    if len(data) > max_bytes:
+        return False, f"Image size ({len(data)} bytes) exceeds limit ({max_bytes} bytes)", None
+
+    mime_type = next((mime for signature, mime in _SIGNATURES if data.startswith(signature)), None)
+    if mime_type is None and data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        mime_type = "image/webp"
+    if mime_type is None:
+        return False, "Unsupported or unrecognised image format", None
+
+    # Image.open only parses the header; pixel data is not decoded
+    try:
+        with Image.open(BytesIO(data)) as img:
+            width, height = img.size
+    except Exception as e:
+        return False, f"Invalid image data: {str(e)}", None
+    if width < 1 or height < 1:
+        return False, f"Invalid image dimensions: {width}x{height}", None
+    if width > MAX_DIMENSION or height > MAX_DIMENSION:
+        return False, f"Image dimensions ({width}x{height}) exceed limit ({MAX_DIMENSION}x{MAX_DIMENSION})", None
+    return True, f"Valid image: {mime_type}, {width}x{height}, {len(data)} bytes", mime_type
+
+
+def _decode_base64(data: str) -> bytes:
+    if data.startswith("data:"):
+        data = data.split(",", 1)[1]
+    return base64.b64decode(data, validate=True)
+
+
+async def process_screenshot(sandbox, result: Dict[str, Any]) -> None:
+    """
+    Replace the screenshot in a browser API result with an uploaded ``image_url``.
+
+    Sets ``image_validation_error`` or ``image_upload_error`` instead when the
+    screenshot is unusable, and always removes the raw screenshot fields.
+    """
+    path = result.get("screenshot_path")
+    inline = result.get("screenshot_base64")
+    try:
+        if path:
+            image_bytes = await sandbox.fs.download_file(path)
+        elif inline:
+            try:
+                image_bytes = _decode_base64(inline)
+            except (binascii.Error, ValueError, IndexError) as e:
+                result["image_validation_error"] = f"Base64 decoding failed: {str(e)}"
+                return
+        else:
+            return
+
+        is_valid, message, mime_type = sniff_image(image_bytes)
+        if not is_valid:
+            logger.warning(f"Screenshot validation failed: {message}")
+            result["image_validation_error"] = message
+            return
+
+        logger.debug(f"Screenshot validation passed: {message}")
+        result["image_url"] = await upload_image_bytes(
+            image_bytes, mime_type, bucket_name=SCREENSHOT_BUCKET, filename_prefix="screenshot"
+        )
+        logger.debug(f"Uploaded screenshot to {result['image_url']}")
+    except Exception as e:
+        logger.error(f"Failed to process screenshot: {e}")
+        result["image_upload_error"] = str(e)
+    finally:
+        for field in _SCREENSHOT_FIELDS:
+            result.pop(field, None)
@@ -0,0 +1,291 @@
+"""
+File editing engine for the sandbox file tools.
+
+Writes and edits are executed inside the sandbox by a small Python script, so
+one ``process.exec`` call can create parent folders, write, set permissions and
+report the result, and several operations can be batched into the same call.
+The script skips writes whose content hash matches the file on disk and
+writes through a temp file + rename. Large files are never re-uploaded for an
+edit: changes are sent as a byte-range splice (guarded by the hash of the
+content they were computed from) or, when the file was never read, as a
+search/replace performed entirely in the sandbox.
+
+Contents of recently read files are cached per tool instance (one agent run)
+and revalidated against the file's mtime and size before use; every write
+evicts or refreshes the entry.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import shlex
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import logger
+
+# Payload bytes sent inline in the exec command, across all operations of a call. Payloads
+# are base64-encoded twice (~1.8x) into one argument, which Linux caps at 128KB; anything
+# beyond the budget is staged with upload_file.
+INLINE_LIMIT = 32 * 1024
+PAYLOAD_FIELDS = ("data", "old", "new")
+# Files at least this large are edited by range or in the sandbox instead of re-uploaded
+REMOTE_EDIT_THRESHOLD = 256 * 1024
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+STAGING_DIR = "/tmp"
+EXEC_TIMEOUT = 60
+
+_SCRIPT = r'''
+import base64, hashlib, json, os, sys, tempfile
+
+def payload(op, field="data"):
+    staged = op.get(field + "_staged")
+    if staged:
+        with open(staged, "rb") as f:
+            data = f.read()
+        os.remove(staged)
+        return data
+    return base64.b64decode(op.get(field) or "")
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def write(path, data, mode):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, mode=0o755, exist_ok=True)
+    if mode is None:
+        mode = os.stat(path).st_mode & 0o7777 if os.path.exists(path) else 0o644
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return {"changed": True, "sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+
+def run(op):
+    path = op["path"]
+    mode = int(op["mode"], 8) if op.get("mode") else None
+    exists = os.path.isfile(path)
+    if op["op"] == "hash":
+        if not exists:
+            return {"error": "missing"}
+        data = read(path)
+        return {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    if op["op"] == "write":
+        data = payload(op)
+        if op.get("exists") is False and os.path.exists(path):
+            return {"error": "exists"}
+        if op.get("exists") and not exists:
+            return {"error": "missing"}
+        if exists:
+            current = read(path)
+            if op.get("expected") and hashlib.sha256(current).hexdigest() != op["expected"]:
+                return {"error": "stale"}
+            if current == data:
+                if mode is not None:
+                    os.chmod(path, mode)
+                return {"changed": False, "sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+        return write(path, data, mode)
+    if not exists:
+        return {"error": "missing"}
+    current = read(path)
+    if op["op"] == "splice":
+        if hashlib.sha256(current).hexdigest() != op["expected"]:
+            return {"error": "stale"}
+        return write(path, current[:op["start"]] + payload(op) + current[op["end"]:], mode)
+    if op["op"] == "replace":
+        old, new = payload(op, "old"), payload(op, "new")
+        occurrences = current.count(old)
+        if occurrences == 0:
+            return {"error": "not_found"}
+        if occurrences > 1:
+            lines = [i + 1 for i, line in enumerate(current.split(b"\n")) if old in line]
+            return {"error": "multiple", "lines": lines}
+        result = write(path, current.replace(old, new), mode)
+        result["line"] = current.split(old)[0].count(b"\n")
+        return result
+    return {"error": "unknown operation " + op["op"]}
+
+results = []
+for op in json.loads(base64.b64decode(sys.argv[1])):
+    try:
+        results.append(run(op))
+    except Exception as e:
+        results.append({"error": "failed", "message": str(e)})
+print(json.dumps(results))
+'''
+
+_SCRIPT_B64 = base64.b64encode(_SCRIPT.encode()).decode()
+
+
+class StaleFileError(Exception):
+    """The file changed on disk since the content an edit was computed from was read."""
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _changed_range(original: bytes, new: bytes) -> Tuple[int, int, bytes]:
+    """Smallest ``(start, end, replacement)`` such that ``original[:start] + replacement + original[end:] == new``."""
+    limit = min(len(original), len(new))
+    start = 0
+    while start < limit and original[start] == new[start]:
+        start += 1
+    suffix = 0
+    while suffix < limit - start and original[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return start, len(original) - suffix, new[start:len(new) - suffix]
+
+
+class SandboxFileOps:
+    def __init__(self, sandbox, cache_max_bytes: int = CACHE_MAX_BYTES):
+        self.sandbox = sandbox
+        self._cache: "OrderedDict[str, Tuple[str, int, bytes]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_max_bytes = cache_max_bytes
+
+    # -- content cache -------------------------------------------------
+
+    def _remember(self, path: str, mod_time: str, size: int, data: bytes) -> None:
+        self.invalidate(path)
+        if len(data) > self._cache_max_bytes:
+            return
+        self._cache[path] = (mod_time, size, data)
+        self._cache_bytes += len(data)
+        while self._cache_bytes > self._cache_max_bytes:
+            _, (_, _, evicted) = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def invalidate(self, path: str) -> None:
+        entry = self._cache.pop(path, None)
+        if entry:
+            self._cache_bytes -= len(entry[2])
+
+    def cached(self, path: str, info) -> Optional[bytes]:
+        """Cached content of ``path`` if it is still current for ``info`` (from ``get_file_info``)."""
+        entry = self._cache.get(path)
+        if entry is None:
+            return None
+        mod_time, size, data = entry
+        if mod_time != info.mod_time or size != info.size:
+            self.invalidate(path)
+            return None
+        self._cache.move_to_end(path)
+        return data
+
+    async def read(self, path: str, info=None) -> bytes:
+        info = info or await self.sandbox.fs.get_file_info(path)
+        data = self.cached(path, info)
+        if data is None:
+            data = await self.sandbox.fs.download_file(path)
+            self._remember(path, info.mod_time, info.size, data)
+        return data
+
+    async def _refresh(self, path: str, data: bytes) -> None:
+        """Record ``data`` as the current content of ``path`` after writing it."""
+        try:
+            info = await self.sandbox.fs.get_file_info(path)
+        except Exception:
+            self.invalidate(path)
+            return
+        if info.size == len(data):
+            self._remember(path, info.mod_time, info.size, data)
+        else:
+            self.invalidate(path)
+
+    # -- remote operations ---------------------------------------------
+
+    async def run(self, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Execute file operations in one sandbox call.
+
+        Payloads (``data``, ``old``, ``new``) are given as bytes; once they add
+        up to more than ``INLINE_LIMIT`` the rest are uploaded to staging files first.
+        """
+        staged = []
+        encoded = []
+        inline_budget = INLINE_LIMIT
+        for op in ops:
+            op = dict(op)
+            for field in PAYLOAD_FIELDS:
+                value = op.pop(field, None)
+                if value is None:
+                    continue
+                if len(value) <= inline_budget:
+                    inline_budget -= len(value)
+                    op[field] = base64.b64encode(value).decode()
+                else:
+                    op[field + "_staged"] = f"{STAGING_DIR}/.file-op-{uuid.uuid4().hex}"
+                    staged.append((value, op[field + "_staged"]))
+            encoded.append(op)
+        if staged:
+            await asyncio.gather(*(self.sandbox.fs.upload_file(data, path) for data, path in staged))
+
+        args = base64.b64encode(json.dumps(encoded).encode()).decode()
+        command = f"python3 -c \"import base64;exec(base64.b64decode('{_SCRIPT_B64}'))\" {shlex.quote(args)}"
+        response = await self.sandbox.process.exec(command, timeout=EXEC_TIMEOUT)
+        if response.exit_code != 0:
+            raise Exception(f"File operation failed with exit code {response.exit_code}: {response.result}")
+        results = json.loads(response.result.strip().splitlines()[-1])
+
+        for op, result in zip(ops, results):
+            if op["op"] != "hash":
+                self.invalidate(op["path"])
+            if result.get("error") == "failed":
+                raise Exception(result.get("message", "File operation failed"))
+        return results
+
+    async def write(self, path: str, data: bytes, mode: Optional[str] = None, exists: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Write ``data`` to ``path``, creating parent folders.
+
+        ``exists`` requires the file to exist (True) or not (False). Returns the
+        script result: ``{"changed": bool, ...}`` or ``{"error": "exists" | "missing"}``.
+        """
+        if len(data) > INLINE_LIMIT and exists is not False:
+            # Avoid uploading a large payload that is already on disk
+            current = (await self.run([{"op": "hash", "path": path}]))[0]
+            if current.get("error") == "missing" and exists:
+                return current
+            if current.get("sha256") == _sha256(data):
+                if mode:
+                    await self.sandbox.fs.set_file_permissions(path, mode)
+                return {"changed": False, **current}
+        return (await self.run([{"op": "write", "path": path, "data": data, "mode": mode, "exists": exists}]))[0]
+
+    async def update(self, path: str, original: bytes, new: bytes, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Replace ``original`` (the content the edit was computed from) with ``new``.
+
+        Large files only have the changed byte range sent. Raises
+        ``StaleFileError`` if the file no longer holds ``original``.
+        """
+        if new == original and not mode:
+            return {"changed": False, "sha256": _sha256(new), "size": len(new)}
+        if len(original) >= REMOTE_EDIT_THRESHOLD:
+            start, end, replacement = _changed_range(original, new)
+            op = {"op": "splice", "path": path, "start": start, "end": end, "data": replacement}
+        else:
+            op = {"op": "write", "path": path, "data": new, "exists": True}
+        op.update({"expected": _sha256(original), "mode": mode})
+        result = (await self.run([op]))[0]
+        if result.get("error") == "stale":
+            raise StaleFileError(f"{path} was modified while it was being edited")
+        if result.get("error"):
+            return result
+        await self._refresh(path, new)
+        return result
+
+    async def replace(self, path: str, old: bytes, new: bytes) -> Dict[str, Any]:
+        """Replace the single occurrence of ``old`` in ``path`` without transferring the file."""
+        result = (await self.run([{"op": "replace", "path": path, "old": old, "new": new}]))[0]
+        logger.debug(f"In-sandbox replace in {path}: {result}")
+        return result
@@ -0,0 +1,215 @@
+"""
+Columnar table used by ``SandboxSheetsTool`` for analysis.
+
+Sheets are parsed straight into one object array per column (ragged rows are
+padded with ``None``; the original row lengths are kept so "cell missing" and
+"cell empty" stay distinguishable). Numeric views are converted once per column
+and cached, and aggregations / group-bys run as NumPy reductions instead of
+per-cell Python loops.
+"""
+
+import codecs
+import csv
+import io
+from itertools import zip_longest
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import chardet
+import numpy as np
+
+# chardet is slow on large inputs; a prefix is enough to pick the encoding
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+AGGREGATIONS = ("count", "sum", "avg", "min", "max")
+
+
+def detect_encoding(data: bytes) -> str:
+    try:
+        encoding = chardet.detect(data[:ENCODING_SAMPLE_BYTES]).get("encoding") or "utf-8"
+        codecs.lookup(encoding)
+        return encoding
+    except Exception:
+        return "utf-8"
+
+
+def _to_float(v: Any) -> float:
+    if v is None:
+        return np.nan
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(str(v).strip())
+    except Exception:
+        return np.nan
+
+
+_to_float_vec = np.frompyfunc(_to_float, 1, 1)
+
+
+def _py(value: Any) -> Any:
+    """NumPy scalar -> plain Python value (NaN -> None) for JSON output."""
+    if value is None:
+        return None
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+class SheetTable:
+    def __init__(self, headers: List[str], columns: List[np.ndarray], row_lengths: np.ndarray):
+        self.headers = headers
+        self.columns = columns
+        self.row_lengths = row_lengths
+        # Same resolution as the tool's index map: a duplicated header names its last column
+        self._index = {h: i for i, h in enumerate(headers)}
+        self._numeric: Dict[int, np.ndarray] = {}
+
+    @property
+    def row_count(self) -> int:
+        return len(self.row_lengths)
+
+    @classmethod
+    def from_rows(cls, headers: List[str], rows: Iterable[Sequence[Any]]) -> "SheetTable":
+        rows = rows if isinstance(rows, list) else list(rows)
+        lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+        columns = []
+        for values in zip_longest(*rows):
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            columns.append(array)
+        return cls(list(headers), columns, lengths)
+
+    @classmethod
+    def from_csv_bytes(cls, data: bytes) -> "SheetTable":
+        # Decode incrementally instead of materialising the whole text first
+        stream = io.TextIOWrapper(io.BytesIO(data), encoding=detect_encoding(data), errors="replace", newline="")
+        reader = csv.reader(stream)
+        headers = next(reader, None)
+        if headers is None:
+            return cls([], [], np.zeros(0, dtype=np.int64))
+        return cls.from_rows([str(h) for h in headers], reader)
+
+    def column_index(self, name: str) -> Optional[int]:
+        return self._index.get(name)
+
+    def _column(self, i: int) -> np.ndarray:
+        if i < len(self.columns):
+            return self.columns[i]
+        return np.full(self.row_count, None, dtype=object)
+
+    def present(self, i: int) -> np.ndarray:
+        """Mask of rows that actually have a cell in column ``i``."""
+        return self.row_lengths > i
+
+    def numeric(self, i: int) -> np.ndarray:
+        """Column ``i`` as float64 (NaN where missing or not a number); cached."""
+        if i not in self._numeric:
+            column = self._column(i)
+            try:
+                values = column.astype(np.float64)
+            except (TypeError, ValueError):
+                values = _to_float_vec(column).astype(np.float64) if len(column) else np.zeros(0)
+            values[~self.present(i)] = np.nan
+            self._numeric[i] = values
+        return self._numeric[i]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[List[Any]]:
+        """Row lists (trimmed back to their original length) for ``[start, stop)``."""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        out = []
+        for r in range(start, stop):
+            n = int(self.row_lengths[r])
+            out.append([self.columns[i][r] for i in range(n)])
+        return out
+
+    def infer_types(self) -> Dict[str, str]:
+        types: Dict[str, str] = {}
+        if not self.headers:
+            return types
+        for i in range(max(len(self.columns), len(self.headers))):
+            present = self.present(i)
+            total = int(present.sum())
+            numeric_count = int((~np.isnan(self.numeric(i))).sum())
+            detected = "string"
+            if numeric_count >= max(1, total // 2):
+                detected = "number"
+            else:
+                non_numeric = present & np.isnan(self.numeric(i))
+                strings = [v for v in self._column(i)[non_numeric] if isinstance(v, str)]
+                date_like = sum(
+                    1 for v in strings
+                    if ("-" in v or "/" in v) and any(ch.isdigit() for ch in v)
+                )
+                if date_like >= max(1, total // 2):
+                    detected = "date"
+            types[self.headers[i] if i < len(self.headers) else f"col_{i+1}"] = detected
+        return types
+
+    def summarize(self, columns: List[str]) -> List[List[Any]]:
+        """``[metric, *values]`` rows for count/sum/avg/min/max of each column."""
+        stats: Dict[str, List[Any]] = {agg: [] for agg in AGGREGATIONS}
+        for name in columns:
+            values = self.numeric(self._index[name])
+            valid = values[~np.isnan(values)]
+            count = len(valid)
+            stats["count"].append(count)
+            stats["sum"].append(_py(valid.sum()) if count else None)
+            stats["avg"].append(_py(valid.mean()) if count else None)
+            stats["min"].append(_py(valid.min()) if count else None)
+            stats["max"].append(_py(valid.max()) if count else None)
+        return [[agg, *stats[agg]] for agg in AGGREGATIONS]
+
+    def group_aggregate(self, group_by: str, columns: List[str], aggregations: List[str]) -> List[List[Any]]:
+        """One row per distinct ``group_by`` value (first-seen order) with ``{col}_{agg}`` values."""
+        g = self._index[group_by]
+        keys = self._column(g)
+        key_codes: Dict[Any, int] = {}
+        codes = np.fromiter(
+            (key_codes.setdefault(k, len(key_codes)) for k in keys),
+            dtype=np.int64,
+            count=len(keys),
+        )
+        n_groups = len(key_codes)
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, np.arange(n_groups))
+
+        per_column: List[Dict[str, List[Any]]] = []
+        for name in columns:
+            values = self.numeric(self._index[name])
+            valid = ~np.isnan(values)
+            counts = np.bincount(codes, weights=valid, minlength=n_groups).astype(np.int64)
+            sums = np.bincount(codes, weights=np.where(valid, values, 0.0), minlength=n_groups)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                avgs = sums / counts
+            sorted_values = values[order]
+            if len(sorted_values):
+                mins = np.fmin.reduceat(sorted_values, starts)
+                maxs = np.fmax.reduceat(sorted_values, starts)
+            else:
+                mins = maxs = np.zeros(0)
+            has = counts > 0
+            per_column.append({
+                "count": [int(c) for c in counts],
+                "sum": [_py(v) if h else None for v, h in zip(sums, has)],
+                "avg": [_py(v) if h else None for v, h in zip(avgs, has)],
+                "min": [_py(v) if h else None for v, h in zip(mins, has)],
+                "max": [_py(v) if h else None for v, h in zip(maxs, has)],
+            })
+
+        rows = []
+        for key, code in key_codes.items():
+            row = [key]
+            for stats in per_column:
+                row.extend(stats[agg][code] for agg in aggregations)
+            rows.append(row)
+        return rows
+
+    def select(self, names: List[str]) -> List[List[Any]]:
+        """Rows holding a cell for every one of ``names``, projected onto those columns."""
+        indices = [self._index[name] for name in names]
+        mask = self.row_lengths > max(indices)
+        selected = [self._column(i)[mask] for i in indices]
+        return [list(values) for values in zip(*selected)]
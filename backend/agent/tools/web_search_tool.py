@@ -1,10 +1,11 @@
 from tavily import AsyncTavilyClient
-import httpx
 from dotenv import load_dotenv
 from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example
 from utils.config import config
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from services.web_fetch import web_fetcher
+from urllib.parse import urlparse
 import json
 import os
 import datetime
@@ -99,7 +100,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
 
             # Execute the search with Tavily
             logging.info(f"Executing web search for query: '{query}' with {num_results} results")
-            search_response = await self.tavily_client.search(
+            search_response = await web_fetcher.search(
+                self.tavily_client,
                 query=query,
                 max_results=num_results,
                 include_images=True,
@@ -197,26 +199,35 @@ class SandboxWebSearchTool(SandboxToolsBase):
             
             logging.info(f"Processing {len(url_list)} URLs: {url_list}")
             
-            # Process each URL concurrently and collect results
-            tasks = [self._scrape_single_url(url) for url in url_list]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Cached pages are reused and the rest are scraped in one Firecrawl batch
+            pages = await web_fetcher.scrape(url_list)
 
-            # Process results, handling exceptions
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logging.error(f"Error processing URL {url_list[i]}: {str(result)}")
-                    processed_results.append({
-                        "url": url_list[i],
-                        "success": False,
-                        "error": str(result)
-                    })
-                else:
-                    processed_results.append(result)
-            
-            results = processed_results
+            scrape_dir = f"{self.workspace_path}/scrape"
+            await self.sandbox.fs.create_folder(scrape_dir, "755")
+
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            results = [None] * len(url_list)
+            filenames = set()
+            save_indexes, save_tasks = [], []
+            for i, (url, page) in enumerate(zip(url_list, pages)):
+                if isinstance(page, Exception):
+                    logging.error(f"Error processing URL {url}: {str(page)}")
+                    results[i] = {"url": url, "success": False, "error": str(page)}
+                    continue
+                # Extract domain from URL for the filename
+                domain = urlparse(url).netloc.replace("www.", "")
+                domain = "".join([c if c.isalnum() else "_" for c in domain])
+                safe_filename = f"{timestamp}_{domain}.json"
+                suffix = 2
+                while safe_filename in filenames:
+                    safe_filename = f"{timestamp}_{domain}_{suffix}.json"
+                    suffix += 1
+                filenames.add(safe_filename)
+                save_indexes.append(i)
+                save_tasks.append(self._save_page(page, f"{scrape_dir}/{safe_filename}"))
+            for i, result in zip(save_indexes, await asyncio.gather(*save_tasks)):
+                results[i] = result
 
-            
             # Summarize results
             successful = sum(1 for r in results if r.get("success", False))
             failed = len(results) - successful
@@ -250,118 +261,28 @@ class SandboxWebSearchTool(SandboxToolsBase):
             logging.error(f"Error in scrape_webpage: {error_message}")
             return self.fail_response(f"Error processing scrape request: {error_message[:200]}")
     
-    async def _scrape_single_url(self, url: str) -> dict:
+    async def _save_page(self, page: dict, results_file_path: str) -> dict:
         """
-        Helper function to scrape a single URL and return the result information.
+        Helper function to save a scraped page to the sandbox and return the result information.
         """
-        
-        # # Add protocol if missing
-        # if not (url.startswith('http://') or url.startswith('https://')):
-        #     url = 'https://' + url
-        #     logging.info(f"Added https:// protocol to URL: {url}")
-            
-        logging.info(f"Scraping single URL: {url}")
-        
+        url = page["url"]
         try:
-            # ---------- Firecrawl scrape endpoint ----------
-            logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "url": url,
-                    "formats": ["markdown"]
-                }
-                
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 30
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
-                    except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
-
-            # Format the response
-            title = data.get("data", {}).get("metadata", {}).get("title", "")
-            markdown_content = data.get("data", {}).get("markdown", "")
-            logging.info(f"Extracted content from {url}: title='{title}', content length={len(markdown_content)}")
-            
-            formatted_result = {
-                "title": title,
-                "url": url,
-                "text": markdown_content
-            }
-            
-            # Add metadata if available
-            if "metadata" in data.get("data", {}):
-                formatted_result["metadata"] = data["data"]["metadata"]
-                logging.info(f"Added metadata: {data['data']['metadata'].keys()}")
-            
-            # Create a simple filename from the URL domain and date
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Extract domain from URL for the filename
-            from urllib.parse import urlparse
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc.replace("www.", "")
-            
-            # Clean up domain for filename
-            domain = "".join([c if c.isalnum() else "_" for c in domain])
-            safe_filename = f"{timestamp}_{domain}.json"
-            
-            logging.info(f"Generated filename: {safe_filename}")
-            
-            # Save results to a file in the /workspace/scrape directory
-            scrape_dir = f"{self.workspace_path}/scrape"
-            await self.sandbox.fs.create_folder(scrape_dir, "755")
-            
-            results_file_path = f"{scrape_dir}/{safe_filename}"
-            json_content = json.dumps(formatted_result, ensure_ascii=False, indent=2)
+            json_content = json.dumps(page, ensure_ascii=False, indent=2)
             logging.info(f"Saving content to file: {results_file_path}, size: {len(json_content)} bytes")
-            
             await self.sandbox.fs.upload_file(
                 json_content.encode(),
                 results_file_path,
             )
-            
             return {
                 "url": url,
                 "success": True,
-                "title": title,
+                "title": page.get("title", ""),
                 "file_path": results_file_path,
-                "content_length": len(markdown_content)
+                "content_length": len(page.get("text", ""))
             }
-        
         except Exception as e:
             error_message = str(e)
-            logging.error(f"Error scraping URL '{url}': {error_message}")
-            
-            # Create an error result
+            logging.error(f"Error saving scraped URL '{url}': {error_message}")
             return {
                 "url": url,
                 "success": False,
@@ -144,6 +144,9 @@ class VersionService:
         
         if not result.data:
             raise Exception("Failed to update agent current version")
+        
+        from agent.config_snapshot import invalidate_agent_config
+        await invalidate_agent_config(agent_id)
     
     def _version_from_db_row(self, row: Dict[str, Any]) -> AgentVersion:
         config = row.get('config', {})
@@ -541,6 +544,9 @@ class VersionService:
         if not result.data:
             raise Exception("Failed to update version")
         
+        from agent.config_snapshot import invalidate_agent_config
+        await invalidate_agent_config(agent_id, version_id)
+        
         return self._version_from_db_row(result.data[0])
 
 
@@ -0,0 +1,138 @@
+"""
+Per-thread "latest message by type" index.
+
+Each agent turn needs the newest ``browser_state`` and ``image_context``
+messages (temporary context), the newest ``user`` message, and the type of the
+newest assistant/tool/user message (to stop once the assistant had the last
+word). Instead of querying ``messages`` for each of these every iteration, the
+rows are kept in one Redis hash per thread, updated whenever a message is
+inserted, so a turn reads everything with a single HGETALL.
+
+The hash is seeded from the database on first read (and after expiry or
+invalidation). Seeding writes with HSETNX so a message recorded while the seed
+query was in flight is never overwritten by the older row. Backend writers that
+insert into ``messages`` directly must call ``record_message``; writers that
+delete arbitrary messages call ``invalidate``. Clients also insert user
+messages straight into Supabase, bypassing the index, so agent runs invalidate
+it when they start and only trust it for the duration of the run.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+from services import redis
+from utils.logger import logger
+
+INDEX_TTL = 24 * 60 * 60
+
+# Index field -> message types it tracks
+INDEXED_FIELDS = {
+    "browser_state": ("browser_state",),
+    "image_context": ("image_context",),
+    "user": ("user",),
+    "turn": ("assistant", "tool", "user"),
+}
+SEEDED_FIELD = "_seeded"
+
+
+def _key(thread_id: str) -> str:
+    return f"thread_latest_messages:{thread_id}"
+
+
+def _fields_for_type(message_type: str):
+    return [field for field, types in INDEXED_FIELDS.items() if message_type in types]
+
+
+def _encode(field: str, row: Optional[Dict[str, Any]]) -> str:
+    if row is None:
+        return "null"
+    if field == "turn":
+        # Only the type is needed to decide whether to continue
+        row = {"message_id": row.get("message_id"), "type": row.get("type")}
+    return json.dumps(row, default=str)
+
+
+async def record_message(thread_id: str, row: Optional[Dict[str, Any]]) -> None:
+    """Record a freshly inserted ``messages`` row as the latest of its type."""
+    if not row or not row.get("type"):
+        return
+    fields = _fields_for_type(row["type"])
+    if not fields:
+        return
+    try:
+        client = await redis.get_client()
+        key = _key(thread_id)
+        async with client.pipeline(transaction=True) as pipe:
+            for field in fields:
+                pipe.hset(key, field, _encode(field, row))
+            pipe.expire(key, INDEX_TTL)
+            await pipe.execute()
+    except Exception as e:
+        # A stale index would hide the message, so drop it and let the next read reseed
+        logger.warning(f"Failed to record latest {row['type']} message for thread {thread_id}: {e}")
+        await invalidate(thread_id)
+
+
+async def consume(thread_id: str, field: str, message_id: str) -> None:
+    """Clear ``field`` if it still points at ``message_id`` (after that message was deleted)."""
+    try:
+        client = await redis.get_client()
+        current = await client.hget(_key(thread_id), field)
+        if current and current != "null" and json.loads(current).get("message_id") == message_id:
+            await client.hset(_key(thread_id), field, "null")
+    except Exception as e:
+        logger.warning(f"Failed to clear latest {field} message for thread {thread_id}: {e}")
+        await invalidate(thread_id)
+
+
+async def invalidate(thread_id: str) -> None:
+    try:
+        await redis.delete(_key(thread_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate latest message index for thread {thread_id}: {e}")
+
+
+async def _query_latest(client, thread_id: str) -> Dict[str, Optional[Dict[str, Any]]]:
+    def latest(types):
+        query = client.table('messages').select('*').eq('thread_id', thread_id)
+        query = query.eq('type', types[0]) if len(types) == 1 else query.in_('type', list(types))
+        return query.order('created_at', desc=True).limit(1).execute()
+
+    results = await asyncio.gather(*(latest(types) for types in INDEXED_FIELDS.values()))
+    return {
+        field: (result.data[0] if result.data else None)
+        for field, result in zip(INDEXED_FIELDS, results)
+    }
+
+
+async def get_latest(db_client, thread_id: str) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Latest row per indexed field for the thread (``None`` where there is none).
+
+    ``turn`` only carries ``message_id`` and ``type``.
+    """
+    key = _key(thread_id)
+    try:
+        client = await redis.get_client()
+        raw = await client.hgetall(key)
+    except Exception as e:
+        logger.warning(f"Latest message index unavailable for thread {thread_id}, querying directly: {e}")
+        return await _query_latest(db_client, thread_id)
+
+    if raw.get(SEEDED_FIELD):
+        return {field: json.loads(raw.get(field, "null")) for field in INDEXED_FIELDS}
+
+    seeded = await _query_latest(db_client, thread_id)
+    try:
+        async with client.pipeline(transaction=True) as pipe:
+            for field, row in seeded.items():
+                pipe.hsetnx(key, field, _encode(field, row))
+            pipe.hset(key, SEEDED_FIELD, "1")
+            pipe.expire(key, INDEX_TTL)
+            pipe.hgetall(key)
+            *_, raw = await pipe.execute()
+        return {field: json.loads(raw.get(field, "null")) for field in INDEXED_FIELDS}
+    except Exception as e:
+        logger.warning(f"Failed to seed latest message index for thread {thread_id}: {e}")
+        return {field: json.loads(_encode(field, row)) for field, row in seeded.items()}
@@ -0,0 +1,149 @@
+"""
+Prompt assembly helpers for provider-side prompt caching.
+
+Providers cache by exact prefix, so the system prompt is kept as two text
+blocks: a stable block (base prompt, agent instructions, tool schemas/examples)
+that is byte-identical across turns and runs, followed by a volatile block
+(current date/time, live channel statistics) that may change every run.
+
+Cache breakpoints (Anthropic allows four) are placed deliberately:
+1. the last tool schema
+2. the end of the stable system block
+3-4. the last two conversation messages, so each turn reads the prefix the
+     previous turn wrote
+
+Cache usage reported by providers is aggregated per model so hit rates can be
+monitored.
+"""
+
+import copy
+from typing import Any, Dict, List, Optional
+
+from utils.logger import logger
+
+EPHEMERAL = {"type": "ephemeral"}
+HISTORY_BREAKPOINTS = 2
+
+STABLE_BLOCK_INDEX = 0
+
+
+def build_system_message(stable: str, volatile: str = "") -> Dict[str, Any]:
+    """Build a system message whose first text block is the stable prefix."""
+    content = [{"type": "text", "text": stable}]
+    if volatile:
+        content.append({"type": "text", "text": volatile})
+    return {"role": "system", "content": content}
+
+
+def flatten_system_content(messages: List[Dict[str, Any]]) -> None:
+    """Join list-form system content into one string (stable text first) for providers without block support."""
+    for message in messages:
+        if message.get("role") != "system" or not isinstance(message.get("content"), list):
+            continue
+        message["content"] = "".join(
+            block.get("text", "") for block in message["content"]
+            if isinstance(block, dict) and block.get("type") == "text"
+        )
+
+
+def _strip_cache_control(messages: List[Dict[str, Any]]) -> None:
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            for block in content:
+                if isinstance(block, dict):
+                    block.pop("cache_control", None)
+
+
+def _mark_last_text_block(message: Dict[str, Any]) -> bool:
+    content = message.get("content")
+    if isinstance(content, str):
+        if not content:
+            return False
+        message["content"] = [{"type": "text", "text": content, "cache_control": dict(EPHEMERAL)}]
+        return True
+    if isinstance(content, list):
+        for block in reversed(content):
+            if isinstance(block, dict) and block.get("type") == "text" and block.get("text"):
+                block["cache_control"] = dict(EPHEMERAL)
+                return True
+    return False
+
+
+def apply_cache_breakpoints(params: Dict[str, Any]) -> None:
+    """
+    Place Anthropic cache breakpoints on ``params['messages']`` and ``params['tools']``.
+
+    Existing markers are cleared first, so applying this twice (e.g. on a
+    retried or rerouted request) never exceeds the provider's limit.
+    """
+    messages = params.get("messages") or []
+    _strip_cache_control(messages)
+
+    tools = params.get("tools")
+    if tools:
+        # Tool schemas are shared objects; only copy the one we annotate
+        last_tool = copy.copy(tools[-1])
+        last_tool["cache_control"] = dict(EPHEMERAL)
+        params["tools"] = [*tools[:-1], last_tool]
+
+    conversation = messages
+    if messages and messages[0].get("role") == "system":
+        system = messages[0]
+        content = system.get("content")
+        if isinstance(content, str):
+            _mark_last_text_block(system)
+        elif isinstance(content, list) and len(content) > STABLE_BLOCK_INDEX:
+            block = content[STABLE_BLOCK_INDEX]
+            if isinstance(block, dict) and block.get("type") == "text":
+                block["cache_control"] = dict(EPHEMERAL)
+        conversation = messages[1:]
+
+    marked = 0
+    for message in reversed(conversation):
+        if marked >= HISTORY_BREAKPOINTS:
+            break
+        if _mark_last_text_block(message):
+            marked += 1
+
+
+class PromptCacheStats:
+    """Running totals of prompt and cached tokens per model."""
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, prompt_tokens: int, cache_read_tokens: int, cache_creation_tokens: int) -> Optional[float]:
+        totals = self._totals.setdefault(model, {"requests": 0, "prompt_tokens": 0, "cache_read_tokens": 0, "cache_creation_tokens": 0})
+        totals["requests"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cache_read_tokens"] += cache_read_tokens
+        totals["cache_creation_tokens"] += cache_creation_tokens
+        if not prompt_tokens:
+            return None
+        hit_rate = cache_read_tokens / prompt_tokens
+        logger.debug(f"Prompt cache for {model}: read {cache_read_tokens}, wrote {cache_creation_tokens}, prompt {prompt_tokens} ({hit_rate:.0%} hit)")
+        return hit_rate
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for model, totals in self._totals.items():
+            prompt = totals["prompt_tokens"]
+            result[model] = {
+                **totals,
+                "hit_rate": round(totals["cache_read_tokens"] / prompt, 4) if prompt else 0.0,
+            }
+        return result
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def extract_cache_usage(usage: Any) -> Dict[str, int]:
+    """Read cached-token counts from a LiteLLM usage object (Anthropic or OpenAI style)."""
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_creation = getattr(usage, "cache_creation_input_tokens", None) or 0
+    if not cache_read:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cache_read = getattr(details, "cached_tokens", None) or 0
+    return {"cache_read_input_tokens": int(cache_read), "cache_creation_input_tokens": int(cache_creation)}
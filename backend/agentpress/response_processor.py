@@ -19,6 +19,7 @@ from utils.logger import logger
 from agentpress.tool import ToolResult
 from agentpress.tool_registry import ToolRegistry
 from agentpress.xml_tool_parser import XMLToolParser
+from agentpress.prompt_cache import extract_cache_usage, prompt_cache_stats
 from langfuse.client import StatefulTraceClient
 from services.langfuse import langfuse
 from utils.json_helpers import (
@@ -104,6 +105,20 @@ class ResponseProcessor:
         self.target_agent_id = target_agent_id
         self.agent_config = agent_config
 
+    def _record_prompt_cache_usage(self, llm_model: str, usage: Dict[str, Any]):
+        """Track provider prompt-cache reads/writes for this call."""
+        hit_rate = prompt_cache_stats.record(
+            llm_model,
+            usage.get("prompt_tokens", 0),
+            usage.get("cache_read_input_tokens", 0),
+            usage.get("cache_creation_input_tokens", 0),
+        )
+        if hit_rate is not None and self.trace:
+            self.trace.event(name="prompt_cache_usage", level="DEFAULT", status_message=(
+                f"Prompt cache hit rate {hit_rate:.0%} "
+                f"(read {usage.get('cache_read_input_tokens', 0)}, wrote {usage.get('cache_creation_input_tokens', 0)}, prompt {usage.get('prompt_tokens', 0)})"
+            ))
+
     async def _yield_message(self, message_obj: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """Helper to yield a message with proper formatting.
         
@@ -244,6 +259,9 @@ class ResponseProcessor:
                         streaming_metadata["usage"]["completion_tokens"] = chunk.usage.completion_tokens
                     if hasattr(chunk.usage, 'total_tokens') and chunk.usage.total_tokens is not None:
                         streaming_metadata["usage"]["total_tokens"] = chunk.usage.total_tokens
+                    cache_usage = extract_cache_usage(chunk.usage)
+                    if any(cache_usage.values()):
+                        streaming_metadata["usage"].update(cache_usage)
 
                 if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'finish_reason') and chunk.choices[0].finish_reason:
                     finish_reason = chunk.choices[0].finish_reason
@@ -391,6 +409,9 @@ class ResponseProcessor:
 
             # --- After Streaming Loop ---
             
+            if streaming_metadata["usage"]["prompt_tokens"] > 0:
+                self._record_prompt_cache_usage(llm_model, streaming_metadata["usage"])
+
             if (
                 streaming_metadata["usage"]["total_tokens"] == 0
             ):
@@ -890,6 +911,10 @@ class ResponseProcessor:
             )
             if start_msg_obj: yield format_for_yield(start_msg_obj)
 
+            usage = getattr(llm_response, 'usage', None)
+            if usage is not None and getattr(usage, 'prompt_tokens', None):
+                self._record_prompt_cache_usage(llm_model, {"prompt_tokens": usage.prompt_tokens, **extract_cache_usage(usage)})
+
             # Extract finish_reason, content, tool calls
             if hasattr(llm_response, 'choices') and llm_response.choices:
                  if hasattr(llm_response.choices[0], 'finish_reason'):
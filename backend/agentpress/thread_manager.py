@@ -10,12 +10,14 @@ This module provides comprehensive conversation management, including:
 - Context summarization to manage token limits
 """
 
+import copy
 import json
-from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, cast
+from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, Callable, Awaitable, cast
 from services.llm import make_llm_api_call
 from agentpress.tool import Tool
 from agentpress.tool_registry import ToolRegistry
 from agentpress.context_manager import ContextManager
+from agentpress import latest_messages
 from agentpress.response_processor import (
     ResponseProcessor,
     ProcessorConfig
@@ -69,6 +71,22 @@ class ThreadManager:
         """Add a tool to the ThreadManager."""
         self.tool_registry.register_tool(tool_class, function_names, **kwargs)
 
+    def add_lazy_tool(
+        self,
+        tool_class: Type[Tool],
+        factory: Optional[Callable[[], Awaitable[Tool]]] = None,
+        function_names: Optional[List[str]] = None,
+        **kwargs
+    ):
+        """Add a tool whose instance is only created when one of its functions is first called.
+
+        Without a factory the tool is constructed from ``kwargs``.
+        """
+        if factory is None:
+            async def factory():
+                return tool_class(**kwargs)
+        self.tool_registry.register_lazy_tool(tool_class, factory, function_names)
+
     async def create_thread(
         self,
         account_id: Optional[str] = None,
@@ -169,6 +187,7 @@ class ThreadManager:
             logger.debug(f"Successfully added message to thread {thread_id}")
 
             if result.data and len(result.data) > 0 and isinstance(result.data[0], dict) and 'message_id' in result.data[0]:
+                await latest_messages.record_message(thread_id, result.data[0])
                 return result.data[0]
             else:
                 logger.error(f"Insert operation failed or did not return expected data structure for thread {thread_id}. Result data: {result.data}")
@@ -302,7 +321,8 @@ class ThreadManager:
             config.max_xml_tool_calls = max_xml_tool_calls
 
         # Create a working copy of the system prompt to potentially modify
-        working_system_prompt = system_prompt.copy()
+        # (deep, since list content blocks would otherwise be shared with the caller)
+        working_system_prompt = copy.deepcopy(system_prompt)
 
         # Add XML tool calling instructions to system prompt if requested
         if include_xml_examples and config.xml_tool_calling:
@@ -310,8 +330,7 @@ class ThreadManager:
             usage_examples = self.tool_registry.get_usage_examples()
             
             if openapi_schemas:
-                # Convert schemas to JSON string
-                schemas_json = json.dumps(openapi_schemas, indent=2)
+                schemas_json = self.tool_registry.get_openapi_schemas_json()
                 
                 # Build usage examples section if any exist
                 usage_examples_section = ""
@@ -408,24 +427,13 @@ When using the tools:
                 # Use the working_system_prompt which may contain the XML examples
                 prepared_messages = [working_system_prompt]
 
-                # Find the last user message index
-                last_user_index = -1
-                for i, msg in enumerate(messages):
-                    if isinstance(msg, dict) and msg.get('role') == 'user':
-                        last_user_index = i
-
-                # Insert temporary message before the last user message if it exists
-                if temp_msg and last_user_index >= 0:
-                    prepared_messages.extend(messages[:last_user_index])
+                # The temporary message (browser state, image context) changes every
+                # iteration, so it goes after the persisted history rather than
+                # inside it; otherwise it would invalidate the cached prefix.
+                prepared_messages.extend(messages)
+                if temp_msg:
                     prepared_messages.append(temp_msg)
-                    prepared_messages.extend(messages[last_user_index:])
-                    logger.debug("Added temporary message before the last user message")
-                else:
-                    # If no user message or no temporary message, just add all messages
-                    prepared_messages.extend(messages)
-                    if temp_msg:
-                        prepared_messages.append(temp_msg)
-                        logger.debug("Added temporary message to the end of prepared messages")
+                    logger.debug("Added temporary message to the end of prepared messages")
 
                 # Add partial assistant content for auto-continue context (without saving to DB)
                 if auto_continue_count > 0 and continuous_state.get('accumulated_content'):
@@ -7,7 +7,8 @@ This module defines the base classes and decorators for creating tools in AgentP
 - Result containers for standardized tool outputs
 """
 
-from typing import Dict, Any, Union, Optional, List
+from typing import Dict, Any, Union, Optional, Mapping, Tuple
+from types import MappingProxyType
 from dataclasses import dataclass, field
 from abc import ABC
 import json
@@ -60,7 +61,7 @@ class Tool(ABC):
     and result handling capabilities.
     
     Attributes:
-        _schemas (Dict[str, List[ToolSchema]]): Registered schemas for tool methods
+        _schemas (Mapping[str, Tuple[ToolSchema, ...]]): Registered schemas for tool methods
         
     Methods:
         get_schemas: Get all registered tool schemas
@@ -68,24 +69,43 @@ class Tool(ABC):
         fail_response: Create a failed result
     """
     
+    @classmethod
+    def _collect_schemas(cls) -> Mapping[str, Tuple[ToolSchema, ...]]:
+        """Walk the class once for methods decorated with tool schemas."""
+        schemas = {}
+        for name, member in inspect.getmembers(cls, predicate=inspect.isfunction):
+            if hasattr(member, 'tool_schemas'):
+                schemas[name] = tuple(member.tool_schemas)
+        return MappingProxyType(schemas)
+
+    @classmethod
+    def get_class_schemas(cls) -> Mapping[str, Tuple[ToolSchema, ...]]:
+        """Get the read-only schema registry shared by all instances of this class.
+
+        Collected on first use rather than at class creation, since some tool
+        modules attach decorated methods after the class body.
+        """
+        schemas = cls.__dict__.get('_class_schemas')
+        if schemas is None:
+            schemas = cls._collect_schemas()
+            cls._class_schemas = schemas
+        return schemas
+
     def __init__(self):
-        """Initialize tool with empty schema registry."""
-        self._schemas: Dict[str, List[ToolSchema]] = {}
+        """Bind the instance to its class-level schema registry."""
+        self._schemas: Mapping[str, Tuple[ToolSchema, ...]] = {}
         logger.debug(f"Initializing tool class: {self.__class__.__name__}")
         self._register_schemas()
 
     def _register_schemas(self):
         """Register schemas from all decorated methods."""
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            if hasattr(method, 'tool_schemas'):
-                self._schemas[name] = method.tool_schemas
-                logger.debug(f"Registered schemas for method '{name}' in {self.__class__.__name__}")
+        self._schemas = self.get_class_schemas()
 
-    def get_schemas(self) -> Dict[str, List[ToolSchema]]:
+    def get_schemas(self) -> Mapping[str, Tuple[ToolSchema, ...]]:
         """Get all registered tool schemas.
-        
+
         Returns:
-            Dict mapping method names to their schema definitions
+            Read-only mapping of method names to their schema definitions
         """
         return self._schemas
 
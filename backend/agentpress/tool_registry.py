@@ -1,9 +1,50 @@
-from typing import Dict, Type, Any, List, Optional, Callable
-from agentpress.tool import Tool, SchemaType
+from typing import Dict, Type, Any, List, Optional, Callable, Awaitable, Mapping, Tuple
+from agentpress.tool import Tool, SchemaType, ToolSchema
 from utils.logger import logger
+import asyncio
 import json
 
 
+class LazyTool:
+    """Stands in for a tool instance until one of its functions is first called.
+    
+    Schemas come from the tool class, so registration costs nothing; the
+    factory (constructor plus any lookups it needs) runs once, on first use.
+    """
+    
+    def __init__(self, tool_class: Type[Tool], factory: Callable[[], Awaitable[Tool]]):
+        self.tool_class = tool_class
+        self._factory = factory
+        self._instance: Optional[Tool] = None
+        self._lock = asyncio.Lock()
+        self._functions: Dict[str, Callable] = {}
+    
+    @property
+    def instantiated(self) -> bool:
+        return self._instance is not None
+    
+    async def resolve(self) -> Tool:
+        if self._instance is None:
+            async with self._lock:
+                if self._instance is None:
+                    logger.debug(f"Instantiating lazily registered tool {self.tool_class.__name__}")
+                    self._instance = await self._factory()
+        return self._instance
+    
+    def get_schemas(self) -> Mapping[str, Tuple[ToolSchema, ...]]:
+        return self.tool_class.get_class_schemas()
+    
+    def get_function(self, name: str) -> Callable:
+        function = self._functions.get(name)
+        if function is None:
+            async def function(**kwargs):
+                instance = await self.resolve()
+                return await getattr(instance, name)(**kwargs)
+            function.__name__ = name
+            self._functions[name] = function
+        return function
+
+
 class ToolRegistry:
     """Registry for managing and accessing tools.
     
@@ -22,6 +63,11 @@ class ToolRegistry:
     def __init__(self):
         """Initialize a new ToolRegistry instance."""
         self.tools = {}
+        # Memoized schema list/JSON, keyed by the identity of the registered schemas
+        # so direct writes to ``self.tools`` still invalidate it
+        self._schema_cache_key = None
+        self._schema_cache: List[Dict[str, Any]] = []
+        self._schema_json_cache: Optional[str] = None
         logger.debug("Initialized new ToolRegistry instance")
     
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
@@ -38,19 +84,43 @@ class ToolRegistry:
         """
         logger.debug(f"Registering tool class: {tool_class.__name__}")
         tool_instance = tool_class(**kwargs)
-        schemas = tool_instance.get_schemas()
+        self._register_functions(tool_class, tool_instance, tool_instance.get_schemas(), function_names)
+
+    def register_lazy_tool(
+        self,
+        tool_class: Type[Tool],
+        factory: Callable[[], Awaitable[Tool]],
+        function_names: Optional[List[str]] = None
+    ):
+        """Register a tool's functions now and build the instance on first call.
         
+        Args:
+            tool_class: The tool class to register (its class-level schemas are used)
+            factory: Coroutine function returning the tool instance
+            function_names: Optional list of specific functions to register
+        """
+        logger.debug(f"Registering lazy tool class: {tool_class.__name__}")
+        lazy_tool = LazyTool(tool_class, factory)
+        self._register_functions(tool_class, lazy_tool, tool_class.get_class_schemas(), function_names)
+
+    def _register_functions(self, tool_class: Type[Tool], tool_instance: Any, schemas: Mapping, function_names: Optional[List[str]]):
         logger.debug(f"Available schemas for {tool_class.__name__}: {list(schemas.keys())}")
         
         registered_openapi = 0
         
         for func_name, schema_list in schemas.items():
             if function_names is None or func_name in function_names:
+                example = next(
+                    (schema.schema.get('example', '') for schema in schema_list
+                     if schema.schema_type == SchemaType.USAGE_EXAMPLE),
+                    None
+                )
                 for schema in schema_list:
                     if schema.schema_type == SchemaType.OPENAPI:
                         self.tools[func_name] = {
                             "instance": tool_instance,
-                            "schema": schema
+                            "schema": schema,
+                            "example": example
                         }
                         registered_openapi += 1
                         logger.debug(f"Registered OpenAPI function {func_name} from {tool_class.__name__}")
@@ -69,7 +139,10 @@ class ToolRegistry:
         for tool_name, tool_info in self.tools.items():
             tool_instance = tool_info['instance']
             function_name = tool_name
-            function = getattr(tool_instance, function_name)
+            if isinstance(tool_instance, LazyTool):
+                function = tool_instance.get_function(function_name)
+            else:
+                function = getattr(tool_instance, function_name)
             available_functions[function_name] = function
             
         logger.debug(f"Retrieved {len(available_functions)} available functions")
@@ -89,20 +162,35 @@ class ToolRegistry:
             logger.warning(f"Tool not found: {tool_name}")
         return tool
 
+    def _current_schemas(self) -> List[Dict[str, Any]]:
+        cache_key = tuple(id(tool_info['schema']) for tool_info in self.tools.values())
+        if cache_key != self._schema_cache_key:
+            self._schema_cache = [
+                tool_info['schema'].schema 
+                for tool_info in self.tools.values()
+                if tool_info['schema'].schema_type == SchemaType.OPENAPI
+            ]
+            self._schema_json_cache = None
+            self._schema_cache_key = cache_key
+        return self._schema_cache
+
     def get_openapi_schemas(self) -> List[Dict[str, Any]]:
         """Get OpenAPI schemas for function calling.
         
         Returns:
             List of OpenAPI-compatible schema definitions
         """
-        schemas = [
-            tool_info['schema'].schema 
-            for tool_info in self.tools.values()
-            if tool_info['schema'].schema_type == SchemaType.OPENAPI
-        ]
+        schemas = list(self._current_schemas())
         logger.debug(f"Retrieved {len(schemas)} OpenAPI schemas")
         return schemas
 
+    def get_openapi_schemas_json(self) -> str:
+        """Get the OpenAPI schemas serialized for the system prompt (indented JSON)."""
+        schemas = self._current_schemas()
+        if self._schema_json_cache is None:
+            self._schema_json_cache = json.dumps(schemas, indent=2)
+        return self._schema_json_cache
+
     def get_usage_examples(self) -> Dict[str, str]:
         """Get usage examples for tools.
         
@@ -111,18 +199,19 @@ class ToolRegistry:
         """
         examples = {}
         
-        # Get all registered tools and their schemas
         for tool_name, tool_info in self.tools.items():
-            tool_instance = tool_info['instance']
-            all_schemas = tool_instance.get_schemas()
+            if 'example' in tool_info:
+                if tool_info['example'] is not None:
+                    examples[tool_name] = tool_info['example']
+                continue
             
-            # Look for usage examples for this function
-            if tool_name in all_schemas:
-                for schema in all_schemas[tool_name]:
-                    if schema.schema_type == SchemaType.USAGE_EXAMPLE:
-                        examples[tool_name] = schema.schema.get('example', '')
-                        logger.debug(f"Found usage example for {tool_name}")
-                        break
+            # Entries added directly to ``tools`` (dynamic MCP tools) carry no example
+            all_schemas = tool_info['instance'].get_schemas()
+            for schema in all_schemas.get(tool_name, ()):
+                if schema.schema_type == SchemaType.USAGE_EXAMPLE:
+                    examples[tool_name] = schema.schema.get('example', '')
+                    logger.debug(f"Found usage example for {tool_name}")
+                    break
         
         logger.debug(f"Retrieved {len(examples)} usage examples")
         return examples
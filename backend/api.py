@@ -46,6 +46,8 @@ MAX_CONCURRENT_IPS = 25
 async def lifespan(app: FastAPI):
     logger.debug(f"Starting up FastAPI application with instance ID: {instance_id} in {config.ENV_MODE.value} mode")
     try:
+        from utils.jwt_verifier import validate_jwt_config
+        validate_jwt_config()
         await db.initialize()
         
         agent_api.initialize(
@@ -61,6 +63,8 @@ async def lifespan(app: FastAPI):
         try:
             await redis.initialize_async()
             logger.debug("Redis connection initialized successfully")
+            from utils.cache import Cache
+            await Cache.start()
         except Exception as e:
             logger.error(f"Failed to initialize Redis connection: {e}")
             # Continue without Redis - the application will handle Redis failures gracefully
@@ -93,8 +97,17 @@ async def lifespan(app: FastAPI):
         files_api_initialize(db)
         social_media_api.initialize(db)
         
+        from triggers.schedule_index import schedule_index
+        if config.SCHEDULE_DISPATCHER_ENABLED:
+            try:
+                await schedule_index.start_dispatcher(db)
+            except Exception as e:
+                logger.warning(f"Failed to start schedule dispatcher: {e}")
+        
         yield
         
+        await schedule_index.stop()
+        
         # Clean up agent resources
         logger.debug("Cleaning up agent resources")
         await agent_api.cleanup()
@@ -102,6 +115,8 @@ async def lifespan(app: FastAPI):
         # Clean up Redis connection
         try:
             logger.debug("Closing Redis connection")
+            from utils.cache import Cache
+            await Cache.close()
             await redis.close()
             logger.debug("Redis connection closed successfully")
         except Exception as e:
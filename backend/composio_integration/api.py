@@ -23,8 +23,11 @@ from .composio_service import (
 from .toolkit_service import ToolkitService, ToolsListResponse
 from .composio_profile_service import ComposioProfileService, ComposioProfile
 from .composio_trigger_service import ComposioTriggerService
-from triggers.trigger_service import get_trigger_service, TriggerEvent, TriggerType
-from triggers.execution_service import get_execution_service
+from triggers.trigger_service import get_trigger_service, TriggerType
+from triggers.webhook_queue import (
+    check_rate_limit, claim_delivery, release_delivery,
+    derive_idempotency_key, enqueue_webhook_event, new_event_id
+)
 from .client import ComposioClient
 from triggers.api import sync_triggers_to_version_config
 
@@ -1010,42 +1013,40 @@ async def composio_webhook(request: Request):
             )
             return JSONResponse(content={"success": True, "matched_triggers": 0})
 
-        trigger_service = get_trigger_service(db)
-        execution_service = get_execution_service(db)
+        # Only Composio's delivery id deduplicates; payload ids name the resource, not the event
+        idempotency_key = derive_idempotency_key(request.headers)
+        event_id = idempotency_key or new_event_id()
 
-        executed = 0
+        queued = 0
         for row in matched:
             trigger_id = row.get("trigger_id")
             if not trigger_id:
                 continue
-            result = await trigger_service.process_trigger_event(trigger_id, payload)
-            if result.success and (result.should_execute_agent or result.should_execute_workflow):
-                trigger = await trigger_service.get_trigger(trigger_id)
-                if not trigger:
-                    continue
-                ctx = {
-                    "payload": payload,
-                    "trigger_slug": trigger_slug,
-                    "webhook_id": wid,
-                }
-                event = TriggerEvent(
-                    trigger_id=trigger_id,
-                    agent_id=trigger.agent_id,
-                    trigger_type=TriggerType.EVENT,
-                    raw_data=payload,
-                    context=ctx,
-                )
-                await execution_service.execute_trigger_result(
-                    agent_id=trigger.agent_id,
-                    trigger_result=result,
-                    trigger_event=event,
-                )
-                executed += 1
+            # Composio retries non-2xx responses, so throttled or duplicate
+            # deliveries are acknowledged and dropped rather than rejected.
+            if await check_rate_limit(trigger_id) is not None:
+                logger.warning(f"Webhook rate limit exceeded for trigger {trigger_id}; dropping Composio event {event_id}")
+                continue
+            if idempotency_key and not await claim_delivery(trigger_id, event_id):
+                logger.debug(f"Duplicate Composio delivery {event_id} for trigger {trigger_id}")
+                continue
+            ctx = {
+                "payload": payload,
+                "trigger_slug": trigger_slug,
+                "webhook_id": wid,
+            }
+            try:
+                enqueue_webhook_event(trigger_id, payload, event_id, TriggerType.EVENT.value, ctx)
+            except Exception:
+                if idempotency_key:
+                    await release_delivery(trigger_id, event_id)
+                raise
+            queued += 1
 
         return JSONResponse(content={
             "success": True,
             "matched_triggers": len(matched),
-            "executed": executed,
+            "queued": queued,
         })
 
     except HTTPException:
@@ -121,7 +121,7 @@ class ComposioIntegrationService:
             raise
     
     async def list_available_toolkits(self, limit: int = 100, cursor: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
-        return await self.toolkit_service.list_toolkits(limit=limit, cursor=cursor, category=category)
+        return await self.toolkit_service.list_catalog_toolkits(limit=limit, cursor=cursor, category=category)
     
     async def search_toolkits(self, query: str, category: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
         return await self.toolkit_service.search_toolkits(query, category=category, limit=limit, cursor=cursor)
@@ -99,11 +99,8 @@ class ComposioTriggerService:
         missing = [slug for slug, info in toolkits_map.items() if not info.get("logo")]
         if missing:
             toolkit_service = ToolkitService()
-            tk_resp = await toolkit_service.list_toolkits(limit=500)
-            tk_items = tk_resp.get("items", [])
-            tk_by_slug = {t.slug.lower(): t for t in tk_items if hasattr(t, 'slug')}
             for slug in missing:
-                t = tk_by_slug.get(slug)
+                t = await toolkit_service.get_toolkit_by_slug(slug)
                 if t and t.logo:
                     toolkits_map[slug]["logo"] = t.logo
 
@@ -173,10 +170,7 @@ class ComposioTriggerService:
 
         # Prepare toolkit info
         toolkit_service = ToolkitService()
-        tk_resp = await toolkit_service.list_toolkits(limit=500)
-        tk_items = tk_resp.get("items", [])
-        tk_by_slug = {t.slug.lower(): t for t in tk_items if hasattr(t, 'slug')}
-        tk = tk_by_slug.get(toolkit_slug.lower())
+        tk = await toolkit_service.get_toolkit_by_slug(toolkit_slug)
         tk_info = {"slug": toolkit_slug, "name": (tk.name if tk else toolkit_slug), "logo": (tk.logo if tk else None)}
 
         def match_toolkit(x: Dict[str, Any]) -> bool:
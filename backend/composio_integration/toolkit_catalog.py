@@ -0,0 +1,233 @@
+"""
+In-memory mirror of the Composio toolkit catalog.
+
+The remote listing (several hundred toolkits) is fetched once per process and
+refreshed in the background every ``REFRESH_INTERVAL`` seconds; requests keep
+being served from the current mirror while a refresh runs. The Composio client
+does not expose conditional requests, so a refresh that returns the same
+listing (same content fingerprint) keeps the existing indexes instead of
+rebuilding them.
+
+Indexes:
+- ``slug`` -> toolkit
+- category id -> slugs, from the remote per-category listings of the browsable
+  categories (so ``popular`` etc. keep their server-side meaning)
+- token -> slugs over name, slug, tags and description, with a sorted token
+  list for prefix lookups while the user is still typing
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import re
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from .toolkit_service import ToolkitInfo, ToolkitService
+
+REFRESH_INTERVAL = 30 * 60
+PAGE_SIZE = 500
+MAX_PAGES = 20
+
+# Relevance of a query token matching each field
+NAME_WEIGHT = 10
+TAG_WEIGHT = 5
+DESCRIPTION_WEIGHT = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class _Snapshot:
+    def __init__(self, toolkits: List["ToolkitInfo"], categories: Dict[str, List[str]], fingerprint: str):
+        self.fingerprint = fingerprint
+        self.order = [toolkit.slug for toolkit in toolkits]
+        self.by_slug: Dict[str, "ToolkitInfo"] = {toolkit.slug: toolkit for toolkit in toolkits}
+        self.by_slug_lower: Dict[str, "ToolkitInfo"] = {toolkit.slug.lower(): toolkit for toolkit in toolkits}
+        self.by_category = categories
+        self.field_tokens: Dict[str, Tuple[Set[str], Set[str], Set[str]]] = {}
+        self.token_index: Dict[str, Set[str]] = {}
+        for toolkit in toolkits:
+            name_tokens = set(tokenize(toolkit.name)) | set(tokenize(toolkit.slug))
+            tag_tokens = {token for tag in toolkit.tags for token in tokenize(tag)}
+            description_tokens = set(tokenize(toolkit.description))
+            self.field_tokens[toolkit.slug] = (name_tokens, tag_tokens, description_tokens)
+            for token in name_tokens | tag_tokens | description_tokens:
+                self.token_index.setdefault(token, set()).add(toolkit.slug)
+        self.sorted_tokens = sorted(self.token_index)
+
+    def slugs_with_prefix(self, prefix: str) -> Set[str]:
+        slugs: Set[str] = set()
+        start = bisect.bisect_left(self.sorted_tokens, prefix)
+        for token in self.sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            slugs |= self.token_index[token]
+        return slugs
+
+    def score(self, slug: str, query: str, query_tokens: List[str]) -> int:
+        toolkit = self.by_slug[slug]
+        name = toolkit.name.lower()
+        name_tokens, tag_tokens, description_tokens = self.field_tokens[slug]
+        score = 0
+        if name == query or slug.lower() == query:
+            score += 100
+        elif name.startswith(query):
+            score += 50
+        for query_token in query_tokens:
+            if any(token.startswith(query_token) for token in name_tokens):
+                score += NAME_WEIGHT
+            if any(token.startswith(query_token) for token in tag_tokens):
+                score += TAG_WEIGHT
+            if any(token.startswith(query_token) for token in description_tokens):
+                score += DESCRIPTION_WEIGHT
+        return score
+
+
+class ToolkitCatalog:
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _fetch_listing(self, service: "ToolkitService", category: Optional[str] = None) -> List["ToolkitInfo"]:
+        toolkits = []
+        cursor = None
+        for _ in range(MAX_PAGES):
+            page = await service.list_toolkits(limit=PAGE_SIZE, cursor=cursor, category=category)
+            toolkits.extend(page.get("items", []))
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+        return toolkits
+
+    async def refresh(self, service: "ToolkitService") -> None:
+        start = time.monotonic()
+        toolkits = await self._fetch_listing(service)
+        categories: Dict[str, List[str]] = {}
+        for category in await service.list_categories():
+            try:
+                categories[category.id] = [toolkit.slug for toolkit in await self._fetch_listing(service, category.id)]
+            except Exception as e:
+                logger.warning(f"Failed to load Composio toolkits for category {category.id}: {e}")
+
+        fingerprint = hashlib.sha256(json.dumps(
+            [[toolkit.model_dump() for toolkit in toolkits], categories], sort_keys=True, default=str
+        ).encode()).hexdigest()
+        if self._snapshot is None or self._snapshot.fingerprint != fingerprint:
+            self._snapshot = _Snapshot(toolkits, categories, fingerprint)
+            logger.info(f"Loaded Composio toolkit catalog with {len(toolkits)} toolkits in {time.monotonic() - start:.2f}s")
+        else:
+            logger.debug("Composio toolkit catalog unchanged")
+        self._loaded_at = time.monotonic()
+
+    async def _background_refresh(self, service: "ToolkitService") -> None:
+        try:
+            async with self._lock:
+                await self.refresh(service)
+        except Exception as e:
+            logger.warning(f"Background refresh of Composio toolkit catalog failed: {e}")
+            # Retry on a later request rather than on every one
+            self._loaded_at = time.monotonic() - REFRESH_INTERVAL / 2
+
+    async def snapshot(self, service: "ToolkitService") -> _Snapshot:
+        if self._snapshot is None:
+            async with self._lock:
+                if self._snapshot is None:
+                    await self.refresh(service)
+        elif time.monotonic() - self._loaded_at > REFRESH_INTERVAL and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self._background_refresh(service))
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        self._loaded_at = 0.0
+
+    async def get(self, service: "ToolkitService", slug: str) -> Optional["ToolkitInfo"]:
+        snapshot = await self.snapshot(service)
+        return snapshot.by_slug.get(slug) or snapshot.by_slug_lower.get(slug.lower())
+
+    async def list(
+        self,
+        service: "ToolkitService",
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> Dict[str, object]:
+        snapshot = await self.snapshot(service)
+        slugs = snapshot.order
+        if category:
+            if category not in snapshot.by_category:
+                # Not a browsable category; ask Composio directly
+                return await service.list_toolkits(limit=limit, cursor=cursor, category=category)
+            slugs = [slug for slug in snapshot.by_category[category] if slug in snapshot.by_slug]
+        return self._page([snapshot.by_slug[slug] for slug in slugs], limit, cursor)
+
+    async def search(
+        self,
+        service: "ToolkitService",
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, object]:
+        """Toolkits matching every query token (by word prefix), best matches first."""
+        snapshot = await self.snapshot(service)
+        query_lower = query.lower().strip()
+        query_tokens = tokenize(query_lower)
+
+        allowed: Optional[Set[str]] = None
+        if category:
+            allowed = set(snapshot.by_category.get(category, [])) or {
+                slug for slug, toolkit in snapshot.by_slug.items() if category in toolkit.categories
+            }
+
+        matches: Optional[Set[str]] = None
+        for token in query_tokens:
+            slugs = snapshot.slugs_with_prefix(token)
+            matches = slugs if matches is None else matches & slugs
+            if not matches:
+                break
+        matches = matches or set()
+        if not matches and query_lower:
+            # Substring fallback for queries that match inside a word (e.g. "hub")
+            matches = {
+                slug for slug, toolkit in snapshot.by_slug.items()
+                if query_lower in toolkit.name.lower()
+                or (toolkit.description and query_lower in toolkit.description.lower())
+                or any(query_lower in tag.lower() for tag in toolkit.tags)
+            }
+        if allowed is not None:
+            matches &= allowed
+
+        position = {slug: index for index, slug in enumerate(snapshot.order)}
+        ranked = sorted(matches, key=lambda slug: (-snapshot.score(slug, query_lower, query_tokens), position[slug]))
+        return self._page([snapshot.by_slug[slug] for slug in ranked], limit, cursor)
+
+    @staticmethod
+    def _page(toolkits: List["ToolkitInfo"], limit: int, cursor: Optional[str]) -> Dict[str, object]:
+        try:
+            offset = max(int(cursor), 0) if cursor else 0
+        except ValueError:
+            offset = 0
+        items = toolkits[offset:offset + limit]
+        next_offset = offset + limit
+        return {
+            "items": items,
+            "total_items": len(toolkits),
+            "total_pages": max((len(toolkits) + limit - 1) // limit, 1) if limit else 1,
+            "current_page": offset // limit + 1 if limit else 1,
+            "next_cursor": str(next_offset) if next_offset < len(toolkits) else None,
+        }
+
+
+toolkit_catalog = ToolkitCatalog()
@@ -2,6 +2,7 @@ from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from utils.logger import logger
 from .client import ComposioClient
+from .toolkit_catalog import toolkit_catalog
 
 
 class CategoryInfo(BaseModel):
@@ -205,40 +206,22 @@ class ToolkitService:
     
     async def get_toolkit_by_slug(self, slug: str) -> Optional[ToolkitInfo]:
         try:
-            toolkits_response = await self.list_toolkits()
-            toolkits = toolkits_response.get("items", [])
-            for toolkit in toolkits:
-                if toolkit.slug == slug:
-                    return toolkit
-            return None
+            return await toolkit_catalog.get(self, slug)
         except Exception as e:
             logger.error(f"Failed to get toolkit {slug}: {e}", exc_info=True)
             raise
     
+    async def list_catalog_toolkits(self, limit: int = 100, cursor: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            return await toolkit_catalog.list(self, limit=limit, cursor=cursor, category=category)
+        except Exception as e:
+            logger.error(f"Failed to list toolkits from catalog: {e}", exc_info=True)
+            raise
+    
     async def search_toolkits(self, query: str, category: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
         try:
-            all_toolkits_response = await self.list_toolkits(limit=500, cursor=cursor, category=category)
-            toolkits = all_toolkits_response.get("items", [])
-            query_lower = query.lower()
-            
-            filtered_toolkits = [
-                toolkit for toolkit in toolkits
-                if query_lower in toolkit.name.lower() 
-                or (toolkit.description and query_lower in toolkit.description.lower())
-                or any(query_lower in tag.lower() for tag in toolkit.tags)
-            ]
-            
-            limited_results = filtered_toolkits[:limit]
-            
-            result = {
-                "items": limited_results,
-                "total_items": len(filtered_toolkits),
-                "total_pages": 1,
-                "current_page": 1,
-                "next_cursor": None
-            }
-            
-            logger.debug(f"Found {len(filtered_toolkits)} toolkits with OAUTH2 in both auth schemes matching query: {query}" + (f" in category {category}" if category else ""))
+            result = await toolkit_catalog.search(self, query, category=category, limit=limit, cursor=cursor)
+            logger.debug(f"Found {result['total_items']} toolkits with OAUTH2 in both auth schemes matching query: {query}" + (f" in category {category}" if category else ""))
             return result
             
         except Exception as e:
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import logging
 import os
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 import sys
@@ -10,11 +12,104 @@ from services import redis
 
 logger = logging.getLogger(__name__)
 
+# Safety net in case a change notification is missed (e.g. during a reconnect)
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("FEATURE_FLAG_SNAPSHOT_MAX_AGE", "60"))
+
+
 class FeatureFlagManager:
     def __init__(self):
         """Initialize with existing Redis service"""
         self.flag_prefix = "feature_flag:"
         self.flag_list_key = "feature_flags:list"
+        self.version_key = "feature_flags:version"
+        self.change_channel = "feature_flags:changes"
+
+        # In-process snapshot of every flag, answered without touching Redis
+        self._snapshot: Dict[str, Dict[str, str]] = {}
+        self._snapshot_version: int = -1
+        self._snapshot_loaded_at: float = 0.0
+        # Created on first use so the manager can be built outside a running event loop
+        self._snapshot_lock: Optional[asyncio.Lock] = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+    async def _load_all(self) -> Dict[str, Dict[str, str]]:
+        """Read every flag hash plus the version counter in one pipelined round trip."""
+        redis_client = await redis.get_client()
+        flag_keys = list(await redis_client.smembers(self.flag_list_key))
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(self.version_key)
+        for key in flag_keys:
+            pipe.hgetall(f"{self.flag_prefix}{key}")
+        results = await pipe.execute()
+
+        version = int(results[0] or 0)
+        flags = {key: data for key, data in zip(flag_keys, results[1:]) if data}
+        self._snapshot = flags
+        self._snapshot_version = version
+        self._snapshot_loaded_at = time.monotonic()
+        return flags
+
+    def _lock(self) -> asyncio.Lock:
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+        return self._snapshot_lock
+
+    async def refresh_snapshot(self) -> Dict[str, Dict[str, str]]:
+        """Reload the in-process flag snapshot from Redis."""
+        async with self._lock():
+            return await self._load_all()
+
+    async def _ensure_snapshot(self):
+        self._ensure_listener()
+        if time.monotonic() - self._snapshot_loaded_at <= SNAPSHOT_MAX_AGE_SECONDS and self._snapshot_version >= 0:
+            return
+        async with self._lock():
+            # Another coroutine may have refreshed while we waited for the lock
+            if time.monotonic() - self._snapshot_loaded_at <= SNAPSHOT_MAX_AGE_SECONDS and self._snapshot_version >= 0:
+                return
+            await self._load_all()
+
+    def _ensure_listener(self):
+        if self._listener_task is not None and not self._listener_task.done():
+            return
+        try:
+            self._listener_task = asyncio.get_running_loop().create_task(self._listen_for_changes())
+        except RuntimeError:
+            pass
+
+    async def _listen_for_changes(self):
+        """Apply flag change notifications published by set_flag/delete_flag on any instance."""
+        while True:
+            pubsub = None
+            try:
+                pubsub = await redis.create_pubsub()
+                await pubsub.subscribe(self.change_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        version = int(json.loads(message["data"]).get("version", 0))
+                    except (TypeError, ValueError, AttributeError):
+                        version = self._snapshot_version + 1
+                    if version > self._snapshot_version:
+                        await self.refresh_snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Feature flag change listener error, resubscribing: {e}")
+                # Force a reload on next check since we may have missed changes
+                self._snapshot_loaded_at = 0.0
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def _publish_change(self, redis_client, key: str):
+        version = await redis_client.incr(self.version_key)
+        await redis_client.publish(self.change_channel, json.dumps({"key": key, "version": version}))
     
     async def set_flag(self, key: str, enabled: bool, description: str = "") -> bool:
         """Set a feature flag to enabled or disabled"""
@@ -30,6 +125,8 @@ class FeatureFlagManager:
             redis_client = await redis.get_client()
             await redis_client.hset(flag_key, mapping=flag_data)
             await redis_client.sadd(self.flag_list_key, key)
+            self._snapshot[key] = flag_data
+            await self._publish_change(redis_client, key)
             
             logger.debug(f"Set feature flag {key} to {enabled}")
             return True
@@ -40,14 +137,12 @@ class FeatureFlagManager:
     async def is_enabled(self, key: str) -> bool:
         """Check if a feature flag is enabled"""
         try:
-            flag_key = f"{self.flag_prefix}{key}"
-            redis_client = await redis.get_client()
-            enabled = await redis_client.hget(flag_key, 'enabled')
-            return enabled == 'true' if enabled else False
+            await self._ensure_snapshot()
         except Exception as e:
-            logger.error(f"Failed to check feature flag {key}: {e}")
-            # Return False by default if Redis is unavailable
-            return False
+            logger.error(f"Failed to refresh feature flags for {key}: {e}")
+            # Fall back to the last known snapshot (False if never loaded)
+        flag = self._snapshot.get(key)
+        return bool(flag) and flag.get('enabled') == 'true'
     
     async def get_flag(self, key: str) -> Optional[Dict[str, str]]:
         """Get feature flag details"""
@@ -68,6 +163,8 @@ class FeatureFlagManager:
             deleted = await redis_client.delete(flag_key)
             if deleted:
                 await redis_client.srem(self.flag_list_key, key)
+                self._snapshot.pop(key, None)
+                await self._publish_change(redis_client, key)
                 logger.debug(f"Deleted feature flag: {key}")
                 return True
             return False
@@ -78,14 +175,8 @@ class FeatureFlagManager:
     async def list_flags(self) -> Dict[str, bool]:
         """List all feature flags with their status"""
         try:
-            redis_client = await redis.get_client()
-            flag_keys = await redis_client.smembers(self.flag_list_key)
-            flags = {}
-            
-            for key in flag_keys:
-                flags[key] = await self.is_enabled(key)
-            
-            return flags
+            flags = await self.refresh_snapshot()
+            return {key: data.get('enabled') == 'true' for key, data in flags.items()}
         except Exception as e:
             logger.error(f"Failed to list feature flags: {e}")
             return {}
@@ -93,16 +184,8 @@ class FeatureFlagManager:
     async def get_all_flags_details(self) -> Dict[str, Dict[str, str]]:
         """Get all feature flags with detailed information"""
         try:
-            redis_client = await redis.get_client()
-            flag_keys = await redis_client.smembers(self.flag_list_key)
-            flags = {}
-            
-            for key in flag_keys:
-                flag_data = await self.get_flag(key)
-                if flag_data:
-                    flags[key] = flag_data
-            
-            return flags
+            flags = await self.refresh_snapshot()
+            return {key: dict(data) for key, data in flags.items()}
         except Exception as e:
             logger.error(f"Failed to get all flags details: {e}")
             return {}
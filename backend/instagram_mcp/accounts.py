@@ -165,6 +165,21 @@ class InstagramAccountService:
         
         return len(result.data) > 0
     
+    @staticmethod
+    def format_agent_social_account(account: Dict[str, Any]) -> Dict[str, Any]:
+        """Map an agent_social_accounts row to the account shape the Instagram tool expects"""
+        return {
+            "id": account["account_id"],
+            "username": account["account_username"],
+            "name": account["account_name"],
+            "biography": account["biography"],
+            "profile_picture_url": account["profile_picture_url"],
+            "account_type": account["account_type"],
+            "followers_count": account["followers_count"],
+            "following_count": account["following_count"],
+            "media_count": account["media_count"],
+        }
+    
     async def get_accounts_for_agent(self, user_id: str, agent_id: str) -> List[Dict[str, Any]]:
         """Get enabled Instagram accounts for a specific agent with MCP toggle filtering"""
         client = await self.db.client
@@ -208,19 +223,7 @@ class InstagramAccountService:
             "platform", "instagram"  
         ).eq("enabled", True).execute()
         
-        accounts = []
-        for account in result.data:
-            accounts.append({
-                "id": account["account_id"],
-                "username": account["account_username"],
-                "name": account["account_name"],
-                "biography": account["biography"],
-                "profile_picture_url": account["profile_picture_url"],
-                "account_type": account["account_type"],
-                "followers_count": account["followers_count"],
-                "following_count": account["following_count"],
-                "media_count": account["media_count"],
-            })
+        accounts = [self.format_agent_social_account(account) for account in result.data]
         
         logger.info(f"🟠 REAL-TIME RESULT: Found {len(accounts)} enabled Instagram accounts for agent {agent_id}")
         return accounts
@@ -1,10 +1,11 @@
 import json
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 from utils.auth_utils import get_current_user_id_from_jwt, verify_agent_access
 from services.supabase import DBConnection
-from knowledge_base.file_processor import FileProcessor
+from knowledge_base.file_processor import FileProcessor, validate_git_source
+from knowledge_base.retrieval import index_entry_chunks, get_retriever, retrieve_context
 from utils.logger import logger
 from flags.flags import is_enabled
 
@@ -51,6 +52,17 @@ class UpdateKnowledgeBaseEntryRequest(BaseModel):
     usage_context: Optional[str] = Field(None, pattern="^(always|on_request|contextual)$")
     is_active: Optional[bool] = None
 
+class GitRepositoryRequest(BaseModel):
+    git_url: str = Field(..., min_length=1)
+    branch: str = "main"
+    include_patterns: Optional[List[str]] = None
+    exclude_patterns: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def validate_source(self):
+        validate_git_source(self.git_url, self.branch)
+        return self
+
 class ProcessingJobResponse(BaseModel):
     job_id: str
     job_type: str
@@ -66,6 +78,15 @@ class ProcessingJobResponse(BaseModel):
 db = DBConnection()
 
 
+async def _index_chunks(client, entry_id: str, agent_id: str, content: str):
+    # The entry is already saved; a later re-index repairs its chunks, so don't fail the request
+    try:
+        await index_entry_chunks(client, entry_id, agent_id, content)
+    except Exception as e:
+        logger.warning(f"Failed to index chunks for knowledge base entry {entry_id}: {str(e)}")
+        get_retriever().invalidate(agent_id)
+
+
 @router.get("/agents/{agent_id}", response_model=KnowledgeBaseListResponse)
 async def get_agent_knowledge_base(
     agent_id: str,
@@ -171,6 +192,7 @@ async def create_agent_knowledge_base_entry(
             raise HTTPException(status_code=500, detail="Failed to create agent knowledge base entry")
         
         created_entry = result.data[0]
+        await _index_chunks(client, created_entry['entry_id'], agent_id, created_entry['content'])
         
         return KnowledgeBaseEntryResponse(
             entry_id=created_entry['entry_id'],
@@ -254,6 +276,128 @@ async def upload_file_to_agent_kb(
         raise HTTPException(status_code=500, detail="Failed to upload file")
 
 
+@router.post("/agents/{agent_id}/git-repository")
+async def add_git_repository_to_agent_kb(
+    agent_id: str,
+    repo: GitRepositoryRequest,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id_from_jwt)
+):
+    if not await is_enabled("knowledge_base"):
+        raise HTTPException(
+            status_code=403, 
+            detail="This feature is not available at the moment."
+        )
+    
+    """Add a git repository to an agent knowledge base (re-syncs it if already tracked)"""
+    if agent_id == "suna-default":
+        raise HTTPException(status_code=403, detail="Cannot modify knowledge base for the default agent")
+    
+    try:
+        client = await db.client
+        
+        agent_data = await verify_agent_access(client, agent_id, user_id)
+        account_id = agent_data['account_id']
+        
+        job_id = await client.rpc('create_agent_kb_processing_job', {
+            'p_agent_id': agent_id,
+            'p_account_id': account_id,
+            'p_job_type': 'git_clone',
+            'p_source_info': {
+                'git_url': repo.git_url,
+                'branch': repo.branch
+            }
+        }).execute()
+        
+        if not job_id.data:
+            raise HTTPException(status_code=500, detail="Failed to create processing job")
+        
+        job_id = job_id.data
+        processor = FileProcessor()
+        background_tasks.add_task(
+            process_git_background,
+            job_id,
+            lambda progress: processor.process_git_repository(
+                agent_id, account_id, repo.git_url, repo.branch,
+                repo.include_patterns, repo.exclude_patterns,
+                progress_callback=progress
+            )
+        )
+        
+        return {
+            "job_id": job_id,
+            "message": "Repository sync started. Processing in background.",
+            "git_url": repo.git_url
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding git repository to agent {agent_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to add git repository")
+
+
+@router.post("/git-sources/{source_id}/sync")
+async def sync_git_source(
+    source_id: str,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id_from_jwt)
+):
+    if not await is_enabled("knowledge_base"):
+        raise HTTPException(
+            status_code=403, 
+            detail="This feature is not available at the moment."
+        )
+    
+    """Fetch new commits for a tracked git source and re-ingest only changed files"""
+    try:
+        client = await db.client
+        
+        source_result = await client.table('agent_kb_git_sources').select(
+            'source_id, agent_id, account_id, git_url, branch'
+        ).eq('source_id', source_id).execute()
+        if not source_result.data:
+            raise HTTPException(status_code=404, detail="Git source not found")
+        
+        source = source_result.data[0]
+        await verify_agent_access(client, source['agent_id'], user_id)
+        
+        job_id = await client.rpc('create_agent_kb_processing_job', {
+            'p_agent_id': source['agent_id'],
+            'p_account_id': source['account_id'],
+            'p_job_type': 'git_clone',
+            'p_source_info': {
+                'source_id': source_id,
+                'git_url': source['git_url'],
+                'branch': source['branch'],
+                'sync': True
+            }
+        }).execute()
+        
+        if not job_id.data:
+            raise HTTPException(status_code=500, detail="Failed to create processing job")
+        
+        job_id = job_id.data
+        processor = FileProcessor()
+        background_tasks.add_task(
+            process_git_background,
+            job_id,
+            lambda progress: processor.sync_git_repository(source_id, progress_callback=progress)
+        )
+        
+        return {
+            "job_id": job_id,
+            "message": "Repository sync started. Processing in background.",
+            "source_id": source_id
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error syncing git source {source_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to sync git source")
+
+
 @router.put("/{entry_id}", response_model=KnowledgeBaseEntryResponse)
 async def update_knowledge_base_entry(
     entry_id: str,
@@ -303,6 +447,10 @@ async def update_knowledge_base_entry(
             raise HTTPException(status_code=500, detail="Failed to update knowledge base entry")
         
         updated_entry = result.data[0]
+        if 'content' in update_data:
+            await _index_chunks(client, entry_id, agent_id, updated_entry['content'])
+        else:
+            get_retriever().invalidate(agent_id)
         
         logger.debug(f"Updated agent knowledge base entry {entry_id} for agent {agent_id}")
         
@@ -356,6 +504,7 @@ async def delete_knowledge_base_entry(
         await verify_agent_access(client, agent_id, user_id)
         
         result = await client.table('agent_knowledge_base_entries').delete().eq('entry_id', entry_id).execute()
+        get_retriever().invalidate(agent_id)
         
         logger.debug(f"Deleted agent knowledge base entry {entry_id} for agent {agent_id}")
         
@@ -493,17 +642,32 @@ async def process_file_background(
             'p_status': 'processing'
         }).execute()
         
+        async def report_progress(processed_files: int, total_files: int, entries_created: int):
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'processing',
+                'p_result_info': {'processed_files': processed_files},
+                'p_entries_created': entries_created,
+                'p_total_files': total_files
+            }).execute()
+        
         result = await processor.process_file_upload(
-            agent_id, account_id, file_content, filename, mime_type
+            agent_id, account_id, file_content, filename, mime_type,
+            progress_callback=report_progress
         )
         
         if result['success']:
+            if 'zip_entry_id' in result:
+                entries_created = result['total_extracted']
+                total_files = result['total_extracted'] + result['total_failed']
+            else:
+                entries_created = total_files = 1
             await client.rpc('update_agent_kb_job_status', {
                 'p_job_id': job_id,
                 'p_status': 'completed',
                 'p_result_info': result,
-                'p_entries_created': 1,
-                'p_total_files': 1
+                'p_entries_created': entries_created,
+                'p_total_files': total_files
             }).execute()
         else:
             await client.rpc('update_agent_kb_job_status', {
@@ -524,10 +688,60 @@ async def process_file_background(
             pass
 
 
+async def process_git_background(job_id: str, run_sync):
+    """Background task to ingest or re-sync a git repository"""
+    
+    client = await db.client
+    
+    async def report_progress(processed_files: int, total_files: int, entries_created: int):
+        await client.rpc('update_agent_kb_job_status', {
+            'p_job_id': job_id,
+            'p_status': 'processing',
+            'p_result_info': {'processed_files': processed_files},
+            'p_entries_created': entries_created,
+            'p_total_files': total_files
+        }).execute()
+    
+    try:
+        await client.rpc('update_agent_kb_job_status', {
+            'p_job_id': job_id,
+            'p_status': 'processing'
+        }).execute()
+        
+        result = await run_sync(report_progress)
+        
+        if result['success']:
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'completed',
+                'p_result_info': result,
+                'p_entries_created': result['total_processed'],
+                'p_total_files': result['total_processed'] + result['total_failed']
+            }).execute()
+        else:
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'failed',
+                'p_error_message': result.get('error', 'Unknown error')
+            }).execute()
+            
+    except Exception as e:
+        logger.error(f"Error in background git processing for job {job_id}: {str(e)}")
+        try:
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'failed',
+                'p_error_message': str(e)
+            }).execute()
+        except:
+            pass
+
+
 @router.get("/agents/{agent_id}/context")
 async def get_agent_knowledge_base_context(
     agent_id: str,
     max_tokens: int = 4000,
+    query: Optional[str] = None,
     user_id: str = Depends(get_current_user_id_from_jwt)
 ):
     if not await is_enabled("knowledge_base"):
@@ -536,24 +750,28 @@ async def get_agent_knowledge_base_context(
             detail="This feature is not available at the moment."
         )
     
-    """Get knowledge base context for agent prompts"""
+    """Get knowledge base context for agent prompts, retrieved for `query` when given"""
     try:
         client = await db.client
         
         # Verify agent access
         await verify_agent_access(client, agent_id, user_id)
         
-        result = await client.rpc('get_agent_knowledge_base_context', {
-            'p_agent_id': agent_id,
-            'p_max_tokens': max_tokens
-        }).execute()
-        
-        context = result.data if result.data else None
+        if query:
+            context = await retrieve_context(client, agent_id, query, max_tokens)
+        else:
+            result = await client.rpc('get_agent_knowledge_base_context', {
+                'p_agent_id': agent_id,
+                'p_max_tokens': max_tokens
+            }).execute()
+            
+            context = result.data if result.data else None
         
         return {
             "context": context,
             "max_tokens": max_tokens,
-            "agent_id": agent_id
+            "agent_id": agent_id,
+            "query": query
         }
         
     except HTTPException:
@@ -6,8 +6,14 @@ import shutil
 import asyncio
 import subprocess
 import re
-from typing import List, Dict, Any, Optional, Tuple
+import functools
+import hashlib
+import ipaddress
+import socket
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 from pathlib import Path
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 import mimetypes
 import chardet
 
@@ -16,6 +22,41 @@ import docx
 
 from utils.logger import logger
 from services.supabase import DBConnection
+from knowledge_base.retrieval import index_entry_chunks, index_new_entries_chunks, get_retriever
+
+# (processed_files, total_files, entries_created)
+ProgressCallback = Callable[[int, int, int], Awaitable[None]]
+
+_BRANCH_PATTERN = re.compile(r'^[A-Za-z0-9._/-]+$')
+
+
+def validate_git_source(git_url: str, branch: str) -> None:
+    """
+    Reject repository URLs and branches that are unsafe to hand to git.
+
+    Only https URLs are allowed (no file://, ssh or git:// access to the
+    server's own files or network), and neither value may look like an option.
+    """
+    parts = urlsplit(git_url)
+    if git_url.startswith('-') or parts.scheme != 'https' or not parts.hostname:
+        raise ValueError("Repository URL must be an https:// URL")
+    if parts.username or parts.password:
+        raise ValueError("Repository URL must not contain credentials")
+    if branch.startswith('-') or '..' in branch or not _BRANCH_PATTERN.match(branch):
+        raise ValueError(f"Invalid branch name: {branch}")
+
+
+async def ensure_public_host(git_url: str) -> None:
+    """Raise ValueError unless every address the URL's host resolves to is public."""
+    host = urlsplit(git_url).hostname
+    try:
+        infos = await asyncio.to_thread(socket.getaddrinfo, host, 443, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve repository host {host}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not address.is_global:
+            raise ValueError(f"Repository host {host} resolves to a non-public address")
 
 class FileProcessor:
     SUPPORTED_TEXT_EXTENSIONS = {
@@ -29,6 +70,19 @@ class FileProcessor:
     MAX_FILE_SIZE = 50 * 1024 * 1024
     MAX_ZIP_ENTRIES = 1000
     MAX_CONTENT_LENGTH = 100000
+    EXTRACTION_CONCURRENCY = 8
+    INSERT_BATCH_SIZE = 50
+    
+    # Extracted text for these formats is cached by content hash and shared across agents
+    CONTENT_STORE_EXTENSIONS = {'.pdf', '.docx'}
+    GIT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'kb_git_cache')
+    # Working copies unused for this long are removed, and at most GIT_CACHE_MAX_REPOS are kept
+    GIT_CACHE_MAX_AGE_SECONDS = 3 * 24 * 60 * 60
+    GIT_CACHE_MAX_REPOS = 50
+    # Only https, never prompt for credentials and don't follow redirects to other hosts
+    GIT_ENV = {'GIT_ALLOW_PROTOCOL': 'https', 'GIT_TERMINAL_PROMPT': '0'}
+    GIT_CONFIG = ('-c', 'http.followRedirects=false', '-c', 'core.hooksPath=/dev/null')
+    _git_locks: Dict[str, asyncio.Lock] = {}
     
     def __init__(self):
         self.db = DBConnection()
@@ -39,7 +93,8 @@ class FileProcessor:
         account_id: str, 
         file_content: bytes, 
         filename: str, 
-        mime_type: str
+        mime_type: str,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         try:
             file_size = len(file_content)
@@ -49,15 +104,15 @@ class FileProcessor:
             file_extension = Path(filename).suffix.lower()
 
             if file_extension == '.zip':
-                return await self._process_zip_file(agent_id, account_id, file_content, filename)
+                return await self._process_zip_file(agent_id, account_id, file_content, filename, progress_callback)
+            
+            client = await self.db.client
             
-            content = await self._extract_file_content(file_content, filename, mime_type)
+            content, content_hash = await self._extract_with_content_store(client, file_content, filename, mime_type)
             
             if not content or not content.strip():
                 raise ValueError(f"No extractable content found in {filename}")
             
-            client = await self.db.client
-            
             entry_data = {
                 'agent_id': agent_id,
                 'account_id': account_id,
@@ -73,6 +128,7 @@ class FileProcessor:
                 },
                 'file_size': file_size,
                 'file_mime_type': mime_type,
+                'content_hash': content_hash,
                 'usage_context': 'always',
                 'is_active': True
             }
@@ -82,6 +138,8 @@ class FileProcessor:
             if not result.data:
                 raise Exception("Failed to create knowledge base entry")
             
+            await self._index_chunks(client, result.data[0]['entry_id'], agent_id, content)
+            
             return {
                 'success': True,
                 'entry_id': result.data[0]['entry_id'],
@@ -103,9 +161,23 @@ class FileProcessor:
         agent_id: str, 
         account_id: str, 
         zip_content: bytes, 
-        zip_filename: str
+        zip_filename: str,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         try:
+            zip_ref = zipfile.ZipFile(io.BytesIO(zip_content), 'r')
+        except zipfile.BadZipFile as e:
+            return {
+                'success': False,
+                'zip_filename': zip_filename,
+                'error': f"Invalid ZIP archive: {str(e)}"
+            }
+        
+        try:
+            members = [info for info in zip_ref.infolist() if not info.is_dir() and os.path.basename(info.filename)]
+            if len(members) > self.MAX_ZIP_ENTRIES:
+                raise ValueError(f"ZIP contains too many files: {len(members)} (max: {self.MAX_ZIP_ENTRIES})")
+            
             client = await self.db.client
             
             zip_entry_data = {
@@ -130,71 +202,40 @@ class FileProcessor:
             zip_result = await client.table('agent_knowledge_base_entries').insert(zip_entry_data).execute()
             zip_entry_id = zip_result.data[0]['entry_id']
             
-            extracted_files = []
-            failed_files = []
+            def build_entry(file_path: str, filename: str, mime_type: str, file_size: int, content: str) -> Dict[str, Any]:
+                return {
+                    'agent_id': agent_id,
+                    'account_id': account_id,
+                    'name': f"📄 {filename}",
+                    'description': f"Extracted from {zip_filename}: {file_path}",
+                    'content': content[:self.MAX_CONTENT_LENGTH],
+                    'source_type': 'zip_extracted',
+                    'source_metadata': {
+                        'filename': filename,
+                        'original_path': file_path,
+                        'zip_filename': zip_filename,
+                        'mime_type': mime_type,
+                        'file_size': file_size,
+                        'extraction_method': self._get_extraction_method(Path(filename).suffix.lower(), mime_type)
+                    },
+                    'file_size': file_size,
+                    'file_mime_type': mime_type,
+                    'extracted_from_zip_id': zip_entry_id,
+                    'usage_context': 'always',
+                    'is_active': True
+                }
             
-            with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                
-                if len(file_list) > self.MAX_ZIP_ENTRIES:
-                    raise ValueError(f"ZIP contains too many files: {len(file_list)} (max: {self.MAX_ZIP_ENTRIES})")
-                
-                for file_path in file_list:
-                    if file_path.endswith('/'):
-                        continue
-                    
-                    try:
-                        file_content = zip_ref.read(file_path)
-                        filename = os.path.basename(file_path)
-                        
-                        if not filename:
-                            continue
-                        
-                        mime_type, _ = mimetypes.guess_type(filename)
-                        if not mime_type:
-                            mime_type = 'application/octet-stream'
-                        
-                        content = await self._extract_file_content(file_content, filename, mime_type)
-                        
-                        if content and content.strip():
-                            extracted_entry_data = {
-                                'agent_id': agent_id,
-                                'account_id': account_id,
-                                'name': f"📄 {filename}",
-                                'description': f"Extracted from {zip_filename}: {file_path}",
-                                'content': content[:self.MAX_CONTENT_LENGTH],
-                                'source_type': 'zip_extracted',
-                                'source_metadata': {
-                                    'filename': filename,
-                                    'original_path': file_path,
-                                    'zip_filename': zip_filename,
-                                    'mime_type': mime_type,
-                                    'file_size': len(file_content),
-                                    'extraction_method': self._get_extraction_method(Path(filename).suffix.lower(), mime_type)
-                                },
-                                'file_size': len(file_content),
-                                'file_mime_type': mime_type,
-                                'extracted_from_zip_id': zip_entry_id,
-                                'usage_context': 'always',
-                                'is_active': True
-                            }
-                            
-                            extracted_result = await client.table('agent_knowledge_base_entries').insert(extracted_entry_data).execute()
-                            
-                            extracted_files.append({
-                                'filename': filename,
-                                'path': file_path,
-                                'entry_id': extracted_result.data[0]['entry_id'],
-                                'content_length': len(content)
-                            })
-                        
-                    except Exception as e:
-                        logger.error(f"Error extracting {file_path} from ZIP: {str(e)}")
-                        failed_files.append({
-                            'filename': os.path.basename(file_path),
-                            'path': file_path,
-                            'error': str(e)
-                        })
+            sources = [
+                (info.filename, os.path.basename(info.filename), functools.partial(self._read_zip_member, zip_ref, info))
+                for info in members
+            ]
+            extracted_files, failed_files = await self._ingest_files(
+                client, agent_id, sources, build_entry, progress_callback
+            )
+            for item in extracted_files:
+                item['path'] = item.pop('source_path')
+            for item in failed_files:
+                item['path'] = item.pop('source_path')
             
             return {
                 'success': True,
@@ -213,6 +254,8 @@ class FileProcessor:
                 'zip_filename': zip_filename,
                 'error': str(e)
             }
+        finally:
+            zip_ref.close()
     
     async def process_git_repository(
         self, 
@@ -221,31 +264,26 @@ class FileProcessor:
         git_url: str,
         branch: str = 'main',
         include_patterns: List[str] = None,
-        exclude_patterns: List[str] = None
+        exclude_patterns: List[str] = None,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
+        """Add a git repository as a knowledge source, or re-sync it if the agent already tracks it."""
         if include_patterns is None:
             include_patterns = ['*.txt', '*.pdf', '*.docx']
         
         if exclude_patterns is None:
             exclude_patterns = ['node_modules/*', '.git/*', '*.pyc', '__pycache__/*', '.env', '*.log']
         
-        temp_dir = None
         try:
-            temp_dir = tempfile.mkdtemp()
-            
-            clone_cmd = ['git', 'clone', '--depth', '1', '--branch', branch, git_url, temp_dir]
-            process = await asyncio.create_subprocess_exec(
-                *clone_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"Git clone failed: {stderr.decode()}")
-            
+            validate_git_source(git_url, branch)
             client = await self.db.client
             
+            existing = await client.table('agent_kb_git_sources').select('source_id').eq(
+                'agent_id', agent_id
+            ).eq('git_url', git_url).eq('branch', branch).execute()
+            if existing.data:
+                return await self.sync_git_repository(existing.data[0]['source_id'], progress_callback)
+            
             repo_name = git_url.split('/')[-1].replace('.git', '')
             repo_entry_data = {
                 'agent_id': agent_id,
@@ -267,100 +305,441 @@ class FileProcessor:
             repo_result = await client.table('agent_knowledge_base_entries').insert(repo_entry_data).execute()
             repo_entry_id = repo_result.data[0]['entry_id']
             
-            processed_files = []
-            failed_files = []
+            source_result = await client.table('agent_kb_git_sources').insert({
+                'agent_id': agent_id,
+                'account_id': account_id,
+                'repo_entry_id': repo_entry_id,
+                'git_url': git_url,
+                'branch': branch,
+                'include_patterns': include_patterns,
+                'exclude_patterns': exclude_patterns
+            }).execute()
             
-            for root, dirs, files in os.walk(temp_dir):
-                if '.git' in dirs:
-                    dirs.remove('.git')
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, temp_dir)
-                    
-                    if not self._should_include_file(relative_path, include_patterns, exclude_patterns):
-                        continue
-                    
-                    try:
-                        with open(file_path, 'rb') as f:
-                            file_content = f.read()
-                        
-                        if len(file_content) > self.MAX_FILE_SIZE:
-                            continue
-                        
-                        mime_type, _ = mimetypes.guess_type(file)
-                        if not mime_type:
-                            mime_type = 'application/octet-stream'
-                        
-                        content = await self._extract_file_content(file_content, file, mime_type)
-                        
-                        if content and content.strip():
-                            file_entry_data = {
-                                'agent_id': agent_id,
-                                'account_id': account_id,
-                                'name': f"📄 {file}",
-                                'description': f"From {repo_name}: {relative_path}",
-                                'content': content[:self.MAX_CONTENT_LENGTH],
-                                'source_type': 'git_repo',
-                                'source_metadata': {
-                                    'filename': file,
-                                    'relative_path': relative_path,
-                                    'git_url': git_url,
-                                    'branch': branch,
-                                    'repo_name': repo_name,
-                                    'mime_type': mime_type,
-                                    'file_size': len(file_content),
-                                    'extraction_method': self._get_extraction_method(Path(file).suffix.lower(), mime_type)
-                                },
-                                'file_size': len(file_content),
-                                'file_mime_type': mime_type,
-                                'extracted_from_zip_id': repo_entry_id,
-                                'usage_context': 'always',
-                                'is_active': True
-                            }
-                            
-                            file_result = await client.table('agent_knowledge_base_entries').insert(file_entry_data).execute()
-                            
-                            processed_files.append({
-                                'filename': file,
-                                'relative_path': relative_path,
-                                'entry_id': file_result.data[0]['entry_id'],
-                                'content_length': len(content)
-                            })
-                    
-                    except Exception as e:
-                        logger.error(f"Error processing {relative_path} from git repo: {str(e)}")
-                        failed_files.append({
-                            'filename': file,
-                            'relative_path': relative_path,
-                            'error': str(e)
-                        })
+            return await self.sync_git_repository(source_result.data[0]['source_id'], progress_callback)
             
+        except Exception as e:
+            logger.error(f"Error processing git repository {git_url}: {str(e)}")
             return {
-                'success': True,
-                'repo_entry_id': repo_entry_id,
-                'repo_name': repo_name,
+                'success': False,
                 'git_url': git_url,
-                'branch': branch,
+                'error': str(e)
+            }
+    
+    async def sync_git_repository(
+        self,
+        source_id: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Bring a tracked git source up to date.
+        
+        The working copy is cached per repository, so a re-sync fetches only new
+        commits. Files are compared by git blob SHA against the last sync: new
+        files are inserted, changed files update their existing entry, removed
+        or emptied files delete theirs, and unchanged files are not read at all.
+        ``last_commit_sha`` only advances once every file of a commit synced, so
+        files that failed are retried even if no new commit lands.
+        """
+        git_url = None
+        try:
+            client = await self.db.client
+            
+            source_result = await client.table('agent_kb_git_sources').select('*').eq('source_id', source_id).execute()
+            if not source_result.data:
+                raise ValueError(f"Git source {source_id} not found")
+            source = source_result.data[0]
+            agent_id = source['agent_id']
+            account_id = source['account_id']
+            git_url = source['git_url']
+            branch = source['branch']
+            repo_entry_id = source['repo_entry_id']
+            repo_name = git_url.split('/')[-1].replace('.git', '')
+            
+            repo_dir = self._git_cache_path(git_url, branch)
+            lock = self._git_locks.setdefault(repo_dir, asyncio.Lock())
+            async with lock:
+                commit_sha = await self._update_working_copy(repo_dir, git_url, branch)
+                # Marks the working copy as recently used for _prune_git_cache
+                os.utime(repo_dir)
+                
+                result = {
+                    'success': True,
+                    'source_id': source_id,
+                    'repo_entry_id': repo_entry_id,
+                    'repo_name': repo_name,
+                    'git_url': git_url,
+                    'branch': branch,
+                    'commit_sha': commit_sha,
+                    'processed_files': [],
+                    'failed_files': [],
+                    'removed_files': [],
+                    'unchanged_files': 0,
+                    'total_processed': 0,
+                    'total_failed': 0
+                }
+                
+                previous_hashes: Dict[str, str] = source.get('file_hashes') or {}
+                file_entries: Dict[str, str] = source.get('file_entries') or {}
+                if commit_sha == source.get('last_commit_sha'):
+                    result['unchanged_files'] = len(previous_hashes)
+                    return result
+                
+                tree = await self._list_git_tree(
+                    repo_dir, source.get('include_patterns') or [], source.get('exclude_patterns') or []
+                )
+                changed = [path for path, blob_sha in tree.items() if previous_hashes.get(path) != blob_sha]
+                removed = [path for path in previous_hashes if path not in tree]
+                
+                def build_entry(relative_path: str, filename: str, mime_type: str, file_size: int, content: str) -> Dict[str, Any]:
+                    return {
+                        'agent_id': agent_id,
+                        'account_id': account_id,
+                        'name': f"📄 {filename}",
+                        'description': f"From {repo_name}: {relative_path}",
+                        'content': content[:self.MAX_CONTENT_LENGTH],
+                        'source_type': 'git_repo',
+                        'source_metadata': {
+                            'filename': filename,
+                            'relative_path': relative_path,
+                            'git_url': git_url,
+                            'branch': branch,
+                            'repo_name': repo_name,
+                            'commit_sha': commit_sha,
+                            'mime_type': mime_type,
+                            'file_size': file_size,
+                            'extraction_method': self._get_extraction_method(Path(filename).suffix.lower(), mime_type)
+                        },
+                        'file_size': file_size,
+                        'file_mime_type': mime_type,
+                        'extracted_from_zip_id': repo_entry_id,
+                        'usage_context': 'always',
+                        'is_active': True
+                    }
+                
+                sources = [
+                    (relative_path, os.path.basename(relative_path), functools.partial(self._read_local_file, os.path.join(repo_dir, relative_path)))
+                    for relative_path in changed
+                ]
+                processed_files, failed_files = await self._ingest_files(
+                    client, agent_id, sources, build_entry, progress_callback,
+                    existing_entries={path: file_entries[path] for path in changed if path in file_entries}
+                )
+            await self._prune_git_cache()
+            
+            # Changed files that are neither processed nor failed had no text left
+            handled = {item['source_path'] for item in processed_files + failed_files}
+            emptied = [path for path in changed if path not in handled]
+            removed_entry_ids = [file_entries[path] for path in removed + emptied if path in file_entries]
+            for i in range(0, len(removed_entry_ids), self.INSERT_BATCH_SIZE):
+                await client.table('agent_knowledge_base_entries').delete().in_(
+                    'entry_id', removed_entry_ids[i:i + self.INSERT_BATCH_SIZE]
+                ).execute()
+            if removed_entry_ids:
+                get_retriever().invalidate(agent_id)
+            
+            # Failed files keep their previous hash (and entry) so the next sync retries them
+            new_hashes = {path: blob_sha for path, blob_sha in tree.items() if path not in changed}
+            new_entries = {path: entry_id for path, entry_id in file_entries.items() if path in tree and path not in emptied}
+            for path in emptied:
+                new_hashes[path] = tree[path]
+            for item in processed_files:
+                new_hashes[item['source_path']] = tree[item['source_path']]
+                new_entries[item['source_path']] = item['entry_id']
+            for item in failed_files:
+                if item['source_path'] in previous_hashes:
+                    new_hashes[item['source_path']] = previous_hashes[item['source_path']]
+            
+            await client.table('agent_kb_git_sources').update({
+                # Stays on the previous commit while files are failing, so the early return above doesn't skip them
+                'last_commit_sha': source.get('last_commit_sha') if failed_files else commit_sha,
+                'file_hashes': new_hashes,
+                'file_entries': new_entries,
+                'last_synced_at': datetime.now(timezone.utc).isoformat(),
+                'updated_at': datetime.now(timezone.utc).isoformat()
+            }).eq('source_id', source_id).execute()
+            
+            for item in processed_files + failed_files:
+                item['relative_path'] = item.pop('source_path')
+            result.update({
                 'processed_files': processed_files,
                 'failed_files': failed_files,
+                'removed_files': removed,
+                'unchanged_files': len(tree) - len(changed),
                 'total_processed': len(processed_files),
                 'total_failed': len(failed_files)
-            }
+            })
+            return result
             
         except Exception as e:
-            logger.error(f"Error processing git repository {git_url}: {str(e)}")
+            logger.error(f"Error syncing git source {source_id}: {str(e)}")
             return {
                 'success': False,
+                'source_id': source_id,
                 'git_url': git_url,
                 'error': str(e)
             }
+    
+    async def _prune_git_cache(self):
+        """Remove working copies that are stale or beyond ``GIT_CACHE_MAX_REPOS``, skipping any in use."""
+        def candidates():
+            try:
+                names = os.listdir(self.GIT_CACHE_DIR)
+            except FileNotFoundError:
+                return []
+            dirs = []
+            for name in names:
+                path = os.path.join(self.GIT_CACHE_DIR, name)
+                try:
+                    dirs.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+            dirs.sort(reverse=True)
+            cutoff = datetime.now().timestamp() - self.GIT_CACHE_MAX_AGE_SECONDS
+            return [path for i, (mtime, path) in enumerate(dirs) if i >= self.GIT_CACHE_MAX_REPOS or mtime < cutoff]
         
-        finally:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir, ignore_errors=True)
+        for path in await asyncio.to_thread(candidates):
+            lock = self._git_locks.get(path)
+            if lock is not None and lock.locked():
+                continue
+            self._git_locks.pop(path, None)
+            await asyncio.to_thread(shutil.rmtree, path, True)
+    
+    def _git_cache_path(self, git_url: str, branch: str) -> str:
+        key = hashlib.sha256(f"{git_url}#{branch}".encode()).hexdigest()[:24]
+        return os.path.join(self.GIT_CACHE_DIR, key)
+    
+    async def _run_git(self, *args: str, cwd: Optional[str] = None) -> str:
+        process = await asyncio.create_subprocess_exec(
+            'git', *self.GIT_CONFIG, *args,
+            cwd=cwd,
+            env={**os.environ, **self.GIT_ENV},
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise Exception(f"git {args[0]} failed: {stderr.decode(errors='replace')}")
+        return stdout.decode(errors='replace')
+    
+    async def _update_working_copy(self, repo_dir: str, git_url: str, branch: str) -> str:
+        """Clone on first use, otherwise fetch only the new tip of ``branch``. Returns the HEAD commit SHA."""
+        # Checked on every sync, not just when the source is added, since DNS can change
+        validate_git_source(git_url, branch)
+        await ensure_public_host(git_url)
+        if os.path.isdir(os.path.join(repo_dir, '.git')):
+            try:
+                await self._run_git('fetch', '--depth', '1', '--', 'origin', branch, cwd=repo_dir)
+                await self._run_git('reset', '--hard', 'FETCH_HEAD', cwd=repo_dir)
+                return (await self._run_git('rev-parse', 'HEAD', cwd=repo_dir)).strip()
+            except Exception as e:
+                logger.warning(f"Incremental fetch of {git_url} failed, re-cloning: {str(e)}")
+                await asyncio.to_thread(shutil.rmtree, repo_dir, True)
+        
+        os.makedirs(self.GIT_CACHE_DIR, exist_ok=True)
+        try:
+            await self._run_git('clone', '--depth', '1', '--branch', branch, '--', git_url, repo_dir)
+        except Exception:
+            await asyncio.to_thread(shutil.rmtree, repo_dir, True)
+            raise
+        return (await self._run_git('rev-parse', 'HEAD', cwd=repo_dir)).strip()
+    
+    async def _list_git_tree(self, repo_dir: str, include_patterns: List[str], exclude_patterns: List[str]) -> Dict[str, str]:
+        """Map included file paths at HEAD to their git blob SHAs without reading file contents."""
+        output = await self._run_git('ls-tree', '-r', '-z', '--full-tree', 'HEAD', cwd=repo_dir)
+        tree = {}
+        for record in output.split('\0'):
+            if not record:
+                continue
+            meta, path = record.split('\t', 1)
+            mode, object_type, blob_sha = meta.split()
+            # Skip submodules and symlinks
+            if object_type != 'blob' or mode == '120000':
+                continue
+            if self._should_include_file(path, include_patterns, exclude_patterns):
+                tree[path] = blob_sha
+        return tree
+    
+    async def _ingest_files(
+        self,
+        client,
+        agent_id: str,
+        sources: List[Tuple[str, str, Callable[[], bytes]]],
+        build_entry: Callable[[str, str, str, int, str], Dict[str, Any]],
+        progress_callback: Optional[ProgressCallback] = None,
+        existing_entries: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Extract ``(source_path, filename, reader)`` sources on a bounded worker pool and
+        bulk-insert the resulting entries in batches of ``INSERT_BATCH_SIZE``.
+        
+        Readers run in worker threads only once a slot is free, so at most
+        ``EXTRACTION_CONCURRENCY`` files are held in memory at a time. Sources
+        listed in ``existing_entries`` (source_path -> entry_id) update that
+        entry instead of inserting a new one.
+        """
+        existing_entries = existing_entries or {}
+        semaphore = asyncio.Semaphore(self.EXTRACTION_CONCURRENCY)
+        processed_files: List[Dict[str, Any]] = []
+        failed_files: List[Dict[str, Any]] = []
+        pending: List[Tuple[Dict[str, Any], str, str]] = []
+        total = len(sources)
+        completed = 0
+        
+        async def extract(source):
+            source_path, filename, reader = source
+            async with semaphore:
+                try:
+                    file_content = await asyncio.to_thread(reader)
+                    mime_type, _ = mimetypes.guess_type(filename)
+                    if not mime_type:
+                        mime_type = 'application/octet-stream'
+                    content, content_hash = await self._extract_with_content_store(client, file_content, filename, mime_type)
+                    return source_path, filename, mime_type, len(file_content), content, content_hash, None
+                except Exception as e:
+                    return source_path, filename, None, 0, None, None, e
+        
+        async def flush():
+            batch = [item for item in pending if item[1] not in existing_entries]
+            updates = [item for item in pending if item[1] in existing_entries]
+            pending.clear()
+            
+            for row, source_path, content in updates:
+                entry_id = existing_entries[source_path]
+                try:
+                    update_data = {k: v for k, v in row.items() if k not in ('agent_id', 'account_id', 'is_active', 'usage_context')}
+                    await client.table('agent_knowledge_base_entries').update(update_data).eq('entry_id', entry_id).execute()
+                    await index_entry_chunks(client, entry_id, agent_id, content)
+                    processed_files.append({
+                        'filename': row['source_metadata']['filename'],
+                        'source_path': source_path,
+                        'entry_id': entry_id,
+                        'content_length': len(content),
+                        'updated': True
+                    })
+                except Exception as e:
+                    logger.error(f"Error updating knowledge base entry {entry_id}: {str(e)}")
+                    failed_files.append({
+                        'filename': row['source_metadata']['filename'],
+                        'source_path': source_path,
+                        'error': str(e)
+                    })
+            
+            if not batch:
+                return
+            try:
+                result = await client.table('agent_knowledge_base_entries').insert([row for row, _, _ in batch]).execute()
+            except Exception as e:
+                logger.error(f"Error inserting batch of {len(batch)} knowledge base entries: {str(e)}")
+                for row, source_path, _ in batch:
+                    failed_files.append({
+                        'filename': row['source_metadata']['filename'],
+                        'source_path': source_path,
+                        'error': str(e)
+                    })
+                return
+            
+            created = []
+            for inserted, (row, source_path, content) in zip(result.data, batch):
+                created.append((inserted['entry_id'], content))
+                processed_files.append({
+                    'filename': row['source_metadata']['filename'],
+                    'source_path': source_path,
+                    'entry_id': inserted['entry_id'],
+                    'content_length': len(content)
+                })
+            try:
+                await index_new_entries_chunks(client, agent_id, created)
+            except Exception as e:
+                logger.warning(f"Failed to index chunks for {len(created)} knowledge base entries: {str(e)}")
+        
+        async def report():
+            if progress_callback:
+                try:
+                    await progress_callback(completed, total, len(processed_files))
+                except Exception as e:
+                    logger.warning(f"Failed to report ingestion progress: {str(e)}")
+        
+        for next_result in asyncio.as_completed([extract(source) for source in sources]):
+            source_path, filename, mime_type, file_size, content, content_hash, error = await next_result
+            completed += 1
+            if error is not None:
+                logger.error(f"Error extracting {source_path}: {str(error)}")
+                failed_files.append({'filename': filename, 'source_path': source_path, 'error': str(error)})
+            elif content and content.strip():
+                row = build_entry(source_path, filename, mime_type, file_size, content)
+                row['content_hash'] = content_hash
+                pending.append((row, source_path, content))
+            
+            if len(pending) >= self.INSERT_BATCH_SIZE:
+                await flush()
+                await report()
+        
+        if pending:
+            await flush()
+        await report()
+        
+        return processed_files, failed_files
+    
+    async def _extract_with_content_store(self, client, file_content: bytes, filename: str, mime_type: str) -> Tuple[str, str]:
+        """
+        Extract text, reusing a previous extraction of identical bytes when available.
+        
+        Returns ``(content, content_hash)`` where the hash is the SHA-256 of the raw bytes.
+        """
+        content_hash = await asyncio.to_thread(lambda: hashlib.sha256(file_content).hexdigest())
+        file_extension = Path(filename).suffix.lower()
+        use_store = file_extension in self.CONTENT_STORE_EXTENSIONS
+        
+        if use_store:
+            try:
+                cached = await client.table('kb_extracted_content').select('content').eq('content_hash', content_hash).limit(1).execute()
+                if cached.data:
+                    return cached.data[0]['content'], content_hash
+            except Exception as e:
+                logger.warning(f"Content store lookup failed for {filename}: {str(e)}")
+        
+        content = await self._extract_file_content(file_content, filename, mime_type)
+        
+        if use_store and content and content.strip() and not content.startswith("Error extracting content"):
+            try:
+                await client.table('kb_extracted_content').upsert({
+                    'content_hash': content_hash,
+                    'content': content,
+                    'extraction_method': self._get_extraction_method(file_extension, mime_type)
+                }, on_conflict='content_hash', ignore_duplicates=True).execute()
+            except Exception as e:
+                logger.warning(f"Content store write failed for {filename}: {str(e)}")
+        
+        return content, content_hash
+    
+    def _read_zip_member(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+        if info.file_size > self.MAX_FILE_SIZE:
+            raise ValueError(f"File too large: {info.file_size} bytes (max: {self.MAX_FILE_SIZE})")
+        # Header sizes can lie; cap the decompressed stream as well.
+        with zip_ref.open(info) as member:
+            data = member.read(self.MAX_FILE_SIZE + 1)
+        if len(data) > self.MAX_FILE_SIZE:
+            raise ValueError(f"File too large: more than {self.MAX_FILE_SIZE} bytes decompressed")
+        return data
+    
+    def _read_local_file(self, file_path: str) -> bytes:
+        file_size = os.path.getsize(file_path)
+        if file_size > self.MAX_FILE_SIZE:
+            raise ValueError(f"File too large: {file_size} bytes (max: {self.MAX_FILE_SIZE})")
+        with open(file_path, 'rb') as f:
+            return f.read()
+    
+    async def _index_chunks(self, client, entry_id: str, agent_id: str, content: str):
+        # Chunks keep the full content; the entry row only holds the first MAX_CONTENT_LENGTH chars.
+        try:
+            await index_entry_chunks(client, entry_id, agent_id, content)
+        except Exception as e:
+            logger.warning(f"Failed to index chunks for knowledge base entry {entry_id}: {str(e)}")
     
     async def _extract_file_content(self, file_content: bytes, filename: str, mime_type: str) -> str:
+        return await asyncio.to_thread(self._extract_content_sync, file_content, filename, mime_type)
+    
+    def _extract_content_sync(self, file_content: bytes, filename: str, mime_type: str) -> str:
         file_extension = Path(filename).suffix.lower()
         
         try:
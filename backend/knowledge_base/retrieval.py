@@ -0,0 +1,379 @@
+"""
+Chunked knowledge base retrieval.
+
+Entries are split into overlapping chunks at ingest and stored in
+``agent_knowledge_base_chunks`` with the full extracted content, so nothing is
+lost to the entry-level ``MAX_CONTENT_LENGTH`` truncation. At run time a
+per-agent BM25 index is built over those chunks (and cached in-process), and
+the chunks most relevant to the latest user message are packed into the token
+budget instead of concatenating whole entries.
+
+When ``KB_EMBEDDING_MODEL`` is configured, chunks also carry embedding vectors
+and lexical and vector rankings are merged with reciprocal rank fusion.
+"""
+
+import asyncio
+import heapq
+import math
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config import config
+from utils.logger import logger
+
+# Token estimates follow the database triggers (LENGTH(content) / 4).
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 60
+INSERT_BATCH_SIZE = 100
+CHUNK_PAGE_SIZE = 1000
+
+DEFAULT_TOP_K = 12
+RRF_K = 60
+INDEX_TTL_SECONDS = 300
+MAX_CACHED_AGENTS = 200
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its me my "
+    "of on or our so that the their them then there these they this to was we "
+    "were what when where which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_text(
+    text: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> List[str]:
+    """Split text into overlapping chunks, cutting at paragraph, line, sentence or word boundaries."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    size = chunk_tokens * CHARS_PER_TOKEN
+    overlap = min(overlap_tokens * CHARS_PER_TOKEN, size // 4)
+    if len(text) <= size:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            for separator in ("\n\n", "\n", ". ", " "):
+                cut = text.rfind(separator, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        next_start = end - overlap
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over tokenized documents with an inverted index."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        self._total_length = 0
+
+    def add(self, tokens: List[str]) -> int:
+        doc_id = len(self._lengths)
+        for term, tf in Counter(tokens).items():
+            self._postings.setdefault(term, []).append((doc_id, tf))
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        return doc_id
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def search(self, query_tokens: List[str], limit: int) -> List[Tuple[int, float]]:
+        n = len(self._lengths)
+        if not n or not query_tokens:
+            return []
+        avgdl = self._total_length / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(query_tokens):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings:
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+async def embed_texts(texts: List[str]) -> Optional[List[List[float]]]:
+    """Embed texts with ``KB_EMBEDDING_MODEL``; returns None when embeddings are disabled or fail."""
+    model = config.KB_EMBEDDING_MODEL
+    if not model or not texts:
+        return None
+    try:
+        import litellm
+        vectors = []
+        for i in range(0, len(texts), INSERT_BATCH_SIZE):
+            response = await litellm.aembedding(model=model, input=texts[i:i + INSERT_BATCH_SIZE])
+            vectors.extend(item["embedding"] for item in response.data)
+        return vectors
+    except Exception as e:
+        logger.warning(f"Knowledge base embedding with {model} failed: {e}")
+        return None
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+async def _chunk_rows(entry_id: str, agent_id: str, content: str) -> List[Dict[str, Any]]:
+    chunks = chunk_text(content)
+    embeddings = await embed_texts(chunks)
+    return [
+        {
+            'entry_id': entry_id,
+            'agent_id': agent_id,
+            'chunk_index': i,
+            'content': chunk,
+            'token_count': estimate_tokens(chunk),
+            'embedding': embeddings[i] if embeddings else None,
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+async def _insert_chunk_rows(client, rows: List[Dict[str, Any]]):
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        await client.table('agent_knowledge_base_chunks').insert(rows[i:i + INSERT_BATCH_SIZE]).execute()
+
+
+async def index_entry_chunks(client, entry_id: str, agent_id: str, content: str) -> int:
+    """Replace the stored chunks of an entry with chunks of ``content``. Returns the chunk count."""
+    rows = await _chunk_rows(entry_id, agent_id, content)
+    await client.table('agent_knowledge_base_chunks').delete().eq('entry_id', entry_id).execute()
+    await _insert_chunk_rows(client, rows)
+    get_retriever().invalidate(agent_id)
+    return len(rows)
+
+
+async def index_new_entries_chunks(client, agent_id: str, entries: List[Tuple[str, str]]) -> int:
+    """Bulk-insert chunks for freshly created ``(entry_id, content)`` pairs. Returns the chunk count."""
+    rows = []
+    for entry_id, content in entries:
+        rows.extend(await _chunk_rows(entry_id, agent_id, content))
+    await _insert_chunk_rows(client, rows)
+    get_retriever().invalidate(agent_id)
+    return len(rows)
+
+
+class _AgentIndex:
+    def __init__(self, entries: List[Dict[str, Any]], chunks: List[Dict[str, Any]]):
+        self.entries = entries
+        self.chunks = chunks
+        self.bm25 = BM25Index()
+        for chunk in chunks:
+            self.bm25.add(tokenize(chunk['content']))
+        self.has_embeddings = bool(chunks) and all(c.get('embedding') for c in chunks)
+        self.built_at = time.monotonic()
+
+
+class KnowledgeBaseRetriever:
+    def __init__(self, ttl: float = INDEX_TTL_SECONDS, max_agents: int = MAX_CACHED_AGENTS):
+        self.ttl = ttl
+        self.max_agents = max_agents
+        self._indexes: Dict[str, _AgentIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def invalidate(self, agent_id: str):
+        self._indexes.pop(agent_id, None)
+
+    async def _load_index(self, client, agent_id: str) -> _AgentIndex:
+        entries_result = await client.table('agent_knowledge_base_entries').select(
+            'entry_id, name, description, created_at'
+        ).eq('agent_id', agent_id).eq('is_active', True).in_(
+            'usage_context', ['always', 'contextual']
+        ).order('created_at', desc=True).execute()
+        entries = entries_result.data or []
+        if not entries:
+            return _AgentIndex([], [])
+
+        by_entry: Dict[str, List[Dict[str, Any]]] = {}
+        offset = 0
+        while True:
+            page = await client.table('agent_knowledge_base_chunks').select(
+                'entry_id, chunk_index, content, token_count, embedding'
+            ).eq('agent_id', agent_id).order('entry_id').order('chunk_index').range(
+                offset, offset + CHUNK_PAGE_SIZE - 1
+            ).execute()
+            rows = page.data or []
+            for chunk in rows:
+                by_entry.setdefault(chunk['entry_id'], []).append(chunk)
+            if len(rows) < CHUNK_PAGE_SIZE:
+                break
+            offset += CHUNK_PAGE_SIZE
+
+        # Entries created before chunking existed are chunked on the fly.
+        unchunked = [e['entry_id'] for e in entries if e['entry_id'] not in by_entry]
+        if unchunked:
+            legacy = await client.table('agent_knowledge_base_entries').select(
+                'entry_id, content'
+            ).in_('entry_id', unchunked).execute()
+            for row in legacy.data or []:
+                by_entry[row['entry_id']] = [
+                    {'entry_id': row['entry_id'], 'chunk_index': i, 'content': text,
+                     'token_count': estimate_tokens(text), 'embedding': None}
+                    for i, text in enumerate(chunk_text(row['content']))
+                ]
+
+        chunks = []
+        for entry in entries:
+            chunks.extend(by_entry.get(entry['entry_id'], []))
+        return _AgentIndex(entries, chunks)
+
+    async def _get_index(self, client, agent_id: str) -> _AgentIndex:
+        index = self._indexes.get(agent_id)
+        if index is not None and time.monotonic() - index.built_at < self.ttl:
+            return index
+        lock = self._locks.setdefault(agent_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(agent_id)
+            if index is not None and time.monotonic() - index.built_at < self.ttl:
+                return index
+            index = await self._load_index(client, agent_id)
+            self._indexes[agent_id] = index
+            while len(self._indexes) > self.max_agents:
+                oldest = min(self._indexes, key=lambda key: self._indexes[key].built_at)
+                self._indexes.pop(oldest, None)
+            return index
+
+    async def _rank(self, index: _AgentIndex, query: str, top_k: int) -> List[int]:
+        candidates = top_k * 4
+        lexical = [doc_id for doc_id, _ in index.bm25.search(tokenize(query), candidates)]
+        if not index.has_embeddings:
+            return lexical
+
+        query_embedding = await embed_texts([query])
+        if not query_embedding:
+            return lexical
+        vector_scores = [
+            (doc_id, _cosine(query_embedding[0], chunk['embedding']))
+            for doc_id, chunk in enumerate(index.chunks)
+        ]
+        semantic = [doc_id for doc_id, _ in heapq.nlargest(candidates, vector_scores, key=lambda item: item[1])]
+
+        fused: Dict[int, float] = {}
+        for ranking in (lexical, semantic):
+            for rank, doc_id in enumerate(ranking):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        return sorted(fused, key=fused.get, reverse=True)
+
+    async def retrieve(
+        self,
+        client,
+        agent_id: str,
+        query: str,
+        max_tokens: int = 4000,
+        top_k: int = DEFAULT_TOP_K,
+    ) -> Optional[str]:
+        """
+        Build knowledge base context for ``query`` within ``max_tokens``.
+
+        Returns None when the agent has no active entries or nothing matches.
+        """
+        index = await self._get_index(client, agent_id)
+        if not index.chunks or not query or not query.strip():
+            return None
+
+        selected: List[int] = []
+        used_tokens = 0
+        for doc_id in await self._rank(index, query, top_k):
+            if len(selected) >= top_k:
+                break
+            tokens = index.chunks[doc_id]['token_count'] or estimate_tokens(index.chunks[doc_id]['content'])
+            if used_tokens + tokens > max_tokens:
+                continue
+            selected.append(doc_id)
+            used_tokens += tokens
+
+        if not selected:
+            return None
+
+        await self._log_usage(client, agent_id, index, selected)
+        return self._format(index, selected)
+
+    @staticmethod
+    def _format(index: _AgentIndex, selected: List[int]) -> str:
+        entry_order = {entry['entry_id']: i for i, entry in enumerate(index.entries)}
+        entries = {entry['entry_id']: entry for entry in index.entries}
+        ordered = sorted(selected, key=lambda d: (entry_order[index.chunks[d]['entry_id']], index.chunks[d]['chunk_index']))
+
+        sections = []
+        current_entry = None
+        for doc_id in ordered:
+            chunk = index.chunks[doc_id]
+            if chunk['entry_id'] != current_entry:
+                current_entry = chunk['entry_id']
+                entry = entries[current_entry]
+                header = f"## {entry['name']}\n"
+                if entry.get('description'):
+                    header += f"{entry['description']}\n\n"
+                sections.append(header)
+            sections.append(chunk['content'] + "\n\n")
+
+        return (
+            "# AGENT KNOWLEDGE BASE\n\n"
+            "The following excerpts from your specialized knowledge base are relevant to the current request. "
+            "Use this information as context when responding:\n\n" + "".join(sections).rstrip()
+        )
+
+    @staticmethod
+    async def _log_usage(client, agent_id: str, index: _AgentIndex, selected: List[int]):
+        tokens_by_entry: Dict[str, int] = {}
+        for doc_id in selected:
+            chunk = index.chunks[doc_id]
+            tokens_by_entry[chunk['entry_id']] = tokens_by_entry.get(chunk['entry_id'], 0) + (chunk['token_count'] or 0)
+        try:
+            await client.table('agent_knowledge_base_usage_log').insert([
+                {'entry_id': entry_id, 'agent_id': agent_id, 'usage_type': 'context_injection', 'tokens_used': tokens}
+                for entry_id, tokens in tokens_by_entry.items()
+            ]).execute()
+        except Exception as e:
+            logger.warning(f"Failed to log knowledge base usage for agent {agent_id}: {e}")
+
+
+_retriever: Optional[KnowledgeBaseRetriever] = None
+
+
+def get_retriever() -> KnowledgeBaseRetriever:
+    global _retriever
+    if _retriever is None:
+        _retriever = KnowledgeBaseRetriever()
+    return _retriever
+
+
+async def retrieve_context(client, agent_id: str, query: str, max_tokens: Optional[int] = None) -> Optional[str]:
+    return await get_retriever().retrieve(
+        client, agent_id, query, max_tokens=max_tokens or config.KB_RETRIEVAL_MAX_TOKENS
+    )
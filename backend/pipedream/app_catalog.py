@@ -0,0 +1,277 @@
+"""
+Local index of the Pipedream app catalog.
+
+A background refresher pages through the Pipedream ``/apps`` listing every
+``SYNC_INTERVAL`` seconds and stores the compact app records as one Redis
+blob. Only the process holding the sync lease talks to Pipedream; every other
+process reloads the blob when its sync timestamp moves. Search, popular and
+by-category queries are answered from the in-memory index:
+
+- slug -> app, category -> slugs (in catalog order)
+- word tokens of name, slug, category and tags, with a sorted token list for
+  prefix lookups while the user is typing
+- trigrams of name and slug for matches inside a word (e.g. "hub" -> GitHub)
+"""
+
+import asyncio
+import bisect
+import json
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+from services import redis
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from .app_service import App, AppService
+
+CATALOG_KEY = "pipedream:catalog"
+SYNCED_AT_KEY = "pipedream:catalog:synced_at"
+SYNC_LOCK_KEY = "pipedream:catalog:sync_lock"
+
+SYNC_INTERVAL = 6 * 60 * 60
+SYNC_LOCK_SECONDS = 10 * 60
+CHECK_INTERVAL = 60
+MAX_PAGES = 200
+
+NAME_WEIGHT = 10
+TAG_WEIGHT = 5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Index:
+    def __init__(self, apps: List["App"]):
+        self.order = [app.slug for app in apps]
+        self.position = {slug: index for index, slug in enumerate(self.order)}
+        self.by_slug: Dict[str, "App"] = {app.slug: app for app in apps}
+        self.by_category: Dict[str, List[str]] = {}
+        self.name_tokens: Dict[str, Set[str]] = {}
+        self.tag_tokens: Dict[str, Set[str]] = {}
+        self.token_index: Dict[str, Set[str]] = {}
+        self.trigram_index: Dict[str, Set[str]] = {}
+        for app in apps:
+            self.by_category.setdefault(app.category, []).append(app.slug)
+            name_tokens = set(tokenize(app.name)) | set(tokenize(app.slug))
+            tag_tokens = set(tokenize(app.category)) | {token for tag in app.tags for token in tokenize(tag)}
+            self.name_tokens[app.slug] = name_tokens
+            self.tag_tokens[app.slug] = tag_tokens
+            for token in name_tokens | tag_tokens:
+                self.token_index.setdefault(token, set()).add(app.slug)
+            for gram in trigrams(app.name) | trigrams(app.slug):
+                self.trigram_index.setdefault(gram, set()).add(app.slug)
+        self.sorted_tokens = sorted(self.token_index)
+
+    def with_prefix(self, prefix: str) -> Set[str]:
+        slugs: Set[str] = set()
+        start = bisect.bisect_left(self.sorted_tokens, prefix)
+        for token in self.sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            slugs |= self.token_index[token]
+        return slugs
+
+    def containing(self, text: str) -> Set[str]:
+        grams = trigrams(text)
+        if not grams:
+            return set()
+        candidates = set.intersection(*(self.trigram_index.get(gram, set()) for gram in grams))
+        return {
+            slug for slug in candidates
+            if text in self.by_slug[slug].name.lower() or text in slug
+        }
+
+    def score(self, slug: str, query: str, query_tokens: List[str]) -> int:
+        app = self.by_slug[slug]
+        name = app.name.lower()
+        score = 0
+        if name == query or slug == query:
+            score += 100
+        elif name.startswith(query) or slug.startswith(query):
+            score += 50
+        for query_token in query_tokens:
+            if any(token.startswith(query_token) for token in self.name_tokens[slug]):
+                score += NAME_WEIGHT
+            if any(token.startswith(query_token) for token in self.tag_tokens[slug]):
+                score += TAG_WEIGHT
+        return score
+
+    def search(self, query: str) -> List[str]:
+        query = query.lower().strip()
+        query_tokens = tokenize(query)
+        matches: Optional[Set[str]] = None
+        for token in query_tokens:
+            slugs = self.with_prefix(token)
+            if not slugs and len(token) >= 3:
+                slugs = self.containing(token)
+            matches = slugs if matches is None else matches & slugs
+            if not matches:
+                break
+        return sorted(
+            matches or set(),
+            key=lambda slug: (
+                -self.score(slug, query, query_tokens),
+                -self.by_slug[slug].featured_weight,
+                self.position[slug],
+            ),
+        )
+
+
+class AppCatalog:
+    def __init__(self, service: "AppService"):
+        self._service = service
+        self._index: Optional[_Index] = None
+        self._synced_at = 0.0
+        self._load_lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def _fetch_remote(self) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        cursor = None
+        for _ in range(MAX_PAGES):
+            params = {"after": cursor} if cursor else None
+            data = await self._service._make_request(f"{self._service.base_url}/apps", params=params)
+            records.extend(data.get("data", []))
+            cursor = (data.get("page_info") or {}).get("end_cursor")
+            if not cursor or not data.get("data"):
+                break
+        return records
+
+    def _build(self, records: List[Dict[str, Any]], synced_at: float) -> None:
+        apps = []
+        seen = set()
+        for record in records:
+            app = self._service._map_cached_app_to_domain(record)
+            if app.slug and app.slug not in seen:
+                seen.add(app.slug)
+                apps.append(app)
+        self._index = _Index(apps)
+        self._synced_at = synced_at
+
+    async def sync(self) -> None:
+        """Fetch the full catalog from Pipedream, index it and persist it for other processes."""
+        start = time.monotonic()
+        compact = []
+        for record in await self._fetch_remote():
+            try:
+                compact.append(self._service._map_domain_app_to_cache(self._service._map_to_domain(record)))
+            except Exception as e:
+                logger.warning(f"Error mapping app data: {str(e)}")
+        synced_at = time.time()
+        self._build(compact, synced_at)
+        try:
+            client = await redis.get_client()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.set(CATALOG_KEY, json.dumps(compact, separators=(",", ":")))
+                pipe.set(SYNCED_AT_KEY, str(synced_at))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to persist Pipedream app catalog: {e}")
+        logger.info(f"Synced Pipedream app catalog with {len(self._index.by_slug)} apps in {time.monotonic() - start:.2f}s")
+
+    async def _load_persisted(self) -> Optional[float]:
+        """Load the persisted catalog if it is newer than ours; returns its sync time."""
+        client = await redis.get_client()
+        synced_at = await client.get(SYNCED_AT_KEY)
+        if not synced_at:
+            return None
+        synced_at = float(synced_at)
+        if synced_at > self._synced_at:
+            blob = await client.get(CATALOG_KEY)
+            if blob:
+                self._build(json.loads(blob), synced_at)
+                logger.debug(f"Loaded Pipedream app catalog with {len(self._index.by_slug)} apps from Redis")
+        return synced_at
+
+    async def _sync_if_due(self, synced_at: Optional[float]) -> None:
+        if synced_at is not None and time.time() - synced_at < SYNC_INTERVAL:
+            return
+        if not await redis.set(SYNC_LOCK_KEY, "1", ex=SYNC_LOCK_SECONDS, nx=True):
+            return
+        try:
+            await self.sync()
+        finally:
+            await redis.delete(SYNC_LOCK_KEY)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL)
+            try:
+                await self._sync_if_due(await self._load_persisted())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Pipedream app catalog refresh failed: {e}")
+
+    async def ensure_loaded(self) -> bool:
+        """Load the catalog on first use and start the refresher. Returns False if unavailable."""
+        if self._index is None:
+            async with self._load_lock:
+                if self._index is None:
+                    try:
+                        synced_at = await self._load_persisted()
+                        # Without a persisted catalog, only the lease holder syncs;
+                        # other processes fall back to live requests until it lands
+                        await self._sync_if_due(synced_at if self._index is not None else None)
+                    except Exception as e:
+                        logger.warning(f"Pipedream app catalog unavailable: {e}")
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+        return self._index is not None
+
+    def get(self, slug: str) -> Optional["App"]:
+        return self._index.by_slug.get(slug)
+
+    def has(self, slug: str) -> bool:
+        return slug in self._index.by_slug
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        index = self._index
+        slugs = index.search(query) if query and query.strip() else index.order
+        if category:
+            in_category = set(index.by_category.get(category, []))
+            slugs = [slug for slug in slugs if slug in in_category]
+
+        try:
+            offset = max(int(cursor), 0) if cursor else 0
+        except ValueError:
+            offset = 0
+        page = [index.by_slug[slug] for slug in slugs[offset:offset + limit]]
+        end = offset + len(page)
+        has_more = end < len(slugs)
+        return {
+            "success": True,
+            "apps": page,
+            "page_info": {
+                "total_count": len(slugs),
+                "count": len(page),
+                "start_cursor": str(offset),
+                "end_cursor": str(end) if has_more else None,
+                "has_more": has_more,
+            },
+            "total_count": len(slugs),
+        }
+
+    def by_category(self, category: str, limit: int = 20) -> List["App"]:
+        return [self._index.by_slug[slug] for slug in self._index.by_category.get(category, [])[:limit]]
+
+    async def close(self) -> None:
+        if self._refresher:
+            self._refresher.cancel()
+            self._refresher = None
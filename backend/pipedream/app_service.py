@@ -8,6 +8,7 @@ import httpx
 import json
 import asyncio
 from utils.logger import logger
+from .app_catalog import AppCatalog
 
 class AppSlug:
     def __init__(self, value: str):
@@ -90,6 +91,7 @@ class AppService:
         self.access_token: Optional[str] = None
         self.token_expires_at: Optional[datetime] = None
         self._semaphore = asyncio.Semaphore(10)
+        self.catalog = AppCatalog(self)
 
     async def _get_session(self) -> httpx.AsyncClient:
         if self.session is None or self.session.is_closed:
@@ -205,6 +207,9 @@ class AppService:
             }
 
     async def _get_by_slug(self, app_slug: str) -> Optional[App]:
+        if await self.catalog.ensure_loaded() and self.catalog.has(app_slug):
+            return self.catalog.get(app_slug)
+
         cache_key = f"pipedream:app:{app_slug}"
         try:
             from services import redis
@@ -264,6 +269,10 @@ class AppService:
             "shopify", "woocommerce", "magento", "bigcommerce"
         ]
         
+        if await self.catalog.ensure_loaded():
+            apps = [self.catalog.get(slug) for slug in popular_slugs[:limit] if self.catalog.has(slug)]
+            return [app for app in apps if not category or app.category == category]
+
         apps = []
         batch_size = 20
         target_slugs = popular_slugs[:limit]
@@ -300,6 +309,8 @@ class AppService:
         return apps
 
     async def _get_by_category(self, category: str, limit: int = 20) -> List[App]:
+        if await self.catalog.ensure_loaded():
+            return self.catalog.by_category(category, limit)
         query = SearchQuery(None)
         category_obj = Category(category)
         result = await self._search(query, category_obj, limit=limit)
@@ -375,7 +386,10 @@ class AppService:
         
         logger.debug(f"Searching apps: query='{query}', category='{category}', page={page}")
         
-        result = await self._search(search_query, category_vo, page, limit, cursor_vo)
+        if await self.catalog.ensure_loaded():
+            result = self.catalog.search(search_query.value, category, limit, cursor)
+        else:
+            result = await self._search(search_query, category_vo, page, limit, cursor_vo)
         
         logger.debug(f"Found {len(result.get('apps', []))} apps")
         return result
@@ -401,6 +415,7 @@ class AppService:
         return apps
 
     async def close(self):
+        await self.catalog.close()
         if self.session and not self.session.is_closed:
             await self.session.aclose()
     
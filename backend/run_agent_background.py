@@ -52,6 +52,26 @@ async def check_health(key: str):
     structlog.contextvars.clear_contextvars()
     await redis.set(key, "healthy", ex=redis.REDIS_KEY_TTL)
 
+@dramatiq.actor(queue_name="trigger_webhooks")
+async def process_trigger_webhook(
+    trigger_id: str,
+    payload: Dict[str, Any],
+    event_id: str,
+    trigger_type: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+):
+    """Execute a trigger webhook accepted by the API (see triggers/webhook_queue.py)."""
+    structlog.contextvars.clear_contextvars()
+    structlog.contextvars.bind_contextvars(
+        trigger_id=trigger_id,
+        webhook_event_id=event_id,
+    )
+    await initialize()
+
+    from triggers.webhook_queue import process_queued_webhook
+    result = await process_queued_webhook(db, trigger_id, payload, trigger_type, context)
+    logger.debug(f"Processed queued webhook {event_id} for trigger {trigger_id}: {result}")
+
 @dramatiq.actor
 async def run_agent_background(
     agent_run_id: str,
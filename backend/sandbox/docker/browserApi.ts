@@ -1,4 +1,6 @@
 import express from 'express';
+import { promises as fs } from 'fs';
+import path from 'path';
 import { Stagehand, type LogLine, type Page } from '@browserbasehq/stagehand';
 
 const app = express();
@@ -11,9 +13,30 @@ interface BrowserActionResult {
     url: string;
     title: string;
     screenshot_base64?: string;
+    screenshot_path?: string;
+    screenshot_mime_type?: string;
+    screenshot_size?: number;
     action?: string;
 }
 
+// Sent by the backend as `screenshot` in the request body. With `path` the
+// screenshot is written to that file and only its path is returned, instead
+// of the base64-encoded image.
+interface ScreenshotOptions {
+    format?: 'png' | 'jpeg';
+    quality?: number;
+    path?: string;
+}
+
+interface PageState {
+    url: string;
+    title: string;
+    screenshot_base64?: string;
+    screenshot_path?: string;
+    screenshot_mime_type?: string;
+    screenshot_size?: number;
+}
+
 class BrowserAutomation {
     public router: express.Router;
 
@@ -136,16 +159,29 @@ class BrowserAutomation {
         }
     }
 
-    async get_stagehand_state() {
+    async get_stagehand_state(options?: ScreenshotOptions): Promise<PageState> {
         try{
             const health = this.health();
             if (this.page && health.status === "healthy") {
-                const screenshot_base64 = await this.page.screenshot({ fullPage: false }).then(buffer => buffer.toString('base64'));
-                const page_info = {
+                const type = options?.format === 'jpeg' ? 'jpeg' : 'png';
+                const buffer = await this.page.screenshot({
+                    fullPage: false,
+                    type,
+                    quality: type === 'jpeg' ? Math.min(Math.max(options?.quality ?? 70, 1), 100) : undefined,
+                });
+                const page_info: PageState = {
                     url: await this.page.url(),
                     title: await this.page.title(),
-                    screenshot_base64: screenshot_base64,
                 };
+                if (options?.path) {
+                    await fs.mkdir(path.dirname(options.path), { recursive: true });
+                    await fs.writeFile(options.path, buffer);
+                    page_info.screenshot_path = options.path;
+                    page_info.screenshot_mime_type = `image/${type}`;
+                    page_info.screenshot_size = buffer.length;
+                } else {
+                    page_info.screenshot_base64 = buffer.toString('base64');
+                }
                 return page_info;
             }
             return {
@@ -163,19 +199,28 @@ class BrowserAutomation {
         }
     }
 
+    private screenshotFields(page_info: PageState) {
+        return {
+            screenshot_base64: page_info.screenshot_base64,
+            screenshot_path: page_info.screenshot_path,
+            screenshot_mime_type: page_info.screenshot_mime_type,
+            screenshot_size: page_info.screenshot_size,
+        };
+    }
+
     async navigate(req: express.Request, res: express.Response): Promise<void> {
         try {
             if (this.page && this.browserInitialized) {
                 const { url } = req.body;
                 await this.page.goto(url, { waitUntil: 'domcontentloaded', timeout: 30000 });
-                const page_info = await this.get_stagehand_state();
+                const page_info = await this.get_stagehand_state(req.body?.screenshot);
                 const result: BrowserActionResult = {
                     success: true,
                     message: "Navigated to " + url,
                     error: "",
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info?.screenshot_base64,
+                    ...this.screenshotFields(page_info),
                 }
                 res.json(result);
             } else {
@@ -197,13 +242,13 @@ class BrowserAutomation {
     async screenshot(req: express.Request, res: express.Response): Promise<void> {
         try {
             if (this.page && this.browserInitialized) {
-                const page_info = await this.get_stagehand_state();
+                const page_info = await this.get_stagehand_state(req.body?.screenshot);
                 const result: BrowserActionResult = {
                     success: true,
                     message: "Screenshot taken",
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info.screenshot_base64,
+                    ...this.screenshotFields(page_info),
                 }
                 res.json(result);
             } else {
@@ -226,14 +271,14 @@ class BrowserAutomation {
             if (this.page && this.browserInitialized) {
                 const { action, iframes, variables } = req.body;
                 const result = await this.page.act({action, iframes: iframes || true, variables});
-                const page_info = await this.get_stagehand_state();
+                const page_info = await this.get_stagehand_state(req.body?.screenshot);
                 const response: BrowserActionResult = {
                     success: result.success,
                     message: result.message,
                     action: result.action,
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info.screenshot_base64,
+                    ...this.screenshotFields(page_info),
                 }
                 res.json(response);
             } else {
@@ -256,14 +301,14 @@ class BrowserAutomation {
             if (this.page && this.browserInitialized) {
                 const { instruction, iframes, selector } = req.body;
                 const result = await this.page.extract({ instruction, iframes, selector });
-                const page_info = await this.get_stagehand_state();
+                const page_info = await this.get_stagehand_state(req.body?.screenshot);
                 const response: BrowserActionResult = {
                     success: result.success,
                     message: result.message,
                     action: result.action,
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info.screenshot_base64,
+                    ...this.screenshotFields(page_info),
                 }
                 res.json(response);
             }
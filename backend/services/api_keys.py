@@ -17,6 +17,7 @@ import string
 import hmac
 import hashlib
 import time
+from collections import OrderedDict
 from pydantic import BaseModel, Field, field_validator
 from fastapi import HTTPException
 from utils.logger import logger
@@ -95,7 +96,7 @@ class APIKeyService:
 
     Performance Features:
     - HMAC-SHA256 hashing (100x faster than bcrypt)
-    - Redis caching for validation results (2min TTL)
+    - In-process validation cache (30s TTL) in front of Redis (2min TTL)
     - Throttled last_used_at updates (max once per 15min per key, configurable)
     - Cached user lookups (5min TTL)
     - Asynchronous operations where possible
@@ -106,6 +107,12 @@ class APIKeyService:
     # Class-level in-memory throttle cache (fallback when Redis unavailable)
     _throttle_cache: Dict[str, float] = {}
 
+    # Class-level in-process cache of validation results, checked before Redis.
+    # Entries are short-lived so revocations on other instances take effect quickly.
+    _LOCAL_VALIDATION_TTL = 30
+    _LOCAL_VALIDATION_MAX_SIZE = 5000
+    _validation_cache: "OrderedDict[str, tuple[APIKeyValidationResult, float]]" = OrderedDict()
+
     def __init__(self, db: DBConnection):
         self.db = db
 
@@ -315,6 +322,8 @@ class APIKeyService:
             if not result.data:
                 raise HTTPException(status_code=404, detail="API key not found")
 
+            self._evict_local_validation(key_id)
+
             logger.debug(
                 "API key revoked successfully",
                 account_id=str(account_id),
@@ -352,6 +361,10 @@ class APIKeyService:
             # Check Redis cache first (cache key includes secret hash for security)
             cache_key = f"api_key:{public_key}:{self._hash_secret_key(secret_key)[:8]}"
 
+            local_result = self._get_local_validation(cache_key)
+            if local_result is not None:
+                return local_result
+
             try:
                 redis_client = await redis.get_client()
                 cached_result = await redis_client.get(cache_key)
@@ -360,7 +373,7 @@ class APIKeyService:
 
                     cached_data = json.loads(cached_result)
                     logger.debug(f"API key validation cache hit for {public_key}")
-                    return APIKeyValidationResult(
+                    validation_result = APIKeyValidationResult(
                         is_valid=cached_data["is_valid"],
                         account_id=(
                             UUID(cached_data["account_id"])
@@ -374,6 +387,8 @@ class APIKeyService:
                         ),
                         error_message=cached_data.get("error_message"),
                     )
+                    self._set_local_validation(cache_key, validation_result)
+                    return validation_result
             except Exception as e:
                 logger.warning(f"Redis cache lookup failed: {e}")
                 # Continue without cache
@@ -453,10 +468,37 @@ class APIKeyService:
                 is_valid=False, error_message="Internal server error"
             )
 
+    @classmethod
+    def _get_local_validation(cls, cache_key: str) -> Optional[APIKeyValidationResult]:
+        entry = cls._validation_cache.get(cache_key)
+        if entry is None:
+            return None
+        result, expires_at = entry
+        if expires_at <= time.monotonic():
+            cls._validation_cache.pop(cache_key, None)
+            return None
+        cls._validation_cache.move_to_end(cache_key)
+        return result
+
+    @classmethod
+    def _set_local_validation(cls, cache_key: str, result: APIKeyValidationResult):
+        cls._validation_cache[cache_key] = (result, time.monotonic() + cls._LOCAL_VALIDATION_TTL)
+        cls._validation_cache.move_to_end(cache_key)
+        while len(cls._validation_cache) > cls._LOCAL_VALIDATION_MAX_SIZE:
+            cls._validation_cache.popitem(last=False)
+
+    @classmethod
+    def _evict_local_validation(cls, key_id: UUID):
+        key_id = str(key_id)
+        stale = [k for k, (r, _) in cls._validation_cache.items() if r.key_id is not None and str(r.key_id) == key_id]
+        for k in stale:
+            cls._validation_cache.pop(k, None)
+
     async def _cache_validation_result(
         self, cache_key: str, result: APIKeyValidationResult, ttl: int = 120
     ):
-        """Cache validation result in Redis"""
+        """Cache validation result in-process and in Redis"""
+        self._set_local_validation(cache_key, result)
         try:
             redis_client = await redis.get_client()
             import json
@@ -564,6 +606,8 @@ class APIKeyService:
             if not result.data:
                 raise HTTPException(status_code=404, detail="API key not found")
 
+            self._evict_local_validation(key_id)
+
             logger.debug(
                 "API key deleted successfully",
                 account_id=str(account_id),
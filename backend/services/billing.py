@@ -323,10 +323,16 @@ async def get_user_subscription(user_id: str) -> Optional[Dict]:
 
 async def calculate_monthly_usage(client, user_id: str) -> float:
     """Calculate total agent run minutes for the current month for a user."""
-    result = await Cache.get(f"monthly_usage:{user_id}")
-    if result:
-        return result
+    return await Cache.get_or_load(
+        f"monthly_usage:{user_id}",
+        lambda: _compute_monthly_usage(client, user_id),
+        ttl=2 * 60,
+        # Usage gates billing checks, so never serve a stale total
+        stale_ttl=0,
+    )
+
 
+async def _compute_monthly_usage(client, user_id: str) -> float:
     start_time = time.time()
     
     # Use get_usage_logs to fetch all usage data (it already handles the date filtering and batching)
@@ -354,8 +360,6 @@ async def calculate_monthly_usage(client, user_id: str) -> float:
     end_time = time.time()
     execution_time = end_time - start_time
     logger.debug(f"Calculate monthly usage took {execution_time:.3f} seconds, total cost: {total_cost}")
-    
-    await Cache.set(f"monthly_usage:{user_id}", total_cost, ttl=2 * 60)
     return total_cost
 
 
@@ -550,11 +554,14 @@ async def get_allowed_models_for_user(client, user_id: str):
     Returns:
         List of model names allowed for the user's subscription tier.
     """
+    return await Cache.get_or_load(
+        f"allowed_models_for_user:{user_id}",
+        lambda: _compute_allowed_models_for_user(user_id),
+        ttl=1 * 60,
+    )
 
-    result = await Cache.get(f"allowed_models_for_user:{user_id}")
-    if result:
-        return result
 
+async def _compute_allowed_models_for_user(user_id: str):
     subscription = await get_user_subscription(user_id)
     tier_name = 'free'
     
@@ -571,9 +578,7 @@ async def get_allowed_models_for_user(client, user_id: str):
             tier_name = tier_info['name']
     
     # Return allowed models for this tier
-    result = MODEL_ACCESS_TIERS.get(tier_name, MODEL_ACCESS_TIERS['free'])  # Default to free tier if unknown
-    await Cache.set(f"allowed_models_for_user:{user_id}", result, ttl=1 * 60)
-    return result
+    return MODEL_ACCESS_TIERS.get(tier_name, MODEL_ACCESS_TIERS['free'])  # Default to free tier if unknown
 
 
 async def can_use_model(client, user_id: str, model_name: str):
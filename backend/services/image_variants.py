@@ -0,0 +1,276 @@
+"""
+Content-addressed cache of model-ready image variants.
+
+``see_image`` hands the raw bytes to ``prepare`` once: they are decoded and
+normalised into a *source* variant (the previous default: at most 1920x1080,
+JPEG/PNG/GIF) which is stored under the sha256 of the original bytes. The
+``image_context`` message then only carries that hash. When the next turn's
+prompt is built, ``get_variant`` derives the variant sized for the model's
+provider from the source variant and caches it as well, so looking at the same
+screenshot or asset again - in any turn or thread - costs no download, decode
+or re-encode.
+
+Variants live in Redis (shared by API instances and workers) behind a
+byte-bounded in-process LRU. Sandbox files are also indexed by
+(path, mtime, size) so an unchanged file is not even downloaded again.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+from services import redis
+from utils.logger import logger
+
+KEY_PREFIX = "image_variant:"
+VARIANT_TTL = 24 * 60 * 60
+LOCAL_MAX_BYTES = 64 * 1024 * 1024
+
+SOURCE_PRESET = "source"
+
+
+@dataclass(frozen=True)
+class VariantPreset:
+    max_width: int
+    max_height: int
+    # Provider-side limits that decide the token cost of an image
+    max_pixels: Optional[int] = None
+    max_short_side: Optional[int] = None
+    jpeg_quality: int = 85
+    png_compress_level: int = 6
+
+
+PRESETS: Dict[str, VariantPreset] = {
+    SOURCE_PRESET: VariantPreset(1920, 1080),
+    # Anthropic downsizes anything over 1568px on the long edge or ~1.15MP
+    # (tokens ~= width * height / 750)
+    "anthropic": VariantPreset(1568, 1568, max_pixels=1_150_000),
+    # OpenAI high detail fits 2048x2048, then scales the short side to 768
+    # (billed per 512px tile)
+    "openai": VariantPreset(2048, 2048, max_short_side=768),
+    # Gemini bills per 768px tile
+    "gemini": VariantPreset(1536, 1536),
+}
+
+
+def preset_for_model(model_name: Optional[str]) -> str:
+    name = (model_name or "").lower()
+    if "anthropic" in name or "claude" in name or "sonnet" in name:
+        return "anthropic"
+    if "openai" in name or "gpt" in name:
+        return "openai"
+    if "gemini" in name:
+        return "gemini"
+    return SOURCE_PRESET
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    mime_type: str
+    data: bytes
+    width: int
+    height: int
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "mime_type": self.mime_type,
+            "data": self.to_base64(),
+            "width": self.width,
+            "height": self.height,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ImageVariant":
+        payload = json.loads(raw)
+        return cls(payload["mime_type"], base64.b64decode(payload["data"]), payload["width"], payload["height"])
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _scale(width: int, height: int, preset: VariantPreset) -> float:
+    ratio = min(1.0, preset.max_width / width, preset.max_height / height)
+    if preset.max_pixels and width * height * ratio * ratio > preset.max_pixels:
+        ratio = math.sqrt(preset.max_pixels / (width * height))
+    if preset.max_short_side and min(width, height) * ratio > preset.max_short_side:
+        ratio = preset.max_short_side / min(width, height)
+    return ratio
+
+
+def render_variant(image_bytes: bytes, mime_type: str, preset: VariantPreset) -> ImageVariant:
+    """Decode, resize and re-encode ``image_bytes`` for ``preset`` (CPU bound; run off the loop)."""
+    img = Image.open(BytesIO(image_bytes))
+    width, height = img.size
+    ratio = _scale(width, height, preset)
+
+    # Already within the preset and in an output format: keep the bytes as they are
+    if ratio >= 1.0 and mime_type in ("image/jpeg", "image/png", "image/gif"):
+        return ImageVariant(mime_type, image_bytes, width, height)
+
+    if img.mode in ('RGBA', 'LA', 'P'):
+        # Flatten transparency onto white
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    if ratio < 1.0:
+        width, height = max(1, int(width * ratio)), max(1, int(height * ratio))
+        img = img.resize((width, height), Image.Resampling.LANCZOS)
+
+    output = BytesIO()
+    if mime_type == 'image/gif':
+        img.save(output, format='GIF', optimize=True)
+        output_mime = 'image/gif'
+    elif mime_type == 'image/png':
+        # Keep PNG so text in screenshots stays crisp
+        img.save(output, format='PNG', optimize=True, compress_level=preset.png_compress_level)
+        output_mime = 'image/png'
+    else:
+        img.save(output, format='JPEG', quality=preset.jpeg_quality, optimize=True)
+        output_mime = 'image/jpeg'
+    return ImageVariant(output_mime, output.getvalue(), width, height)
+
+
+class ImageVariantCache:
+    def __init__(self, local_max_bytes: int = LOCAL_MAX_BYTES):
+        self._local: "OrderedDict[str, ImageVariant]" = OrderedDict()
+        self._local_bytes = 0
+        self._local_max_bytes = local_max_bytes
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _remember(self, key: str, variant: ImageVariant) -> None:
+        if len(variant.data) > self._local_max_bytes:
+            return
+        previous = self._local.pop(key, None)
+        if previous:
+            self._local_bytes -= len(previous.data)
+        self._local[key] = variant
+        self._local_bytes += len(variant.data)
+        while self._local_bytes > self._local_max_bytes:
+            _, evicted = self._local.popitem(last=False)
+            self._local_bytes -= len(evicted.data)
+
+    async def _lookup(self, key: str) -> Optional[ImageVariant]:
+        variant = self._local.get(key)
+        if variant is not None:
+            self._local.move_to_end(key)
+            return variant
+        try:
+            raw = await redis.get(KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Image variant cache unavailable: {e}")
+            return None
+        if not raw:
+            return None
+        variant = ImageVariant.from_json(raw)
+        self._remember(key, variant)
+        return variant
+
+    async def _store(self, key: str, variant: ImageVariant) -> bool:
+        self._remember(key, variant)
+        try:
+            await redis.set(KEY_PREFIX + key, variant.to_json(), ex=VARIANT_TTL)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to persist image variant {key}: {e}")
+            return False
+
+    async def _get_or_render(
+        self, key: str, render: Callable[[], Awaitable[ImageVariant]]
+    ) -> Tuple[ImageVariant, bool]:
+        """Cached variant for ``key`` or render it once, even under concurrent requests.
+
+        Returns the variant and whether it is available to other processes.
+        """
+        variant = await self._lookup(key)
+        if variant is not None:
+            return variant, True
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            variant = await render()
+            result = (variant, await self._store(key, variant))
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters (if any) receive the exception; don't warn about it otherwise
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def prepare(self, image_bytes: bytes, mime_type: str) -> Tuple[str, ImageVariant, bool]:
+        """
+        Store the source variant of an image.
+
+        Returns ``(image_ref, source_variant, shared)``; ``shared`` is False when
+        the variant could not be persisted and the caller should inline it.
+        """
+        digest = content_hash(image_bytes)
+
+        async def render() -> ImageVariant:
+            variant = await asyncio.to_thread(render_variant, image_bytes, mime_type, PRESETS[SOURCE_PRESET])
+            logger.debug(
+                f"Prepared image {digest[:12]}: {len(image_bytes) / 1024:.1f}KB -> "
+                f"{len(variant.data) / 1024:.1f}KB ({variant.width}x{variant.height})"
+            )
+            return variant
+
+        variant, shared = await self._get_or_render(f"{digest}:{SOURCE_PRESET}", render)
+        return digest, variant, shared
+
+    async def get_variant(self, image_ref: str, preset_name: str = SOURCE_PRESET) -> Optional[ImageVariant]:
+        """Variant of a prepared image for ``preset_name``; None if the image has expired."""
+        source = await self._lookup(f"{image_ref}:{SOURCE_PRESET}")
+        if source is None or preset_name == SOURCE_PRESET or preset_name not in PRESETS:
+            return source
+
+        async def render() -> ImageVariant:
+            return await asyncio.to_thread(render_variant, source.data, source.mime_type, PRESETS[preset_name])
+
+        variant, _ = await self._get_or_render(f"{image_ref}:{preset_name}", render)
+        return variant
+
+    @staticmethod
+    def _file_key(scope: str, full_path: str, mod_time: str, size: int) -> str:
+        fingerprint = hashlib.sha1(f"{full_path}|{mod_time}|{size}".encode()).hexdigest()
+        return f"{KEY_PREFIX}file:{scope}:{fingerprint}"
+
+    async def lookup_file(self, scope: str, full_path: str, mod_time: str, size: int) -> Optional[Tuple[str, ImageVariant]]:
+        """Prepared image for an unchanged sandbox file, without downloading it."""
+        try:
+            digest = await redis.get(self._file_key(scope, full_path, mod_time, size))
+        except Exception:
+            return None
+        if not digest:
+            return None
+        source = await self._lookup(f"{digest}:{SOURCE_PRESET}")
+        return (digest, source) if source else None
+
+    async def remember_file(self, scope: str, full_path: str, mod_time: str, size: int, image_ref: str) -> None:
+        try:
+            await redis.set(self._file_key(scope, full_path, mod_time, size), image_ref, ex=VARIANT_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to index image file {full_path}: {e}")
+
+
+image_variants = ImageVariantCache()
@@ -11,11 +11,14 @@ This module provides a unified interface for making API calls to different LLM p
 """
 
 from typing import Union, Dict, Any, Optional, AsyncGenerator, List
+import copy
 import os
 import litellm
 from litellm.files.main import ModelResponse
 from utils.logger import logger
 from utils.config import config
+from services.llm_router import get_llm_router
+from agentpress.prompt_cache import apply_cache_breakpoints, flatten_system_content
 
 # litellm.set_verbose=True
 # Let LiteLLM auto-adjust params and drop unsupported ones (e.g., GPT-5 temperature!=1)
@@ -104,42 +107,19 @@ def _configure_token_limits(params: Dict[str, Any], model_name: str, max_tokens:
     param_name = "max_completion_tokens" if (is_openai_o_series or is_openai_gpt5) else "max_tokens"
     params[param_name] = max_tokens
 
-def _apply_anthropic_caching(messages: List[Dict[str, Any]]) -> None:
-    """Apply Anthropic caching to the messages."""
-
-    # Apply cache control to the first 4 text blocks across all messages
-    cache_control_count = 0
-    max_cache_control_blocks = 3
-    
-    for message in messages:
-        if cache_control_count >= max_cache_control_blocks:
-            break
-            
-        content = message.get("content")
-        
-        if isinstance(content, str):
-            message["content"] = [
-                {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
-            ]
-            cache_control_count += 1
-        elif isinstance(content, list):
-            for item in content:
-                if cache_control_count >= max_cache_control_blocks:
-                    break
-                if isinstance(item, dict) and item.get("type") == "text" and "cache_control" not in item:
-                    item["cache_control"] = {"type": "ephemeral"}
-                    cache_control_count += 1
-
-def _configure_anthopic(params: Dict[str, Any], model_name: str, messages: List[Dict[str, Any]]) -> None:
+def _configure_anthopic(params: Dict[str, Any], model_name: str) -> None:
     """Configure Anthropic-specific parameters."""
     if not ("claude" in model_name.lower() or "anthropic" in model_name.lower()):
+        # Other providers get the system prompt as one string, stable text first,
+        # which keeps their automatic prefix caching effective
+        flatten_system_content(params["messages"])
         return
     
     params["extra_headers"] = {
         "anthropic-beta": "output-128k-2025-02-19"
     }
     logger.debug("Added Anthropic-specific headers")
-    _apply_anthropic_caching(messages)
+    apply_cache_breakpoints(params)
 
 def _configure_openrouter(params: Dict[str, Any], model_name: str) -> None:
     """Configure OpenRouter-specific parameters."""
@@ -241,6 +221,27 @@ def _add_tools_config(params: Dict[str, Any], tools: Optional[List[Dict[str, Any
     })
     logger.debug(f"Added {len(tools)} tools to API parameters")
 
+def _missing_key_for_model(name: str) -> Optional[str]:
+    """Early provider credential check to avoid silent hangs."""
+    try:
+        # Provider prefixes first: bedrock/ and openrouter/ names also contain "claude", "gemini", ...
+        if name.startswith("bedrock/"):
+            has_bedrock = bool(getattr(config, 'AWS_ACCESS_KEY_ID', None) and getattr(config, 'AWS_SECRET_ACCESS_KEY', None) and getattr(config, 'AWS_REGION_NAME', None))
+            return None if has_bedrock else "AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY/AWS_REGION_NAME"
+        if name.startswith("openrouter/"):
+            return None if getattr(config, 'OPENROUTER_API_KEY', None) else "OPENROUTER_API_KEY"
+        if name.startswith("openai/") or name.startswith("gpt-"):
+            return None if getattr(config, 'OPENAI_API_KEY', None) else "OPENAI_API_KEY"
+        if name.startswith("anthropic/") or "claude" in name.lower():
+            return None if getattr(config, 'ANTHROPIC_API_KEY', None) else "ANTHROPIC_API_KEY"
+        if name.startswith("xai/") or "grok" in name.lower():
+            return None if getattr(config, 'XAI_API_KEY', None) else "XAI_API_KEY"
+        if name.startswith("gemini/") or "gemini" in name.lower():
+            return None if getattr(config, 'GEMINI_API_KEY', None) else "GEMINI_API_KEY"
+    except Exception:
+        pass
+    return None
+
 def prepare_params(
     messages: List[Dict[str, Any]],
     model_name: str,
@@ -280,7 +281,7 @@ def prepare_params(
     # Add tools if provided
     _add_tools_config(params, tools, tool_choice)
     # Add Anthropic-specific parameters
-    _configure_anthopic(params, model_name, params["messages"])
+    _configure_anthopic(params, model_name)
     # Add OpenRouter-specific parameters
     _configure_openrouter(params, model_name)
     # Add Bedrock-specific parameters
@@ -341,49 +342,41 @@ async def make_llm_api_call(
     logger.debug(f"Making LLM API call to model: {model_name} (Thinking: {enable_thinking}, Effort: {reasoning_effort})")
     logger.debug(f"📡 API Call: Using model {model_name}")
 
-    # Early provider credential check to avoid silent hangs
-    def _missing_key_for_model(name: str) -> Optional[str]:
-        try:
-            if name.startswith("openrouter/"):
-                return None if getattr(config, 'OPENROUTER_API_KEY', None) else "OPENROUTER_API_KEY"
-            if name.startswith("openai/") or name.startswith("gpt-"):
-                return None if getattr(config, 'OPENAI_API_KEY', None) else "OPENAI_API_KEY"
-            if name.startswith("anthropic/") or "claude" in name.lower():
-                return None if getattr(config, 'ANTHROPIC_API_KEY', None) else "ANTHROPIC_API_KEY"
-            if name.startswith("xai/") or "grok" in name.lower():
-                return None if getattr(config, 'XAI_API_KEY', None) else "XAI_API_KEY"
-            if name.startswith("gemini/") or "gemini" in name.lower():
-                return None if getattr(config, 'GEMINI_API_KEY', None) else "GEMINI_API_KEY"
-            if name.startswith("bedrock/"):
-                has_bedrock = bool(getattr(config, 'AWS_ACCESS_KEY_ID', None) and getattr(config, 'AWS_SECRET_ACCESS_KEY', None) and getattr(config, 'AWS_REGION_NAME', None))
-                return None if has_bedrock else "AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY/AWS_REGION_NAME"
-        except Exception:
-            pass
-        return None
-
     missing_key = _missing_key_for_model(model_name)
     if missing_key:
         logger.error(f"Missing credentials for model '{model_name}': {missing_key}")
         raise LLMError(f"Missing credentials for model provider. Please set {missing_key}.")
 
-    params = prepare_params(
-        messages=messages,
-        model_name=model_name,
-        temperature=temperature,
-        max_tokens=max_tokens,
-        response_format=response_format,
-        tools=tools,
-        tool_choice=tool_choice,
-        api_key=api_key,
-        api_base=api_base,
-        stream=stream,
-        top_p=top_p,
-        model_id=model_id,
-        enable_thinking=enable_thinking,
-        reasoning_effort=reasoning_effort
-    )
+    def build_params(deployment_model: str) -> Dict[str, Any]:
+        is_requested = deployment_model == model_name
+        return prepare_params(
+            # prepare_params mutates messages (cache_control), so alternates get a pristine copy
+            messages=messages if is_requested else copy.deepcopy(pristine_messages),
+            model_name=deployment_model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            tools=tools,
+            tool_choice=tool_choice,
+            api_key=api_key,
+            api_base=api_base,
+            stream=stream,
+            top_p=top_p,
+            model_id=model_id if is_requested else None,
+            enable_thinking=enable_thinking,
+            reasoning_effort=reasoning_effort
+        )
+
+    # Explicit credentials/endpoints pin the call to the requested deployment
+    use_router = config.LLM_ROUTING_ENABLED and not api_key and not api_base
     try:
-        response = await litellm.acompletion(**params)
+        if use_router:
+            router = get_llm_router()
+            is_available = lambda name: _missing_key_for_model(name) is None
+            pristine_messages = copy.deepcopy(messages) if len(router.candidates(model_name, is_available)) > 1 else messages
+            response = await router.route(model_name, build_params, is_available)
+        else:
+            response = await litellm.acompletion(**build_params(model_name))
         logger.debug(f"Successfully received API response from {model_name}")
         # logger.debug(f"Response: {response}")
         return response
@@ -0,0 +1,429 @@
+"""
+Latency-aware routing between equivalent LLM deployments.
+
+The same model is often reachable through several providers (direct Anthropic,
+AWS Bedrock, OpenRouter). This module keeps live per-deployment statistics
+(time-to-first-token, tokens/sec, error rate) and uses them to:
+
+- Order the equivalent deployments for a request, keeping the requested one
+  first unless it is unhealthy or clearly slower (provider prompt caches are
+  per deployment, so switching has a cost of its own)
+- Fail over to the next deployment when a call fails before the first token
+  with a deployment-side error (timeout, connection error, 429 or 5xx);
+  errors caused by the request itself are raised immediately and don't count
+  against the deployment
+- Optionally hedge: if the first token has not arrived within the primary's
+  TTFT percentile, start the next deployment and keep whichever answers first
+
+All LiteLLM calls share one pooled HTTP client. Models addressed as
+``stub/<name>`` are served by an in-process ``StubProvider`` so routing can be
+exercised offline.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import litellm
+
+from utils.logger import logger
+
+# Deployments that serve the same underlying model. The first entry is the
+# canonical name; any member can be requested.
+EQUIVALENT_DEPLOYMENTS: List[List[str]] = [
+    [
+        "anthropic/claude-sonnet-4-20250514",
+        "bedrock/us.anthropic.claude-sonnet-4-20250514-v1:0",
+        "openrouter/anthropic/claude-sonnet-4",
+    ],
+    [
+        "anthropic/claude-3-7-sonnet-latest",
+        "bedrock/anthropic.claude-3-7-sonnet-20250219-v1:0",
+        "openrouter/anthropic/claude-3.7-sonnet",
+    ],
+    [
+        "xai/grok-4",
+        "openrouter/x-ai/grok-4",
+    ],
+    [
+        "gemini/gemini-2.5-pro",
+        "openrouter/google/gemini-2.5-pro",
+    ],
+]
+
+STATS_WINDOW = 200
+MIN_SAMPLES_FOR_PERCENTILE = 20
+EWMA_ALPHA = 0.2
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN_SECONDS = 30.0
+# The requested deployment keeps priority unless another is this much faster
+STICKINESS_FACTOR = 0.7
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether ``error`` reflects the deployment (worth failing over) rather than the request."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError,
+                          litellm.Timeout, litellm.APIConnectionError, litellm.RateLimitError,
+                          litellm.InternalServerError, litellm.ServiceUnavailableError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+@dataclass
+class DeploymentStats:
+    """Rolling latency/error statistics for one deployment."""
+
+    ttft_samples: Deque[float] = field(default_factory=lambda: deque(maxlen=STATS_WINDOW))
+    ewma_ttft: Optional[float] = None
+    ewma_tokens_per_sec: Optional[float] = None
+    requests: int = 0
+    errors: int = 0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+
+    def record_success(self, ttft: float, completion_tokens: int, duration: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.ttft_samples.append(ttft)
+        self.ewma_ttft = ttft if self.ewma_ttft is None else (1 - EWMA_ALPHA) * self.ewma_ttft + EWMA_ALPHA * ttft
+        generation_time = duration - ttft
+        if completion_tokens > 0 and generation_time > 0:
+            tps = completion_tokens / generation_time
+            self.ewma_tokens_per_sec = tps if self.ewma_tokens_per_sec is None else (
+                (1 - EWMA_ALPHA) * self.ewma_tokens_per_sec + EWMA_ALPHA * tps
+            )
+
+    def record_failure(self):
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+            self.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def ttft_percentile(self, percentile: float) -> Optional[float]:
+        if len(self.ttft_samples) < MIN_SAMPLES_FOR_PERCENTILE:
+            return None
+        ordered = sorted(self.ttft_samples)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def score(self) -> Optional[float]:
+        """Expected TTFT penalised by error rate; None when there is no data yet."""
+        if self.ewma_ttft is None:
+            return None
+        return self.ewma_ttft * (1 + 4 * self.error_rate)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 4),
+            "healthy": self.healthy,
+            "ewma_ttft": round(self.ewma_ttft, 3) if self.ewma_ttft is not None else None,
+            "p90_ttft": self.ttft_percentile(90),
+            "ewma_tokens_per_sec": round(self.ewma_tokens_per_sec, 1) if self.ewma_tokens_per_sec is not None else None,
+        }
+
+
+class StubProvider:
+    """
+    In-process LLM provider for offline testing of routing decisions.
+
+    Behaviour per ``stub/<name>`` model is set with ``configure``; unconfigured
+    stub models answer immediately with a fixed reply.
+    """
+
+    def __init__(self):
+        self._behaviours: Dict[str, Dict[str, Any]] = {}
+        self.calls: List[str] = []
+
+    def configure(
+        self,
+        model: str,
+        ttft: float = 0.0,
+        chunks: Sequence[str] = ("stub ", "response"),
+        chunk_delay: float = 0.0,
+        fail: bool = False,
+        fail_status: int = 503,
+    ):
+        self._behaviours[model] = {
+            "ttft": ttft, "chunks": list(chunks), "chunk_delay": chunk_delay, "fail": fail,
+            "fail_status": fail_status,
+        }
+
+    def reset(self):
+        self._behaviours.clear()
+        self.calls.clear()
+
+    async def acompletion(self, model: str, stream: bool = False, **_: Any):
+        self.calls.append(model)
+        behaviour = self._behaviours.get(model, {"ttft": 0.0, "chunks": ["stub response"], "chunk_delay": 0.0, "fail": False})
+        await asyncio.sleep(behaviour["ttft"])
+        if behaviour["fail"]:
+            raise StubProviderError(f"Stub provider failure for {model}", behaviour.get("fail_status", 503))
+
+        if not stream:
+            text = "".join(behaviour["chunks"])
+            return SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(message=SimpleNamespace(content=text, tool_calls=None), finish_reason="stop")],
+                usage=SimpleNamespace(prompt_tokens=0, completion_tokens=len(behaviour["chunks"]), total_tokens=len(behaviour["chunks"])),
+            )
+
+        async def _stream():
+            for i, text in enumerate(behaviour["chunks"]):
+                if i:
+                    await asyncio.sleep(behaviour["chunk_delay"])
+                last = i == len(behaviour["chunks"]) - 1
+                yield SimpleNamespace(
+                    model=model,
+                    created=int(time.time()),
+                    usage=None,
+                    choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None), finish_reason="stop" if last else None)],
+                )
+
+        return _stream()
+
+
+class StubProviderError(Exception):
+    def __init__(self, message: str, status_code: int):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class AllDeploymentsFailed(Exception):
+    def __init__(self, errors: Dict[str, Exception]):
+        self.errors = errors
+        detail = "; ".join(f"{model}: {error}" for model, error in errors.items())
+        super().__init__(f"All deployments failed ({detail})")
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        hedging_enabled: bool = False,
+        hedge_percentile: float = 90,
+        hedge_default_delay: float = 10.0,
+        hedge_min_delay: float = 1.0,
+        stub: Optional[StubProvider] = None,
+    ):
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.stub = stub or StubProvider()
+        self._stats: Dict[str, DeploymentStats] = {}
+        self._groups: Dict[str, List[str]] = {}
+        for group in EQUIVALENT_DEPLOYMENTS:
+            self.register_group(group)
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    def register_group(self, deployments: Sequence[str]):
+        """Declare a set of deployments as interchangeable."""
+        group = list(deployments)
+        for model in group:
+            self._groups[model] = group
+
+    def stats_for(self, model: str) -> DeploymentStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = DeploymentStats()
+        return stats
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {model: stats.as_dict() for model, stats in sorted(self._stats.items())}
+
+    def candidates(self, model_name: str, is_available: Callable[[str], bool]) -> List[str]:
+        """Equivalent deployments for ``model_name``, best first."""
+        group = self._groups.get(model_name)
+        if not group:
+            return [model_name]
+        others = [m for m in group if m != model_name and is_available(m)]
+        if not others:
+            return [model_name]
+
+        def sort_key(model: str):
+            stats = self.stats_for(model)
+            score = stats.score()
+            if model == model_name:
+                # Untested deployments never displace the requested one
+                score = 0.0 if score is None else score * STICKINESS_FACTOR
+            elif score is None:
+                score = float("inf")
+            return (not stats.healthy, score)
+
+        return sorted([model_name, *others], key=sort_key)
+
+    def _hedge_delay(self, model: str) -> float:
+        percentile = self.stats_for(model).ttft_percentile(self.hedge_percentile)
+        if percentile is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, percentile)
+
+    def _ensure_http_client(self):
+        # LiteLLM reuses this session for OpenAI-compatible providers instead
+        # of building a client per request.
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60),
+                timeout=httpx.Timeout(600.0, connect=10.0),
+            )
+            litellm.aclient_session = self._http_client
+
+    async def close(self):
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+
+    async def _acompletion(self, params: Dict[str, Any]):
+        if params["model"].startswith("stub/"):
+            return await self.stub.acompletion(**params)
+        self._ensure_http_client()
+        return await litellm.acompletion(**params)
+
+    async def _open(self, model: str, params: Dict[str, Any]) -> Tuple[Any, Optional[Any], float, float]:
+        """Issue the call and, for streams, wait for the first chunk."""
+        started = time.monotonic()
+        response = await self._acompletion(params)
+        if not params.get("stream"):
+            return response, None, started, time.monotonic() - started
+        iterator = response.__aiter__()
+        try:
+            first_chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            first_chunk = None
+        return iterator, first_chunk, started, time.monotonic() - started
+
+    async def _race(self, attempts: List[Tuple[str, "asyncio.Task"]], errors: Dict[str, Exception]):
+        """Return (model, result) for the first attempt that succeeds, cancelling the rest."""
+        pending = {task: model for model, task in attempts}
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                model = pending.pop(task)
+                error = task.exception()
+                if error is None or not is_retryable(error):
+                    for loser, loser_model in pending.items():
+                        loser.cancel()
+                        asyncio.create_task(self._discard(loser, loser_model))
+                    if error is not None:
+                        # Every deployment would reject the same request
+                        raise error
+                    return model, task.result()
+                self.stats_for(model).record_failure()
+                errors[model] = error
+                logger.warning(f"LLM deployment {model} failed: {error}")
+        return None
+
+    async def _discard(self, task: "asyncio.Task", model: str):
+        try:
+            iterator, *_ = await task
+        except BaseException:
+            return
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
+        logger.debug(f"Discarded hedged response from {model}")
+
+    async def route(
+        self,
+        model_name: str,
+        build_params: Callable[[str], Dict[str, Any]],
+        is_available: Callable[[str], bool] = lambda _: True,
+    ):
+        """
+        Call the best deployment for ``model_name``.
+
+        ``build_params`` returns LiteLLM parameters for a given deployment;
+        it is called lazily, once per deployment actually attempted.
+        """
+        remaining = self.candidates(model_name, is_available)
+        multi_deployment = len(remaining) > 1
+        errors: Dict[str, Exception] = {}
+
+        def launch(model: str) -> "asyncio.Task":
+            params = build_params(model)
+            if multi_deployment:
+                # Failover is handled here rather than by LiteLLM
+                params.pop("fallbacks", None)
+            return asyncio.create_task(self._open(model, params))
+
+        while remaining:
+            primary = remaining.pop(0)
+            attempts = [(primary, launch(primary))]
+
+            if self.hedging_enabled and remaining:
+                done, _ = await asyncio.wait([attempts[0][1]], timeout=self._hedge_delay(primary))
+                if not done:
+                    hedge = remaining.pop(0)
+                    logger.info(f"Hedging LLM request: {primary} slow to first token, also trying {hedge}")
+                    attempts.append((hedge, launch(hedge)))
+
+            winner = await self._race(attempts, errors)
+            if winner is None:
+                continue
+
+            model, (response, first_chunk, started, ttft) = winner
+            if model != model_name:
+                logger.info(f"LLM request for {model_name} served by {model}")
+            if not hasattr(response, "__anext__"):
+                usage = getattr(response, "usage", None)
+                tokens = getattr(usage, "completion_tokens", 0) or 0
+                self.stats_for(model).record_success(ttft, tokens, ttft)
+                return response
+            return self._instrument_stream(model, response, first_chunk, started, ttft)
+
+        if len(errors) == 1:
+            raise next(iter(errors.values()))
+        raise AllDeploymentsFailed(errors)
+
+    async def _instrument_stream(self, model: str, iterator, first_chunk, started: float, ttft: float) -> AsyncGenerator:
+        stats = self.stats_for(model)
+        chunks = 0
+        completion_tokens = 0
+        try:
+            if first_chunk is not None:
+                chunks += 1
+                yield first_chunk
+            async for chunk in iterator:
+                chunks += 1
+                usage = getattr(chunk, "usage", None)
+                if usage is not None and getattr(usage, "completion_tokens", None):
+                    completion_tokens = usage.completion_tokens
+                yield chunk
+        except Exception as e:
+            if is_retryable(e):
+                stats.record_failure()
+            raise
+        # Chunk count is a reasonable proxy when the provider omits usage
+        stats.record_success(ttft, completion_tokens or chunks, time.monotonic() - started)
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    global _router
+    if _router is None:
+        from utils.config import config
+        _router = LLMRouter(
+            hedging_enabled=config.LLM_HEDGING_ENABLED,
+            hedge_percentile=config.LLM_HEDGE_PERCENTILE,
+        )
+    return _router
@@ -0,0 +1,252 @@
+"""
+Shared web fetch layer for the web search tool.
+
+Scraped pages and search results are cached in the two-tier ``Cache`` (local
+LRU + Redis, shared by every agent and user) for ``WEB_SCRAPE_CACHE_TTL`` /
+``WEB_SEARCH_CACHE_TTL`` seconds, keyed by the normalized URL or query.
+Concurrent requests for the same page share one fetch, and pages that are not
+cached are scraped with a single Firecrawl batch job instead of one request
+each. All Firecrawl traffic goes through one pooled HTTP client.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from utils.cache import Cache
+from utils.config import config
+from utils.logger import logger
+
+SCRAPE_TIMEOUT = 30
+MAX_ATTEMPTS = 3
+BATCH_POLL_INTERVAL = 1.0
+BATCH_TIMEOUT = 120
+
+# Query parameters that only track the visitor and never change the page
+_TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid", "igshid", "ref_src"}
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(SCRAPE_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of ``url`` for cache keys (the original URL is still what gets fetched)."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def _key(namespace: str, value: str) -> str:
+    return f"{namespace}:{hashlib.sha256(value.encode()).hexdigest()[:40]}"
+
+
+def _page_from_firecrawl(url: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = data.get("metadata") or {}
+    page = {
+        "title": metadata.get("title", ""),
+        "url": url,
+        "text": data.get("markdown", "") or "",
+    }
+    if "metadata" in data:
+        page["metadata"] = metadata
+    return page
+
+
+class WebFetcher:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {config.FIRECRAWL_API_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    async def _scrape_one(self, url: str) -> Dict[str, Any]:
+        client = get_http_client()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                logger.debug(f"Sending request to Firecrawl for {url} (attempt {attempt}/{MAX_ATTEMPTS})")
+                response = await client.post(
+                    f"{config.FIRECRAWL_URL}/v1/scrape",
+                    json={"url": url, "formats": ["markdown"]},
+                    headers=self._headers,
+                )
+                response.raise_for_status()
+                return _page_from_firecrawl(url, response.json().get("data", {}))
+            except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as e:
+                logger.warning(f"Firecrawl request for {url} timed out (attempt {attempt}/{MAX_ATTEMPTS}): {e}")
+                if attempt == MAX_ATTEMPTS:
+                    raise Exception(f"Request timed out after {MAX_ATTEMPTS} attempts with {SCRAPE_TIMEOUT}s timeout")
+                await asyncio.sleep(2 ** attempt)
+
+    async def _scrape_batch(self, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Scrape ``urls`` with one Firecrawl batch job; returns the pages it produced by URL."""
+        client = get_http_client()
+        response = await client.post(
+            f"{config.FIRECRAWL_URL}/v1/batch/scrape",
+            json={"urls": urls, "formats": ["markdown"]},
+            headers=self._headers,
+        )
+        response.raise_for_status()
+        status_url = f"{config.FIRECRAWL_URL}/v1/batch/scrape/{response.json()['id']}"
+
+        deadline = time.monotonic() + BATCH_TIMEOUT
+        documents: List[Dict[str, Any]] = []
+        while True:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            response = await client.get(status_url, headers=self._headers)
+            response.raise_for_status()
+            job = response.json()
+            if job.get("status") == "completed":
+                documents.extend(job.get("data") or [])
+                # Large results are paginated
+                next_url = job.get("next")
+                while next_url:
+                    response = await client.get(next_url, headers=self._headers)
+                    response.raise_for_status()
+                    page = response.json()
+                    documents.extend(page.get("data") or [])
+                    next_url = page.get("next")
+                break
+            if job.get("status") == "failed":
+                raise Exception("Firecrawl batch scrape failed")
+            if time.monotonic() > deadline:
+                raise Exception(f"Firecrawl batch scrape did not finish within {BATCH_TIMEOUT}s")
+
+        requested = {normalize_url(url): url for url in urls}
+        pages: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            metadata = document.get("metadata") or {}
+            source = metadata.get("sourceURL") or metadata.get("url") or ""
+            url = requested.get(normalize_url(source)) if source else None
+            if url and metadata.get("statusCode", 200) < 400:
+                pages[url] = _page_from_firecrawl(url, document)
+        return pages
+
+    async def _fetch(self, urls: List[str]) -> Dict[str, Union[Dict[str, Any], Exception]]:
+        results: Dict[str, Union[Dict[str, Any], Exception]] = {}
+        if len(urls) > 1:
+            try:
+                results.update(await self._scrape_batch(urls))
+            except Exception as e:
+                logger.warning(f"Firecrawl batch scrape of {len(urls)} URLs failed, scraping individually: {e}")
+        # Anything the batch did not return (or a single URL) is scraped on its own
+        missing = [url for url in urls if url not in results]
+        if missing:
+            singles = await asyncio.gather(*(self._scrape_one(url) for url in missing), return_exceptions=True)
+            results.update(zip(missing, singles))
+        return results
+
+    async def scrape(self, urls: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Page content (``title``, ``url``, ``text``, ``metadata``) for each URL, in order.
+
+        Failed URLs yield their exception instead of a page.
+        """
+        ttl = config.WEB_SCRAPE_CACHE_TTL
+        keys = [_key("web_scrape", normalize_url(url)) for url in urls]
+        results: Dict[str, Union[Dict[str, Any], Exception]] = {}
+
+        if ttl > 0:
+            unique_keys = list(dict.fromkeys(keys))
+            cached = await asyncio.gather(*(Cache.get(key) for key in unique_keys), return_exceptions=True)
+            for key, value in zip(unique_keys, cached):
+                if isinstance(value, dict):
+                    results[key] = value
+
+        waiting: Dict[str, asyncio.Future] = {}
+        to_fetch: Dict[str, str] = {}
+        for key, url in zip(keys, urls):
+            if key in results or key in waiting or key in to_fetch:
+                continue
+            if key in self._inflight:
+                waiting[key] = self._inflight[key]
+            else:
+                to_fetch[key] = url
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_fetch}
+            self._inflight.update(futures)
+            try:
+                fetched = await self._fetch(list(to_fetch.values()))
+                for key, url in to_fetch.items():
+                    page = fetched.get(url, Exception("No result returned"))
+                    results[key] = page
+                    if isinstance(page, Exception):
+                        futures[key].set_exception(page)
+                        futures[key].exception()
+                    else:
+                        futures[key].set_result(page)
+                        if ttl > 0:
+                            try:
+                                await Cache.set(key, page, ttl=ttl)
+                            except Exception as e:
+                                logger.warning(f"Failed to cache scraped page {url}: {e}")
+            except BaseException as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        future.exception()
+                raise
+            finally:
+                for key in futures:
+                    self._inflight.pop(key, None)
+
+        for key, future in waiting.items():
+            try:
+                results[key] = await asyncio.shield(future)
+            except Exception as e:
+                results[key] = e
+
+        # Report each page under the URL it was requested as
+        output = []
+        for key, url in zip(keys, urls):
+            page = results[key]
+            output.append(page if isinstance(page, Exception) else {**page, "url": url})
+        return output
+
+    async def search(self, tavily_client, query: str, max_results: int, **options) -> Dict[str, Any]:
+        """Tavily search, cached per (normalized query, max_results, options)."""
+        normalized = " ".join(query.lower().split())
+        key = _key("web_search", json.dumps([normalized, max_results, options], sort_keys=True))
+
+        async def load():
+            return await tavily_client.search(query=query, max_results=max_results, **options)
+
+        ttl = config.WEB_SEARCH_CACHE_TTL
+        if ttl <= 0:
+            return await load()
+        return await Cache.get_or_load(key, load, ttl=ttl, stale_ttl=0)
+
+
+web_fetcher = WebFetcher()
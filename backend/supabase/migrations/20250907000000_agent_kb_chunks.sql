@@ -0,0 +1,39 @@
+BEGIN;
+
+-- Chunked copy of agent knowledge base entries used for per-turn retrieval.
+-- Chunks hold the full extracted content (entries keep a truncated copy for display).
+CREATE TABLE IF NOT EXISTS agent_knowledge_base_chunks (
+    chunk_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    entry_id UUID NOT NULL REFERENCES agent_knowledge_base_entries(entry_id) ON DELETE CASCADE,
+    agent_id UUID NOT NULL REFERENCES agents(agent_id) ON DELETE CASCADE,
+
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL DEFAULT 0,
+
+    -- Optional embedding vector (JSON array of floats), present when KB_EMBEDDING_MODEL is configured
+    embedding JSONB,
+
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT agent_kb_chunks_unique_index UNIQUE (entry_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_kb_chunks_agent_id ON agent_knowledge_base_chunks(agent_id);
+CREATE INDEX IF NOT EXISTS idx_agent_kb_chunks_entry_id ON agent_knowledge_base_chunks(entry_id);
+
+ALTER TABLE agent_knowledge_base_chunks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY agent_kb_chunks_user_access ON agent_knowledge_base_chunks
+    FOR ALL
+    USING (
+        EXISTS (
+            SELECT 1 FROM agents a
+            WHERE a.agent_id = agent_knowledge_base_chunks.agent_id
+            AND basejump.has_role_on_account(a.account_id) = true
+        )
+    );
+
+GRANT ALL PRIVILEGES ON TABLE agent_knowledge_base_chunks TO authenticated, service_role;
+
+COMMIT;
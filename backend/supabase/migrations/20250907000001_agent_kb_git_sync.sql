@@ -0,0 +1,60 @@
+BEGIN;
+
+-- SHA-256 of the raw source bytes an entry was extracted from
+ALTER TABLE agent_knowledge_base_entries
+ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_agent_kb_entries_content_hash ON agent_knowledge_base_entries(content_hash);
+
+-- Content-addressed cache of extracted document text, shared across agents.
+-- Only the backend (service role) reads it; no user-facing policy is defined.
+CREATE TABLE IF NOT EXISTS kb_extracted_content (
+    content_hash VARCHAR(64) PRIMARY KEY,
+    content TEXT NOT NULL,
+    extraction_method VARCHAR(100),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE kb_extracted_content ENABLE ROW LEVEL SECURITY;
+
+-- Git repositories tracked as knowledge base sources, for incremental re-sync
+CREATE TABLE IF NOT EXISTS agent_kb_git_sources (
+    source_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    agent_id UUID NOT NULL REFERENCES agents(agent_id) ON DELETE CASCADE,
+    account_id UUID NOT NULL REFERENCES basejump.accounts(id) ON DELETE CASCADE,
+    repo_entry_id UUID REFERENCES agent_knowledge_base_entries(entry_id) ON DELETE CASCADE,
+
+    git_url TEXT NOT NULL,
+    branch VARCHAR(255) NOT NULL DEFAULT 'main',
+    include_patterns JSONB DEFAULT '[]',
+    exclude_patterns JSONB DEFAULT '[]',
+
+    last_commit_sha VARCHAR(64),
+    file_hashes JSONB DEFAULT '{}',  -- relative path -> git blob SHA at last sync
+    file_entries JSONB DEFAULT '{}', -- relative path -> entry_id
+
+    last_synced_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT agent_kb_git_sources_unique_repo UNIQUE (agent_id, git_url, branch)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_kb_git_sources_agent_id ON agent_kb_git_sources(agent_id);
+
+ALTER TABLE agent_kb_git_sources ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY agent_kb_git_sources_user_access ON agent_kb_git_sources
+    FOR ALL
+    USING (
+        EXISTS (
+            SELECT 1 FROM agents a
+            WHERE a.agent_id = agent_kb_git_sources.agent_id
+            AND basejump.has_role_on_account(a.account_id) = true
+        )
+    );
+
+GRANT ALL PRIVILEGES ON TABLE agent_kb_git_sources TO authenticated, service_role;
+GRANT ALL PRIVILEGES ON TABLE kb_extracted_content TO service_role;
+
+COMMIT;
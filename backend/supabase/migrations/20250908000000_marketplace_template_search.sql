@@ -0,0 +1,155 @@
+BEGIN;
+
+-- Marketplace template search: weighted full-text vector, trigram indexes for
+-- substring matches, and a ranked, keyset-paginated search function that
+-- returns only what the marketplace list view renders.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- array_to_string is only STABLE; tags are plain text so this wrapper is safe
+-- to mark IMMUTABLE for use in a generated column.
+CREATE OR REPLACE FUNCTION marketplace_tags_text(p_tags TEXT[])
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(array_to_string(p_tags, ' '), '')
+$$;
+
+ALTER TABLE agent_templates ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(name, '')), 'A') ||
+        setweight(to_tsvector('english', marketplace_tags_text(tags)), 'B') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_agent_templates_search_vector ON agent_templates USING gin(search_vector);
+CREATE INDEX IF NOT EXISTS idx_agent_templates_name_trgm ON agent_templates USING gin(name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_agent_templates_description_trgm ON agent_templates USING gin(description gin_trgm_ops);
+
+-- Default marketplace ordering (no search term) walks this index
+CREATE INDEX IF NOT EXISTS idx_agent_templates_public_popularity ON agent_templates (
+    download_count DESC,
+    marketplace_published_at DESC,
+    template_id DESC
+) WHERE is_public = true;
+
+-- Ordered by (rank, download_count, published_at, template_id), all descending.
+-- Pass the last row's values as p_after_* to fetch the next page.
+CREATE OR REPLACE FUNCTION search_marketplace_templates(
+    p_search TEXT DEFAULT NULL,
+    p_tags TEXT[] DEFAULT NULL,
+    p_is_kortix_team BOOLEAN DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0,
+    p_after_rank REAL DEFAULT NULL,
+    p_after_download_count INTEGER DEFAULT NULL,
+    p_after_published_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_template_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    template_id UUID,
+    creator_id UUID,
+    name TEXT,
+    description TEXT,
+    config JSONB,
+    tags TEXT[],
+    is_public BOOLEAN,
+    is_kortix_team BOOLEAN,
+    marketplace_published_at TIMESTAMPTZ,
+    download_count INTEGER,
+    created_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ,
+    avatar TEXT,
+    avatar_color TEXT,
+    profile_image_url TEXT,
+    metadata JSONB,
+    creator_name TEXT,
+    rank REAL
+)
+SECURITY DEFINER
+LANGUAGE sql
+STABLE
+AS $$
+    WITH search AS (
+        SELECT
+            NULLIF(trim(p_search), '') AS term,
+            CASE WHEN NULLIF(trim(p_search), '') IS NULL THEN NULL
+                 ELSE websearch_to_tsquery('english', p_search) END AS query
+    ),
+    matches AS (
+        SELECT
+            t.*,
+            CASE WHEN s.term IS NULL THEN 0
+                 ELSE ts_rank_cd(t.search_vector, s.query) + similarity(t.name, s.term)
+            END::REAL AS rank,
+            COALESCE(t.download_count, 0) AS downloads,
+            COALESCE(t.marketplace_published_at, '-infinity'::TIMESTAMPTZ) AS published_sort
+        FROM agent_templates t, search s
+        WHERE t.is_public = true
+        AND (p_is_kortix_team IS NULL OR t.is_kortix_team = p_is_kortix_team)
+        AND (p_tags IS NULL OR t.tags @> p_tags)
+        AND (s.term IS NULL
+             OR t.search_vector @@ s.query
+             OR t.name ILIKE '%' || s.term || '%'
+             OR t.description ILIKE '%' || s.term || '%')
+    )
+    SELECT
+        m.template_id,
+        m.creator_id,
+        m.name::TEXT,
+        m.description,
+        -- Only the parts of the config the list view reads (no workflows or trigger payloads)
+        jsonb_strip_nulls(jsonb_build_object(
+            'system_prompt', m.config->'system_prompt',
+            'model', m.config->'model',
+            'tools', jsonb_build_object(
+                'agentpress', m.config->'tools'->'agentpress',
+                'mcp', m.config->'tools'->'mcp',
+                'custom_mcp', m.config->'tools'->'custom_mcp'
+            ),
+            'triggers', (
+                SELECT jsonb_agg(jsonb_build_object(
+                    'name', tr->'name',
+                    'config', jsonb_build_object(
+                        'provider_id', tr->'config'->'provider_id',
+                        'qualified_name', tr->'config'->'qualified_name',
+                        'trigger_slug', tr->'config'->'trigger_slug'
+                    )
+                ))
+                FROM jsonb_array_elements(
+                    CASE WHEN jsonb_typeof(m.config->'triggers') = 'array'
+                         THEN m.config->'triggers' ELSE '[]'::jsonb END
+                ) tr
+            )
+        )) AS config,
+        m.tags,
+        m.is_public,
+        m.is_kortix_team,
+        m.marketplace_published_at,
+        m.downloads,
+        m.created_at,
+        m.updated_at,
+        m.avatar::TEXT,
+        m.avatar_color::TEXT,
+        m.profile_image_url,
+        m.metadata,
+        COALESCE(acc.name, acc.slug)::TEXT AS creator_name,
+        m.rank
+    FROM matches m
+    LEFT JOIN basejump.accounts acc ON acc.id = m.creator_id
+    WHERE p_after_template_id IS NULL
+       OR (m.rank, m.downloads, m.published_sort, m.template_id) < (
+            p_after_rank,
+            p_after_download_count,
+            COALESCE(p_after_published_at, '-infinity'::TIMESTAMPTZ),
+            p_after_template_id
+       )
+    ORDER BY m.rank DESC, m.downloads DESC, m.published_sort DESC, m.template_id DESC
+    LIMIT p_limit
+    OFFSET p_offset
+$$;
+
+GRANT EXECUTE ON FUNCTION search_marketplace_templates(TEXT, TEXT[], BOOLEAN, INTEGER, INTEGER, REAL, INTEGER, TIMESTAMPTZ, UUID) TO authenticated, anon, service_role;
+
+COMMIT;
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 
@@ -11,7 +11,8 @@ from .template_service import (
     AgentTemplate,
     TemplateNotFoundError,
     TemplateAccessDeniedError,
-    SunaDefaultAgentTemplateError
+    SunaDefaultAgentTemplateError,
+    InvalidMarketplaceCursorError
 )
 from .installation_service import (
     get_installation_service,
@@ -384,12 +385,15 @@ async def install_template(
 
 @router.get("/marketplace", response_model=List[TemplateResponse])
 async def get_marketplace_templates(
+    response: Response,
     limit: Optional[int] = Query(None, description="Maximum number of templates to return"),
     offset: Optional[int] = Query(0, description="Number of templates to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     search: Optional[str] = Query(None, description="Search term for name and description"),
     tags: Optional[str] = Query(None, description="Comma-separated list of tags to filter by"),
     is_rzvi_team: Optional[bool] = Query(None, description="Filter for Rzvi team templates")
 ):
+    is_kortix_team = is_rzvi_team
     try:
         logger.debug(
             f"Fetching marketplace templates with filters - "
@@ -403,13 +407,16 @@ async def get_marketplace_templates(
         if tags:
             tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
         
-        templates = await template_service.get_public_templates(
+        templates, next_cursor = await template_service.get_marketplace_page(
             is_kortix_team=is_kortix_team,
             limit=limit,
             offset=offset,
             search=search,
-            tags=tag_list
+            tags=tag_list,
+            cursor=cursor
         )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         
         logger.debug(f"Retrieved {len(templates)} marketplace templates")
         return [
@@ -417,6 +424,8 @@ async def get_marketplace_templates(
             for template in templates
         ]
         
+    except InvalidMarketplaceCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting marketplace templates: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,12 +1,22 @@
+import base64
 import json
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from uuid import uuid4
 
 from services.supabase import DBConnection
+from utils.cache import Cache
 from utils.logger import logger
 
+FEATURED_CACHE_SIZE = 100
+FEATURED_CACHE_TTL = 5 * 60
+
+
+def _featured_cache_key(is_kortix_team: Optional[bool]) -> str:
+    return f"marketplace_templates:featured:{is_kortix_team}"
+
+
 ConfigType = Dict[str, Any]
 ProfileId = str
 QualifiedName = str
@@ -180,6 +190,9 @@ class TemplateAccessDeniedError(Exception):
 class SunaDefaultAgentTemplateError(Exception):
     pass
 
+class InvalidMarketplaceCursorError(Exception):
+    pass
+
 class TemplateService:
     def __init__(self, db_connection: DBConnection):
         self._db = db_connection
@@ -282,49 +295,93 @@ class TemplateService:
         search: Optional[str] = None,
         tags: Optional[List[str]] = None
     ) -> List[AgentTemplate]:
-        client = await self._db.client
-        
-        query = client.table('agent_templates').select('*').eq('is_public', True)
-        
-        if is_kortix_team is not None:
-            query = query.eq('is_kortix_team', is_kortix_team)
-        
-        if search:
-            query = query.or_(f"name.ilike.%{search}%,description.ilike.%{search}%")
-        
-        if tags:
-            for tag in tags:
-                query = query.contains('tags', [tag])
-        
-        query = query.order('download_count', desc=True)\
-                    .order('marketplace_published_at', desc=True)
-        
-        if limit:
-            query = query.limit(limit)
-        if offset:
-            query = query.offset(offset)
-        
-        result = await query.execute()
-        
-        if not result.data:
-            return []
-        
-        creator_ids = list(set(template['creator_id'] for template in result.data))
-        accounts_result = await client.schema('basejump').from_('accounts').select('id, name, slug').in_('id', creator_ids).execute()
-        
-        creator_names = {}
-        if accounts_result.data:
-            for account in accounts_result.data:
-                creator_names[account['id']] = account.get('name') or account.get('slug')
-        
-        templates = []
-        for template_data in result.data:
-            creator_name = creator_names.get(template_data['creator_id'])
-            template_data['creator_name'] = creator_name
-            templates.append(self._map_to_template(template_data))
-        
+        templates, _ = await self.get_marketplace_page(
+            is_kortix_team=is_kortix_team,
+            limit=limit,
+            offset=offset,
+            search=search,
+            tags=tags
+        )
         return templates
     
+    async def get_marketplace_page(
+        self,
+        is_kortix_team: Optional[bool] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        search: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[AgentTemplate], Optional[str]]:
+        """
+        Ranked page of public templates with slim configs (enough for list views).
+
+        Returns the templates and the cursor for the next page, if there may be one.
+        """
+        search = search.strip() if search else None
+        if not search and not tags and not cursor and not offset:
+            rows = await self._get_featured_rows(is_kortix_team, limit)
+        else:
+            rows = None
+
+        if rows is None:
+            params = {
+                'p_search': search,
+                'p_tags': tags or None,
+                'p_is_kortix_team': is_kortix_team,
+                'p_limit': limit,
+                'p_offset': offset or 0,
+                **self._decode_marketplace_cursor(cursor)
+            }
+            client = await self._db.client
+            result = await client.rpc('search_marketplace_templates', params).execute()
+            rows = result.data or []
+
+        next_cursor = self._encode_marketplace_cursor(rows[-1]) if limit and len(rows) == limit else None
+        return [self._map_to_template(row) for row in rows], next_cursor
+    
+    async def _get_featured_rows(self, is_kortix_team: Optional[bool], limit: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+        """Cached default marketplace ordering; None if the request can't be served from it."""
+        if limit is not None and limit > FEATURED_CACHE_SIZE:
+            return None
+
+        async def load():
+            client = await self._db.client
+            result = await client.rpc('search_marketplace_templates', {
+                'p_is_kortix_team': is_kortix_team,
+                'p_limit': FEATURED_CACHE_SIZE + 1
+            }).execute()
+            return result.data or []
+
+        rows = await Cache.get_or_load(_featured_cache_key(is_kortix_team), load, ttl=FEATURED_CACHE_TTL)
+        if limit is None and len(rows) > FEATURED_CACHE_SIZE:
+            return None
+        return rows[:limit] if limit is not None else rows
+    
+    @staticmethod
+    def _encode_marketplace_cursor(row: Dict[str, Any]) -> str:
+        values = [row.get('rank'), row.get('download_count'), row.get('marketplace_published_at'), row['template_id']]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+    
+    @staticmethod
+    def _decode_marketplace_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+        if not cursor:
+            return {}
+        try:
+            rank, download_count, published_at, template_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError) as e:
+            raise InvalidMarketplaceCursorError(f"Invalid marketplace cursor: {cursor}") from e
+        return {
+            'p_after_rank': rank or 0,
+            'p_after_download_count': download_count or 0,
+            'p_after_published_at': published_at,
+            'p_after_template_id': template_id
+        }
+    
+    async def invalidate_marketplace_cache(self) -> None:
+        for is_kortix_team in (None, True, False):
+            await Cache.invalidate(_featured_cache_key(is_kortix_team))
+    
     async def publish_template(self, template_id: str, creator_id: str) -> bool:
         logger.debug(f"Publishing template {template_id}")
         
@@ -340,6 +397,7 @@ class TemplateService:
         success = len(result.data) > 0
         if success:
             logger.debug(f"Published template {template_id}")
+            await self.invalidate_marketplace_cache()
         
         return success
     
@@ -358,6 +416,7 @@ class TemplateService:
         success = len(result.data) > 0
         if success:
             logger.debug(f"Unpublished template {template_id}")
+            await self.invalidate_marketplace_cache()
         
         return success
     
@@ -391,6 +450,7 @@ class TemplateService:
         success = len(result.data) > 0
         if success:
             logger.debug(f"Successfully deleted template {template_id}")
+            await self.invalidate_marketplace_cache()
         
         return success
     
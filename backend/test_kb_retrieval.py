@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Offline tests for knowledge base chunking and BM25 ranking.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from knowledge_base.retrieval import BM25Index, chunk_text, tokenize, CHARS_PER_TOKEN
+
+
+def test_short_text_is_single_chunk():
+    assert chunk_text("hello world") == ["hello world"]
+    assert chunk_text("   ") == []
+
+
+def test_chunks_overlap_and_cover_text():
+    paragraphs = [f"Paragraph {i} talks about topic{i} in some detail." for i in range(200)]
+    text = "\n\n".join(paragraphs)
+    chunks = chunk_text(text, chunk_tokens=50, overlap_tokens=10)
+
+    assert len(chunks) > 1
+    assert all(len(c) <= 50 * CHARS_PER_TOKEN for c in chunks)
+    assert chunks[0].startswith("Paragraph 0 ")
+    assert chunks[-1].endswith("topic199 in some detail.")
+    # Consecutive chunks share text
+    assert any(word in chunks[1] for word in chunks[0].split()[-5:])
+
+
+def test_bm25_ranks_matching_document_first():
+    index = BM25Index()
+    docs = [
+        "Refund policy: customers can request a refund within 30 days.",
+        "Shipping takes five business days within the country.",
+        "Our office is closed on public holidays.",
+    ]
+    for doc in docs:
+        index.add(tokenize(doc))
+
+    results = index.search(tokenize("how do I get a refund?"), limit=2)
+    assert results[0][0] == 0
+    assert index.search(tokenize("unrelated words"), limit=2) == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
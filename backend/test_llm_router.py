@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Offline tests for LLM routing, failover and hedging using the stub provider.
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services.llm_router import LLMRouter, AllDeploymentsFailed, StubProviderError
+
+
+def _router(**kwargs) -> LLMRouter:
+    router = LLMRouter(**kwargs)
+    router.register_group(["stub/primary", "stub/secondary"])
+    return router
+
+
+def _params(stream: bool):
+    return lambda model: {"model": model, "messages": [], "stream": stream}
+
+
+async def _collect(stream):
+    return [chunk.choices[0].delta.content async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_requested_deployment_is_primary_without_stats():
+    router = _router()
+    assert router.candidates("stub/primary", lambda _: True) == ["stub/primary", "stub/secondary"]
+    assert router.candidates("stub/primary", lambda m: m != "stub/secondary") == ["stub/primary"]
+
+
+@pytest.mark.asyncio
+async def test_failover_before_first_token():
+    router = _router()
+    router.stub.configure("stub/primary", fail=True)
+    router.stub.configure("stub/secondary", chunks=["ok"])
+
+    stream = await router.route("stub/primary", _params(stream=True))
+    assert await _collect(stream) == ["ok"]
+    assert router.stub.calls == ["stub/primary", "stub/secondary"]
+    assert router.stats_for("stub/primary").errors == 1
+    assert router.stats_for("stub/secondary").requests == 1
+
+
+@pytest.mark.asyncio
+async def test_request_errors_do_not_fail_over():
+    router = _router()
+    router.stub.configure("stub/primary", fail=True, fail_status=400)
+
+    with pytest.raises(StubProviderError):
+        await router.route("stub/primary", _params(stream=False))
+    assert router.stub.calls == ["stub/primary"]
+    assert router.stats_for("stub/primary").errors == 0
+
+
+@pytest.mark.asyncio
+async def test_all_deployments_failing_raises():
+    router = _router()
+    router.stub.configure("stub/primary", fail=True)
+    router.stub.configure("stub/secondary", fail=True)
+
+    with pytest.raises(AllDeploymentsFailed):
+        await router.route("stub/primary", _params(stream=False))
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_deployment_is_demoted():
+    router = _router()
+    for _ in range(3):
+        router.stats_for("stub/primary").record_failure()
+    assert router.candidates("stub/primary", lambda _: True)[0] == "stub/secondary"
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_when_primary_is_slow():
+    router = _router(hedging_enabled=True, hedge_default_delay=0.05)
+    router.stub.configure("stub/primary", ttft=1.0, chunks=["slow"])
+    router.stub.configure("stub/secondary", ttft=0.0, chunks=["fast"])
+
+    stream = await router.route("stub/primary", _params(stream=True))
+    assert await _collect(stream) == ["fast"]
+    assert router.stats_for("stub/secondary").requests == 1
+    await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_stats_track_ttft_for_completions():
+    router = _router()
+    router.stub.configure("stub/primary", ttft=0.01, chunks=["a", "b"])
+
+    response = await router.route("stub/primary", _params(stream=False))
+    assert response.choices[0].message.content == "ab"
+    stats = router.stats_for("stub/primary")
+    assert stats.requests == 1 and stats.ewma_ttft >= 0.01
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the in-process schedule index.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta, timezone
+
+from triggers.schedule_index import ScheduleIndex
+from triggers.trigger_service import Trigger, TriggerType
+
+
+def _schedule_trigger(trigger_id: str, agent_id: str) -> Trigger:
+    now = datetime.now(timezone.utc)
+    return Trigger(
+        trigger_id=trigger_id,
+        agent_id=agent_id,
+        provider_id="schedule",
+        trigger_type=TriggerType.SCHEDULE,
+        name="every minute",
+        description=None,
+        is_active=True,
+        config={"cron_expression": "* * * * *", "agent_prompt": "hi"},
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def test_upcoming_query_does_not_skip_due_fire():
+    index = ScheduleIndex()
+    index.upsert(_schedule_trigger("t1", "a1"))
+    schedule = index._schedules["t1"]
+    due = schedule.fire_after(datetime.now(timezone.utc) - timedelta(minutes=1))
+    schedule.next_fire = due
+    index._push(schedule)
+
+    upcoming = index.upcoming_for_agent("a1", limit=5)
+    now = datetime.now(timezone.utc)
+    assert upcoming[0][1] > now
+    assert schedule.next_fire == due
+
+    fired = index.pop_due(now)
+    assert [(s.trigger_id, t) for s, t in fired] == [("t1", due)]
@@ -7,6 +7,7 @@ import uuid
 from datetime import datetime, timezone
 import json
 import hmac
+import functools
 
 from services.supabase import DBConnection
 from utils.auth_utils import get_current_user_id_from_jwt
@@ -18,7 +19,14 @@ from services.billing import check_billing_status, can_use_model
 from .trigger_service import get_trigger_service, TriggerType
 from .provider_service import get_provider_service
 from .execution_service import get_execution_service
-from .utils import get_next_run_time, get_human_readable_schedule
+from .webhook_queue import (
+    check_rate_limit, claim_delivery, release_delivery,
+    derive_idempotency_key, enqueue_webhook_event, new_event_id
+)
+from .schedule_index import schedule_index
+from .utils import get_human_readable_schedule
+
+_human_readable_schedule = functools.lru_cache(maxsize=1024)(get_human_readable_schedule)
 
 
 # ===== ROUTERS =====
@@ -306,56 +314,25 @@ async def get_agent_upcoming_runs(
     await verify_agent_access(agent_id, user_id)
     
     try:
-        trigger_service = get_trigger_service(db)
-        triggers = await trigger_service.get_agent_triggers(agent_id)
-        
-        # Filter for active schedule triggers
-        schedule_triggers = [
-            trigger for trigger in triggers 
-            if trigger.is_active and trigger.trigger_type == TriggerType.SCHEDULE
-        ]
+        await schedule_index.ensure_loaded(db)
         
         upcoming_runs = []
-        for trigger in schedule_triggers:
-            config = trigger.config
-            cron_expression = config.get('cron_expression')
-            user_timezone = config.get('timezone', 'UTC')
-            
-            if not cron_expression:
-                continue
-                
-            try:
-                next_run = get_next_run_time(cron_expression, user_timezone)
-                if not next_run:
-                    continue
-                
-                import pytz
-                local_tz = pytz.timezone(user_timezone)
-                next_run_local = next_run.astimezone(local_tz)
-                
-                human_readable = get_human_readable_schedule(cron_expression, user_timezone)
-                
-                upcoming_runs.append(UpcomingRun(
-                    trigger_id=trigger.trigger_id,
-                    trigger_name=trigger.name,
-                    trigger_type=trigger.trigger_type.value,
-                    next_run_time=next_run.isoformat(),
-                    next_run_time_local=next_run_local.isoformat(),
-                    timezone=user_timezone,
-                    cron_expression=cron_expression,
-                    execution_type=config.get('execution_type', 'agent'),
-                    agent_prompt=config.get('agent_prompt'),
-                    workflow_id=config.get('workflow_id'),
-                    is_active=trigger.is_active,
-                    human_readable=human_readable
-                ))
-                
-            except Exception as e:
-                logger.warning(f"Error calculating next run for trigger {trigger.trigger_id}: {e}")
-                continue
-        
-        upcoming_runs.sort(key=lambda x: x.next_run_time)
-        upcoming_runs = upcoming_runs[:limit]
+        for schedule, next_run in schedule_index.upcoming_for_agent(agent_id, limit):
+            config = schedule.config
+            upcoming_runs.append(UpcomingRun(
+                trigger_id=schedule.trigger_id,
+                trigger_name=schedule.name,
+                trigger_type=TriggerType.SCHEDULE.value,
+                next_run_time=next_run.isoformat(),
+                next_run_time_local=next_run.astimezone(schedule.tz).isoformat(),
+                timezone=schedule.timezone,
+                cron_expression=schedule.cron_expression,
+                execution_type=config.get('execution_type', 'agent'),
+                agent_prompt=config.get('agent_prompt'),
+                workflow_id=config.get('workflow_id'),
+                is_active=True,
+                human_readable=_human_readable_schedule(schedule.cron_expression, schedule.timezone)
+            ))
         
         return UpcomingRunsResponse(
             upcoming_runs=upcoming_runs,
@@ -572,68 +549,57 @@ async def trigger_webhook(
             raise HTTPException(status_code=401, detail="Unauthorized")
 
         # Get raw data from request
+        body = await request.body()
         raw_data = {}
         try:
-            raw_data = await request.json()
+            raw_data = json.loads(body) if body else {}
         except:
             pass
         
-        # Process trigger event
         trigger_service = get_trigger_service(db)
-        result = await trigger_service.process_trigger_event(trigger_id, raw_data)
-        
-        if not result.success:
+        trigger = await trigger_service.get_trigger(trigger_id)
+        if not trigger:
+            raise HTTPException(status_code=404, detail="Trigger not found")
+        if not trigger.is_active:
             return JSONResponse(
                 status_code=400,
-                content={"success": False, "error": result.error_message}
+                content={"success": False, "error": f"Trigger is inactive: {trigger_id}"}
+            )
+        
+        retry_after = await check_rate_limit(trigger_id)
+        if retry_after is not None:
+            logger.warning(f"Webhook rate limit exceeded for trigger {trigger_id}")
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+                content={"success": False, "error": "Rate limit exceeded"}
             )
         
-        # Execute if needed
-        if result.should_execute_agent or result.should_execute_workflow:
-            trigger = await trigger_service.get_trigger(trigger_id)
-            if trigger:
-                logger.debug(f"Executing agent {trigger.agent_id} for trigger {trigger_id}")
-                
-                from .trigger_service import TriggerEvent
-                event = TriggerEvent(
-                    trigger_id=trigger_id,
-                    agent_id=trigger.agent_id,
-                    trigger_type=trigger.trigger_type,
-                    raw_data=raw_data
-                )
-                
-                execution_service = get_execution_service(db)
-                execution_result = await execution_service.execute_trigger_result(
-                    agent_id=trigger.agent_id,
-                    trigger_result=result,
-                    trigger_event=event
-                )
-                
-                logger.debug(f"Agent execution result: {execution_result}")
-                
-                return JSONResponse(content={
-                    "success": True,
-                    "message": "Trigger processed and agent execution started",
-                    "execution": execution_result,
-                    "trigger_result": {
-                        "should_execute_agent": result.should_execute_agent,
-                        "should_execute_workflow": result.should_execute_workflow,
-                        "agent_prompt": result.agent_prompt
-                    }
-                })
-            else:
-                logger.warning(f"Trigger {trigger_id} not found for execution")
-        
-        logger.debug(f"Webhook processed but no execution needed")
-        return JSONResponse(content={
+        idempotency_key = derive_idempotency_key(request.headers)
+        event_id = idempotency_key or new_event_id()
+        if idempotency_key and not await claim_delivery(trigger_id, event_id):
+            logger.debug(f"Duplicate webhook delivery {event_id} for trigger {trigger_id}")
+            return JSONResponse(content={
+                "success": True,
+                "duplicate": True,
+                "event_id": event_id
+            })
+        
+        try:
+            enqueue_webhook_event(trigger_id, raw_data, event_id)
+        except Exception:
+            if idempotency_key:
+                await release_delivery(trigger_id, event_id)
+            raise
+        
+        return JSONResponse(status_code=202, content={
             "success": True,
-            "message": "Trigger processed successfully (no execution needed)",
-            "trigger_result": {
-                "should_execute_agent": result.should_execute_agent,
-                "should_execute_workflow": result.should_execute_workflow
-            }
+            "message": "Trigger event accepted for processing",
+            "event_id": event_id
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing webhook trigger: {e}")
         return JSONResponse(
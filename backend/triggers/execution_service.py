@@ -8,6 +8,8 @@ from services import redis
 from utils.logger import logger, structlog
 from utils.config import config
 from run_agent_background import run_agent_background
+from agentpress import latest_messages
+from agent.config_snapshot import get_agent_config_snapshot
 from .trigger_service import TriggerEvent, TriggerResult
 from .utils import format_workflow_for_llm
 
@@ -221,85 +223,13 @@ class AgentExecutor:
     
     async def _get_agent_config(self, agent_id: str) -> Dict[str, Any]:
         try:
-            logger.debug(f"Getting agent config for agent_id: {agent_id}")
-            
-            client = await self._db.client
-            agent_result = await client.table('agents').select('account_id, name, current_version_id').eq('agent_id', agent_id).execute()
-            
-            if not agent_result.data:
+            agent_config = await get_agent_config_snapshot(agent_id)
+            if not agent_config:
                 logger.error(f"Agent not found in database: {agent_id}")
                 return None
-            
-            agent_data = agent_result.data[0]
-            account_id = agent_data.get('account_id')
-            current_version_id = agent_data.get('current_version_id')
-            logger.debug(f"Found agent in database: {agent_data.get('name')}, account_id: {account_id}, current_version_id: {current_version_id}")
-            
-            if not current_version_id:
+            if not agent_config.get('current_version_id'):
                 logger.error(f"Agent {agent_id} has no current_version_id set. This is likely the cause of the fallback to default prompt.")
-                return {
-                    'agent_id': agent_id,
-                    'account_id': agent_data.get('account_id'),
-                    'name': agent_data.get('name', 'Unknown Agent'),
-                    'system_prompt': 'You are a helpful AI assistant.',
-                    'configured_mcps': [],
-                    'custom_mcps': [],
-                    'agentpress_tools': {},
-                }
-            
-            from agent.versioning.version_service import get_version_service
-            version_service = await get_version_service()
-            
-            user_id_for_version = account_id if account_id else "system"
-            
-            try:
-                version = await version_service.get_version(agent_id, current_version_id, user_id_for_version)
-                logger.debug(f"Successfully retrieved version {current_version_id} for agent {agent_id}: {version.version_name}")
-                
-                return {
-                    'agent_id': agent_id,
-                    'account_id': agent_data.get('account_id'),
-                    'name': agent_data.get('name', 'Unknown Agent'),
-                    'system_prompt': version.system_prompt,
-                    'model': version.model,
-                    'configured_mcps': version.configured_mcps,
-                    'custom_mcps': version.custom_mcps,
-                    'agentpress_tools': version.agentpress_tools if isinstance(version.agentpress_tools, dict) else {},
-                    'current_version_id': version.version_id,
-                    'version_name': version.version_name
-                }
-                
-            except Exception as version_error:
-                logger.error(f"Failed to get version {current_version_id} for agent {agent_id}: {type(version_error).__name__}: {version_error}")
-                if user_id_for_version != "system":
-                    try:
-                        version = await version_service.get_version(agent_id, current_version_id, "system")
-                        return {
-                            'agent_id': agent_id,
-                            'account_id': agent_data.get('account_id'),
-                            'name': agent_data.get('name', 'Unknown Agent'),
-                            'system_prompt': version.system_prompt,
-                            'model': version.model,
-                            'configured_mcps': version.configured_mcps,
-                            'custom_mcps': version.custom_mcps,
-                            'agentpress_tools': version.agentpress_tools if isinstance(version.agentpress_tools, dict) else {},
-                            'current_version_id': version.version_id,
-                            'version_name': version.version_name
-                        }
-                        
-                    except Exception as system_version_error:
-                        logger.error(f"Failed to get version {current_version_id} with system user for agent {agent_id}: {type(system_version_error).__name__}: {system_version_error}")
-                
-                logger.error(f"Unable to retrieve version {current_version_id} for agent {agent_id}. Using fallback configuration.")
-                return {
-                    'agent_id': agent_id,
-                    'account_id': agent_data.get('account_id'),
-                    'name': agent_data.get('name', 'Unknown Agent'),
-                    'system_prompt': 'You are a helpful AI assistant.',
-                    'configured_mcps': [],
-                    'custom_mcps': [],
-                    'agentpress_tools': {},
-                }
+            return agent_config
             
         except Exception as e:
             logger.error(f"Failed to get agent config using versioning system for agent {agent_id}: {e}", exc_info=True)
@@ -343,7 +273,7 @@ class AgentExecutor:
 
         message_payload = {"role": "user", "content": rendered_content}
         
-        await client.table('messages').insert({
+        message_result = await client.table('messages').insert({
             "message_id": str(uuid.uuid4()),
             "thread_id": thread_id,
             "type": "user",
@@ -351,6 +281,8 @@ class AgentExecutor:
             "content": json.dumps(message_payload),
             "created_at": datetime.now(timezone.utc).isoformat()
         }).execute()
+        if message_result.data:
+            await latest_messages.record_message(thread_id, message_result.data[0])
     
     async def _start_agent_execution(
         self,
@@ -498,34 +430,13 @@ class WorkflowExecutor:
     async def _get_agent_data(self, agent_id: str) -> Tuple[Dict[str, Any], str]:
         
         try:
-            client = await self._db.client
-            agent_result = await client.table('agents').select('account_id, name').eq('agent_id', agent_id).execute()
-            if not agent_result.data:
+            agent_config = await get_agent_config_snapshot(agent_id)
+            if not agent_config:
                 raise ValueError(f"Agent {agent_id} not found")
-            
-            agent_data = agent_result.data[0]
-            account_id = agent_data['account_id']
-            
-            from agent.versioning.version_service import get_version_service
-            version_service = await get_version_service()
-            
-            active_version = await version_service.get_active_version(agent_id, "system")
-            if not active_version:
+            if not agent_config.get('current_version_id'):
                 raise ValueError(f"No active version found for agent {agent_id}")
             
-            agent_config = {
-                'agent_id': agent_id,
-                'name': agent_data.get('name', 'Unknown Agent'),
-                'system_prompt': active_version.system_prompt,
-                'model': active_version.model,
-                'configured_mcps': active_version.configured_mcps,
-                'custom_mcps': active_version.custom_mcps,
-                'agentpress_tools': active_version.agentpress_tools if isinstance(active_version.agentpress_tools, dict) else {},
-                'current_version_id': active_version.version_id,
-                'version_name': active_version.version_name
-            }
-            
-            return agent_config, account_id
+            return agent_config, agent_config['account_id']
             
         except Exception as e:
             raise ValueError(f"Failed to get agent configuration: {str(e)}")
@@ -628,7 +539,7 @@ class WorkflowExecutor:
                 ctx_json = str(event_context)
             message_content = f"{message_content}\n\n---\nContext\n{ctx_json}"
         
-        await client.table('messages').insert({
+        message_result = await client.table('messages').insert({
             "message_id": str(uuid.uuid4()),
             "thread_id": thread_id,
             "type": "user",
@@ -636,6 +547,8 @@ class WorkflowExecutor:
             "content": json.dumps({"role": "user", "content": message_content}),
             "created_at": datetime.now(timezone.utc).isoformat()
         }).execute()
+        if message_result.data:
+            await latest_messages.record_message(thread_id, message_result.data[0])
     
     async def _start_workflow_agent_execution(
         self,
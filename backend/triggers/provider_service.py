@@ -78,6 +78,13 @@ class ScheduleProvider(TriggerProvider):
         return config
     
     async def setup_trigger(self, trigger: Trigger) -> bool:
+        if config.SCHEDULE_DISPATCHER_ENABLED:
+            # Fired by the in-process dispatcher (triggers/schedule_index.py) instead of Supabase Cron;
+            # drop any cron job left from before so the schedule does not fire twice
+            if await self.teardown_trigger(trigger):
+                trigger.config.pop('cron_job_name', None)
+                trigger.config.pop('cron_job_id', None)
+            return True
         try:
             webhook_url = f"{self._webhook_base_url}/api/triggers/{trigger.trigger_id}/webhook"
             cron_expression = trigger.config['cron_expression']
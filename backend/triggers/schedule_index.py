@@ -0,0 +1,429 @@
+"""
+In-process index of scheduled triggers.
+
+Cron expressions of all active schedule triggers are compiled once and kept in
+a min-heap ordered by next fire time (UTC). Upcoming-runs queries are answered
+from the precomputed fire times; a schedule is only re-evaluated once its fire
+time has passed or its trigger changes.
+
+Expressions are evaluated in the trigger's own timezone and converted to UTC,
+which matches ``get_next_run_time`` and stays correct across DST changes
+(``ScheduleProvider._convert_cron_to_utc`` only rewrites fixed hour/minute
+schedules for Supabase Cron).
+
+When ``SCHEDULE_DISPATCHER_ENABLED`` is set, one API instance (elected through
+a Redis lease) also fires due schedules itself through the trigger webhook
+queue instead of relying on Supabase Cron. Fires are at-least-once: the last
+fire per trigger is persisted so a new leader catches up on missed runs, and a
+per-fire idempotency key drops duplicates. The first time an instance leads it
+unschedules the Supabase Cron jobs of indexed triggers, so schedules created
+before the dispatcher was enabled are not fired by both.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import croniter
+import pytz
+
+from services import redis
+from services.supabase import DBConnection
+from utils.logger import logger
+
+from .trigger_service import Trigger, TriggerType
+
+INDEX_MAX_AGE_SECONDS = 300
+CHANGES_CHANNEL = "schedule_index:changes"
+LEADER_KEY = "schedule_dispatcher:leader"
+LAST_FIRE_KEY = "schedule_dispatcher:last_fire"
+LEADER_LEASE_SECONDS = 15
+DISPATCH_TICK_SECONDS = 1.0
+CATCH_UP_WINDOW_SECONDS = 15 * 60
+PAGE_SIZE = 1000
+CRON_UNSCHEDULE_CONCURRENCY = 10
+
+# Renew / release the lease only if this instance still holds it
+_RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class CompiledSchedule:
+    __slots__ = ("trigger_id", "agent_id", "name", "cron_expression", "timezone", "config", "tz", "next_fire")
+
+    def __init__(self, trigger_id: str, agent_id: str, name: str, trigger_config: Dict[str, Any]):
+        self.trigger_id = trigger_id
+        self.agent_id = agent_id
+        self.name = name
+        self.config = trigger_config
+        self.cron_expression = trigger_config['cron_expression']
+        self.timezone = trigger_config.get('timezone', 'UTC')
+        self.tz = pytz.timezone(self.timezone)
+        # Validate eagerly so bad expressions are dropped at compile time
+        croniter.croniter(self.cron_expression)
+        self.next_fire = self.fire_after(datetime.now(timezone.utc))
+
+    def fire_after(self, after: datetime) -> datetime:
+        """First fire time strictly after ``after`` (UTC in, UTC out)."""
+        local = after.astimezone(self.tz)
+        return croniter.croniter(self.cron_expression, local).get_next(datetime).astimezone(timezone.utc)
+
+    def fires_between(self, start: datetime, end: datetime, limit: int = 100) -> List[datetime]:
+        fires = []
+        cursor = start
+        while len(fires) < limit:
+            cursor = self.fire_after(cursor)
+            if cursor > end:
+                break
+            fires.append(cursor)
+        return fires
+
+
+class ScheduleIndex:
+    def __init__(self):
+        self._schedules: Dict[str, CompiledSchedule] = {}
+        self._by_agent: Dict[str, set] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._loaded_at = 0.0
+        self._load_lock = asyncio.Lock()
+        self._db: Optional[DBConnection] = None
+        self._instance_id = uuid.uuid4().hex[:12]
+        self._listener_task: Optional[asyncio.Task] = None
+        self._dispatcher_task: Optional[asyncio.Task] = None
+        self._cron_jobs_retired = False
+
+    # -- index maintenance -------------------------------------------------
+
+    def _push(self, schedule: CompiledSchedule):
+        heapq.heappush(self._heap, (schedule.next_fire.timestamp(), next(self._seq), schedule.trigger_id))
+
+    def _compile(self, trigger_id: str, agent_id: str, name: str, trigger_config: Dict[str, Any]) -> Optional[CompiledSchedule]:
+        if not trigger_config.get('cron_expression'):
+            return None
+        try:
+            return CompiledSchedule(trigger_id, agent_id, name, trigger_config)
+        except Exception as e:
+            logger.warning(f"Skipping schedule trigger {trigger_id} with invalid schedule: {e}")
+            return None
+
+    def upsert(self, trigger: Trigger):
+        """Add, replace or drop a trigger depending on whether it is an active schedule."""
+        self.remove(trigger.trigger_id)
+        if trigger.trigger_type != TriggerType.SCHEDULE or not trigger.is_active:
+            return
+        schedule = self._compile(trigger.trigger_id, trigger.agent_id, trigger.name, trigger.config)
+        if schedule:
+            self._schedules[schedule.trigger_id] = schedule
+            self._by_agent.setdefault(schedule.agent_id, set()).add(schedule.trigger_id)
+            self._push(schedule)
+
+    def remove(self, trigger_id: str):
+        # Heap entries of removed schedules are discarded lazily
+        schedule = self._schedules.pop(trigger_id, None)
+        if schedule:
+            agent_triggers = self._by_agent.get(schedule.agent_id)
+            if agent_triggers:
+                agent_triggers.discard(trigger_id)
+                if not agent_triggers:
+                    del self._by_agent[schedule.agent_id]
+
+    def _rebuild(self, rows: List[Dict[str, Any]]):
+        schedules = {}
+        by_agent: Dict[str, set] = {}
+        for row in rows:
+            trigger_config = {k: v for k, v in (row.get('config') or {}).items() if k != 'provider_id'}
+            schedule = self._compile(row['trigger_id'], row['agent_id'], row.get('name', ''), trigger_config)
+            if schedule:
+                previous = self._schedules.get(schedule.trigger_id)
+                if previous and (previous.cron_expression, previous.timezone) == (schedule.cron_expression, schedule.timezone):
+                    # Keep a pending fire that a reload would otherwise skip past
+                    schedule.next_fire = min(schedule.next_fire, previous.next_fire)
+                schedules[schedule.trigger_id] = schedule
+                by_agent.setdefault(schedule.agent_id, set()).add(schedule.trigger_id)
+        self._schedules = schedules
+        self._by_agent = by_agent
+        self._heap = [(s.next_fire.timestamp(), next(self._seq), s.trigger_id) for s in schedules.values()]
+        heapq.heapify(self._heap)
+        self._loaded_at = time.monotonic()
+
+    async def load(self, db: DBConnection):
+        """Compile every active schedule trigger."""
+        self._db = db
+        client = await db.client
+        rows = []
+        offset = 0
+        while True:
+            page = await client.table('agent_triggers').select(
+                'trigger_id, agent_id, name, config'
+            ).eq('trigger_type', TriggerType.SCHEDULE.value).eq('is_active', True).order(
+                'trigger_id'
+            ).range(offset, offset + PAGE_SIZE - 1).execute()
+            rows.extend(page.data or [])
+            if len(page.data or []) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+        self._rebuild(rows)
+        logger.debug(f"Schedule index loaded {len(self._schedules)} schedule triggers")
+
+    async def ensure_loaded(self, db: DBConnection):
+        if time.monotonic() - self._loaded_at < INDEX_MAX_AGE_SECONDS:
+            return
+        async with self._load_lock:
+            if time.monotonic() - self._loaded_at >= INDEX_MAX_AGE_SECONDS:
+                await self.load(db)
+        self._ensure_listener()
+
+    def _advance(self, schedule: CompiledSchedule, now: datetime):
+        if schedule.next_fire <= now:
+            schedule.next_fire = schedule.fire_after(now)
+            self._push(schedule)
+
+    # -- queries -----------------------------------------------------------
+
+    def upcoming_for_agent(self, agent_id: str, limit: int) -> List[Tuple[CompiledSchedule, datetime]]:
+        now = datetime.now(timezone.utc)
+        schedules = [self._schedules[t] for t in self._by_agent.get(agent_id, ()) if t in self._schedules]
+        # Read-only: a past next_fire may still be awaiting dispatch by pop_due
+        upcoming = [(s, s.next_fire if s.next_fire > now else s.fire_after(now)) for s in schedules]
+        upcoming.sort(key=lambda item: item[1])
+        return upcoming[:limit]
+
+    def upcoming(self, limit: int) -> List[Tuple[CompiledSchedule, datetime]]:
+        """Next fires across all triggers, read off the heap (stale entries skipped)."""
+        live = (
+            entry for entry in self._heap
+            if entry[2] in self._schedules and self._schedules[entry[2]].next_fire.timestamp() == entry[0]
+        )
+        return [(self._schedules[t], self._schedules[t].next_fire) for _, _, t in heapq.nsmallest(limit, live)]
+
+    def pop_due(self, now: datetime) -> List[Tuple[CompiledSchedule, datetime]]:
+        """Remove and return every (schedule, fire_time) due at ``now``, rescheduling each."""
+        due = []
+        now_ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= now_ts:
+            fire_ts, _, trigger_id = heapq.heappop(self._heap)
+            schedule = self._schedules.get(trigger_id)
+            if not schedule or schedule.next_fire.timestamp() != fire_ts:
+                continue
+            due.append((schedule, schedule.next_fire))
+            schedule.next_fire = schedule.fire_after(schedule.next_fire)
+            self._push(schedule)
+        return due
+
+    def seconds_until_next(self, now: datetime) -> Optional[float]:
+        while self._heap:
+            fire_ts, _, trigger_id = self._heap[0]
+            schedule = self._schedules.get(trigger_id)
+            if schedule and schedule.next_fire.timestamp() == fire_ts:
+                return max(0.0, fire_ts - now.timestamp())
+            heapq.heappop(self._heap)
+        return None
+
+    def __len__(self):
+        return len(self._schedules)
+
+    # -- cross-instance invalidation ---------------------------------------
+
+    async def notify_changed(self, trigger: Trigger):
+        """Apply a trigger change locally and tell other instances to pick it up."""
+        self.upsert(trigger)
+        try:
+            await redis.publish(CHANGES_CHANNEL, json.dumps({"trigger_id": trigger.trigger_id, "origin": self._instance_id}))
+        except Exception as e:
+            logger.warning(f"Failed to publish schedule change for trigger {trigger.trigger_id}: {e}")
+
+    async def notify_deleted(self, trigger_id: str):
+        self.remove(trigger_id)
+        try:
+            await redis.publish(CHANGES_CHANNEL, json.dumps({"trigger_id": trigger_id, "origin": self._instance_id}))
+        except Exception as e:
+            logger.warning(f"Failed to publish schedule removal for trigger {trigger_id}: {e}")
+
+    def _ensure_listener(self):
+        task = self._listener_task
+        if task is not None and not task.done():
+            return
+        try:
+            self._listener_task = asyncio.get_running_loop().create_task(self._listen_for_changes())
+        except RuntimeError:
+            pass
+
+    async def _refresh_trigger(self, trigger_id: str):
+        if not self._db:
+            return
+        from .trigger_service import get_trigger_service
+        trigger = await get_trigger_service(self._db).get_trigger(trigger_id)
+        if trigger:
+            self.upsert(trigger)
+        else:
+            self.remove(trigger_id)
+
+    async def _listen_for_changes(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = await redis.create_pubsub()
+                await pubsub.subscribe(CHANGES_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get("origin") != self._instance_id and payload.get("trigger_id"):
+                        await self._refresh_trigger(payload["trigger_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Schedule index listener error, reloading: {e}")
+                self._loaded_at = 0.0
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    # -- dispatcher --------------------------------------------------------
+
+    async def _hold_leadership(self) -> bool:
+        client = await redis.get_client()
+        if await client.set(LEADER_KEY, self._instance_id, nx=True, ex=LEADER_LEASE_SECONDS):
+            logger.info(f"Schedule dispatcher leadership acquired by {self._instance_id}")
+            return True
+        return bool(await client.eval(_RENEW_LEASE_SCRIPT, 1, LEADER_KEY, self._instance_id, LEADER_LEASE_SECONDS))
+
+    async def _retire_cron_jobs(self, db: DBConnection):
+        """Unschedule the Supabase Cron jobs of indexed triggers, which the dispatcher now fires."""
+        client = await db.client
+        semaphore = asyncio.Semaphore(CRON_UNSCHEDULE_CONCURRENCY)
+
+        async def unschedule(schedule: CompiledSchedule) -> bool:
+            job_name = schedule.config.get('cron_job_name') or f"trigger_{schedule.trigger_id}"
+            async with semaphore:
+                try:
+                    await client.rpc("unschedule_job_by_name", {"job_name": job_name}).execute()
+                    return True
+                except Exception as e:
+                    logger.warning(f"Failed to unschedule Supabase Cron job '{job_name}': {e}")
+                    return False
+
+        results = await asyncio.gather(*(unschedule(s) for s in list(self._schedules.values())))
+        self._cron_jobs_retired = all(results)
+        logger.info(f"Unscheduled Supabase Cron jobs for {sum(results)} of {len(results)} schedule triggers")
+
+    async def _fire(self, schedule: CompiledSchedule, fire_time: datetime):
+        from .webhook_queue import claim_delivery, enqueue_webhook_event, release_delivery
+        event_id = f"schedule:{int(fire_time.timestamp())}"
+        if not await claim_delivery(schedule.trigger_id, event_id):
+            return
+        payload = {
+            "trigger_id": schedule.trigger_id,
+            "agent_id": schedule.agent_id,
+            "execution_type": schedule.config.get('execution_type', 'agent'),
+            "agent_prompt": schedule.config.get('agent_prompt'),
+            "workflow_id": schedule.config.get('workflow_id'),
+            "workflow_input": schedule.config.get('workflow_input', {}),
+            "timestamp": fire_time.isoformat()
+        }
+        try:
+            enqueue_webhook_event(schedule.trigger_id, payload, event_id)
+        except Exception:
+            # Let the next leader's catch-up retry this fire
+            await release_delivery(schedule.trigger_id, event_id)
+            raise
+        client = await redis.get_client()
+        await client.hset(LAST_FIRE_KEY, schedule.trigger_id, fire_time.timestamp())
+
+    async def _catch_up(self, now: datetime):
+        """Fire runs missed while no leader was active, within the catch-up window."""
+        client = await redis.get_client()
+        last_fires = await client.hgetall(LAST_FIRE_KEY)
+        window_start = now.timestamp() - CATCH_UP_WINDOW_SECONDS
+        for raw_trigger_id, raw_ts in last_fires.items():
+            trigger_id = raw_trigger_id.decode() if isinstance(raw_trigger_id, bytes) else raw_trigger_id
+            schedule = self._schedules.get(trigger_id)
+            if not schedule:
+                continue
+            start = datetime.fromtimestamp(max(float(raw_ts), window_start), timezone.utc)
+            for fire_time in schedule.fires_between(start, now):
+                await self._fire(schedule, fire_time)
+
+    async def _dispatch_loop(self, db: DBConnection):
+        is_leader = False
+        last_lease_check = 0.0
+        while True:
+            try:
+                await self.ensure_loaded(db)
+                now = datetime.now(timezone.utc)
+                if time.monotonic() - last_lease_check >= LEADER_LEASE_SECONDS / 3:
+                    was_leader = is_leader
+                    is_leader = await self._hold_leadership()
+                    last_lease_check = time.monotonic()
+                    if is_leader and not was_leader:
+                        # Fires scheduled before we led are in the past; start from now after catching up
+                        for schedule in self._schedules.values():
+                            self._advance(schedule, now)
+                        if not self._cron_jobs_retired:
+                            await self._retire_cron_jobs(db)
+                        await self._catch_up(now)
+
+                if is_leader:
+                    for schedule, fire_time in self.pop_due(now):
+                        try:
+                            await self._fire(schedule, fire_time)
+                        except Exception as e:
+                            logger.error(f"Failed to dispatch schedule {schedule.trigger_id} at {fire_time}: {e}")
+
+                    wait = self.seconds_until_next(datetime.now(timezone.utc))
+                    await asyncio.sleep(min(wait if wait is not None else DISPATCH_TICK_SECONDS, DISPATCH_TICK_SECONDS))
+                else:
+                    await asyncio.sleep(LEADER_LEASE_SECONDS / 3)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Schedule dispatcher error: {e}")
+                is_leader = False
+                await asyncio.sleep(DISPATCH_TICK_SECONDS * 5)
+
+    async def start_dispatcher(self, db: DBConnection):
+        if self._dispatcher_task is None or self._dispatcher_task.done():
+            self._dispatcher_task = asyncio.create_task(self._dispatch_loop(db))
+            logger.info("Started in-process schedule dispatcher")
+
+    async def stop(self):
+        for task in (self._dispatcher_task, self._listener_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._dispatcher_task = None
+        self._listener_task = None
+        try:
+            client = await redis.get_client()
+            await client.eval(_RELEASE_LEASE_SCRIPT, 1, LEADER_KEY, self._instance_id)
+        except Exception:
+            pass
+
+
+schedule_index = ScheduleIndex()
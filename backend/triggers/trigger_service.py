@@ -89,6 +89,7 @@ class TriggerService:
             raise ValueError(f"Failed to setup trigger with provider: {provider_id}")
         
         await self._save_trigger(trigger)
+        await self._notify_schedule_index(trigger)
         
         logger.debug(f"Created trigger {trigger_id} for agent {agent_id}")
         return trigger
@@ -164,6 +165,7 @@ class TriggerService:
                     await provider_service.teardown_trigger(trigger)
         
         await self._update_trigger(trigger)
+        await self._notify_schedule_index(trigger)
         
         logger.debug(f"Updated trigger {trigger_id}")
         return trigger
@@ -191,6 +193,9 @@ class TriggerService:
         
         success = len(result.data) > 0
         if success:
+            if trigger.trigger_type == TriggerType.SCHEDULE:
+                from .schedule_index import schedule_index
+                await schedule_index.notify_deleted(trigger_id)
             logger.debug(f"Deleted trigger {trigger_id}")
         
         return success
@@ -221,6 +226,12 @@ class TriggerService:
         
         return result
     
+    async def _notify_schedule_index(self, trigger: Trigger) -> None:
+        if trigger.trigger_type != TriggerType.SCHEDULE:
+            return
+        from .schedule_index import schedule_index
+        await schedule_index.notify_changed(trigger)
+    
     async def _save_trigger(self, trigger: Trigger) -> None:
         client = await self._db.client
         
@@ -0,0 +1,140 @@
+"""
+Queued webhook ingestion for triggers.
+
+Webhook handlers only validate the request, drop duplicate deliveries
+(by the sender's delivery id, held in Redis), apply a per-trigger rate limit and enqueue
+the event on the ``trigger_webhooks`` dramatiq queue. Workers then run
+``process_trigger_event`` and ``execute_trigger_result`` (project, thread,
+sandbox and agent-run setup) outside the HTTP request.
+"""
+
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from services import redis
+from services.supabase import DBConnection
+from utils.config import config
+from utils.logger import logger
+
+from .trigger_service import get_trigger_service, TriggerEvent, TriggerType
+from .execution_service import get_execution_service
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+RATE_LIMIT_WINDOW_SECONDS = 60
+
+_IDEMPOTENCY_HEADERS = ("idempotency-key", "x-idempotency-key", "webhook-id", "x-webhook-id", "x-request-id")
+
+
+def derive_idempotency_key(headers: Dict[str, str]) -> Optional[str]:
+    """
+    The sender's delivery id, or None when the delivery should not be deduplicated.
+
+    Payload ids and body digests are deliberately not used: payload ids usually
+    name the resource an event is about, and Supabase Cron posts the same body
+    on every fire of a schedule.
+    """
+    if headers.get("x-trigger-source") == "schedule":
+        return None
+    for header in _IDEMPOTENCY_HEADERS:
+        value = headers.get(header)
+        if value:
+            return value
+    return None
+
+
+def new_event_id() -> str:
+    """Event id for deliveries that carry no delivery id of their own."""
+    return uuid.uuid4().hex
+
+
+async def claim_delivery(trigger_id: str, idempotency_key: str) -> bool:
+    """Return False if this delivery was already accepted for the trigger."""
+    key = f"trigger_webhook:seen:{trigger_id}:{idempotency_key}"
+    return bool(await redis.set(key, "1", ex=IDEMPOTENCY_TTL_SECONDS, nx=True))
+
+
+async def release_delivery(trigger_id: str, idempotency_key: str):
+    """Forget a claimed delivery so the sender's retry is accepted (used when enqueueing fails)."""
+    try:
+        await redis.delete(f"trigger_webhook:seen:{trigger_id}:{idempotency_key}")
+    except Exception as e:
+        logger.warning(f"Failed to release webhook delivery {idempotency_key} for trigger {trigger_id}: {e}")
+
+
+async def check_rate_limit(trigger_id: str) -> Optional[int]:
+    """
+    Count a delivery against the trigger's per-minute budget.
+
+    Returns None when allowed, otherwise the seconds until the window resets.
+    """
+    limit = config.TRIGGER_WEBHOOK_RATE_LIMIT_PER_MINUTE
+    if not limit or limit <= 0:
+        return None
+    window = int(time.time() // RATE_LIMIT_WINDOW_SECONDS)
+    key = f"trigger_webhook:rate:{trigger_id}:{window}"
+    client = await redis.get_client()
+    pipe = client.pipeline(transaction=False)
+    pipe.incr(key)
+    pipe.expire(key, RATE_LIMIT_WINDOW_SECONDS * 2)
+    count, _ = await pipe.execute()
+    if count > limit:
+        return RATE_LIMIT_WINDOW_SECONDS - int(time.time() % RATE_LIMIT_WINDOW_SECONDS)
+    return None
+
+
+def enqueue_webhook_event(
+    trigger_id: str,
+    payload: Dict[str, Any],
+    event_id: str,
+    trigger_type: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+):
+    from run_agent_background import process_trigger_webhook
+    process_trigger_webhook.send(
+        trigger_id=trigger_id,
+        payload=payload,
+        event_id=event_id,
+        trigger_type=trigger_type,
+        context=context,
+    )
+
+
+async def process_queued_webhook(
+    db: DBConnection,
+    trigger_id: str,
+    payload: Dict[str, Any],
+    trigger_type: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Consumer side: evaluate the trigger event and start the agent or workflow run."""
+    trigger_service = get_trigger_service(db)
+    result = await trigger_service.process_trigger_event(trigger_id, payload)
+
+    if not result.success:
+        logger.warning(f"Queued webhook for trigger {trigger_id} rejected: {result.error_message}")
+        return {"success": False, "error": result.error_message}
+
+    if not (result.should_execute_agent or result.should_execute_workflow):
+        return {"success": True, "executed": False}
+
+    trigger = await trigger_service.get_trigger(trigger_id)
+    if not trigger:
+        logger.warning(f"Trigger {trigger_id} not found for execution")
+        return {"success": False, "error": "Trigger not found"}
+
+    event = TriggerEvent(
+        trigger_id=trigger_id,
+        agent_id=trigger.agent_id,
+        trigger_type=TriggerType(trigger_type) if trigger_type else trigger.trigger_type,
+        raw_data=payload,
+        context=context or {},
+    )
+    execution_service = get_execution_service(db)
+    execution_result = await execution_service.execute_trigger_result(
+        agent_id=trigger.agent_id,
+        trigger_result=result,
+        trigger_event=event,
+    )
+    logger.debug(f"Agent execution result for trigger {trigger_id}: {execution_result}")
+    return {"success": True, "executed": True, "execution": execution_result}
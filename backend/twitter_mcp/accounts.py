@@ -168,6 +168,21 @@ class TwitterAccountService:
         
         return len(result.data) > 0
     
+    @staticmethod
+    def format_agent_social_account(account: Dict[str, Any]) -> Dict[str, Any]:
+        """Map an agent_social_accounts row to the account shape the Twitter tool expects"""
+        return {
+            "id": account["account_id"],
+            "name": account["account_name"],
+            "username": account["username"],
+            "description": account["description"],
+            "profile_image_url": account["profile_image_url"],
+            "followers_count": account["followers_count"],
+            "following_count": account["following_count"],
+            "tweet_count": account["tweet_count"],
+            "verified": account["verified"]
+        }
+    
     async def get_accounts_for_agent(self, user_id: str, agent_id: str) -> List[Dict[str, Any]]:
         """Get enabled Twitter accounts for a specific agent with MCP toggle filtering"""
         client = await self.db.client
@@ -211,19 +226,7 @@ class TwitterAccountService:
             "platform", "twitter"  
         ).eq("enabled", True).execute()
         
-        accounts = []
-        for account in result.data:
-            accounts.append({
-                "id": account["account_id"],
-                "name": account["account_name"],
-                "username": account["username"],
-                "description": account["description"],
-                "profile_image_url": account["profile_image_url"],
-                "followers_count": account["followers_count"],
-                "following_count": account["following_count"],
-                "tweet_count": account["tweet_count"],
-                "verified": account["verified"]
-            })
+        accounts = [self.format_agent_social_account(account) for account in result.data]
         
         logger.info(f"🔴 REAL-TIME RESULT: Found {len(accounts)} enabled Twitter accounts for agent {agent_id}")
         return accounts
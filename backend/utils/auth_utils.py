@@ -1,13 +1,24 @@
 import sentry
 from fastapi import HTTPException, Request, Header
 from typing import Optional
-import jwt
 from jwt.exceptions import PyJWTError
 from utils.logger import structlog
 from utils.config import config
 import os
 from services.supabase import DBConnection
 from services import redis
+from utils.jwt_verifier import verify_jwt
+
+_api_key_service = None
+
+
+def _get_api_key_service():
+    """Shared APIKeyService so its in-process validation cache survives across requests."""
+    global _api_key_service
+    if _api_key_service is None:
+        from services.api_keys import APIKeyService
+        _api_key_service = APIKeyService(DBConnection())
+    return _api_key_service
 
 async def _get_user_id_from_account_cached(account_id: str) -> Optional[str]:
     """
@@ -94,10 +105,8 @@ async def get_current_user_id_from_jwt(request: Request) -> str:
             
             public_key, secret_key = x_api_key.split(':', 1)
             
-            from services.api_keys import APIKeyService
-            db = DBConnection()
-            await db.initialize()
-            api_key_service = APIKeyService(db)
+            api_key_service = _get_api_key_service()
+            await api_key_service.db.initialize()
             
             validation_result = await api_key_service.validate_api_key(public_key, secret_key)
             
@@ -149,7 +158,7 @@ async def get_current_user_id_from_jwt(request: Request) -> str:
     token = auth_header.split(' ')[1]
     
     try:
-        payload = jwt.decode(token, options={"verify_signature": False})
+        payload = await verify_jwt(token)
         user_id = payload.get('sub')
         
         if not user_id:
@@ -254,8 +263,7 @@ async def get_user_id_from_stream_auth(
         # Try to get user_id from token in query param (for EventSource which can't set headers)
         if token:
             try:
-                # For Supabase JWT, we just need to decode and extract the user ID
-                payload = jwt.decode(token, options={"verify_signature": False})
+                payload = await verify_jwt(token)
                 user_id = payload.get('sub')
                 if user_id:
                     sentry.sentry.set_user({ "id": user_id })
@@ -369,8 +377,7 @@ async def get_optional_user_id(request: Request) -> Optional[str]:
     token = auth_header.split(' ')[1]
     
     try:
-        # For Supabase JWT, we just need to decode and extract the user ID
-        payload = jwt.decode(token, options={"verify_signature": False})
+        payload = await verify_jwt(token)
         
         # Supabase stores the user ID in the 'sub' claim
         user_id = payload.get('sub')
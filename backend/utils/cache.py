@@ -1,26 +1,339 @@
+"""
+Two-tier JSON cache.
+
+Lookups go through a small in-process LRU tier first and fall back to Redis,
+which remains the shared tier across API instances and workers. Writes and
+invalidations are broadcast over a Redis pub/sub channel so other instances
+drop their local copy instead of serving it until expiry.
+
+``get_or_load`` adds single-flight request coalescing (concurrent misses for
+the same key share one loader call) and stale-while-revalidate (an expired
+local value is served while one background refresh runs).
+
+Values are kept locally as their JSON text and decoded on every hit, so
+callers always get their own copy and can never mutate what the next caller
+(or a concurrent request) reads.
+"""
+
+import asyncio
+import copy
 import json
-from typing import Any
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
 from services.redis import get_client
+from utils.logger import logger
+
+KEY_PREFIX = "cache:"
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# The local tier trades a little freshness for zero-RTT reads; cap its TTL so
+# a missed invalidation message can never keep a value alive for long.
+LOCAL_MAX_SIZE = int(os.getenv("CACHE_LOCAL_MAX_SIZE", "5000"))
+LOCAL_TTL_CAP = int(os.getenv("CACHE_LOCAL_TTL_CAP", "30"))
+STALE_GRACE_SECONDS = int(os.getenv("CACHE_STALE_GRACE_SECONDS", "30"))
+
+_MISSING = object()
+
+
+class _NamespaceStats:
+    __slots__ = ("local_hits", "remote_hits", "misses", "stale_hits",
+                 "loads", "load_errors", "coalesced", "latency_ms")
+
+    def __init__(self):
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.latency_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.remote_hits + self.misses
+        hits = self.local_hits + self.remote_hits
+        return {
+            "local_hits": self.local_hits,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "coalesced": self.coalesced,
+            "hit_rate": f"{(hits / lookups * 100) if lookups else 0:.2f}%",
+            "avg_latency_ms": round(self.latency_ms / lookups, 3) if lookups else 0.0,
+        }
+
+
+class _LocalTier:
+    """Bounded LRU of (json_text, fresh_until, stale_until) tuples; hits return a freshly decoded value."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+
+    def get(self, key: str, allow_stale: bool = False) -> Tuple[Any, bool]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING, False
+        raw, fresh_until, stale_until = entry
+        now = time.monotonic()
+        if now <= fresh_until:
+            self._entries.move_to_end(key)
+            return json.loads(raw), False
+        if now > stale_until:
+            del self._entries[key]
+            return _MISSING, False
+        if allow_stale:
+            return json.loads(raw), True
+        return _MISSING, False
+
+    def set(self, key: str, raw: Any, ttl: float, stale_ttl: float = 0):
+        """Store ``raw``, the JSON encoding (str or bytes) of the value."""
+        now = time.monotonic()
+        self._entries[key] = (raw, now + ttl, now + ttl + stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def extend_stale(self, key: str, stale_ttl: float):
+        """Give an existing entry a stale window without changing when it stops being fresh."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            raw, fresh_until, _ = entry
+            self._entries[key] = (raw, fresh_until, fresh_until + stale_ttl)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
 
 
 class _cache:
+    def __init__(self):
+        self._local = _LocalTier(LOCAL_MAX_SIZE)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: set = set()
+        self._stats: Dict[str, _NamespaceStats] = {}
+        self._instance_id = uuid.uuid4().hex[:12]
+        self._listener_task: Optional[asyncio.Task] = None
+
+    # -- helpers -----------------------------------------------------------
+
+    def _ns(self, key: str) -> _NamespaceStats:
+        namespace = key.split(":", 1)[0]
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = _NamespaceStats()
+        return stats
+
+    @staticmethod
+    def _local_ttl(ttl: int) -> float:
+        return min(ttl, LOCAL_TTL_CAP)
+
+    async def _publish_invalidation(self, key: str):
+        try:
+            redis = await get_client()
+            await redis.publish(INVALIDATION_CHANNEL, json.dumps({"key": key, "origin": self._instance_id}))
+        except Exception as e:
+            logger.warning(f"Failed to publish cache invalidation for {key}: {e}")
+
+    def _ensure_listener(self):
+        task = self._listener_task
+        if task is not None and not task.done():
+            return
+        try:
+            self._listener_task = asyncio.get_running_loop().create_task(self._listen_for_invalidations())
+        except RuntimeError:
+            pass
+
+    async def _listen_for_invalidations(self):
+        while True:
+            pubsub = None
+            try:
+                redis = await get_client()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything cached before we were subscribed may have missed a message.
+                self._local.clear()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get("origin") != self._instance_id:
+                        self._local.delete(payload.get("key", ""))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error, resubscribing: {e}")
+                self._local.clear()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    # -- public API --------------------------------------------------------
+
+    async def start(self):
+        """Start the cross-instance invalidation listener."""
+        self._ensure_listener()
+
+    async def close(self):
+        """Stop the invalidation listener and drop the local tier."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+        self._local.clear()
+
     async def get(self, key: str):
-        redis = await get_client()
-        key = f"cache:{key}"
-        result = await redis.get(key)
-        if result:
-            return json.loads(result)
-        return None
+        self._ensure_listener()
+        stats = self._ns(key)
+        start = time.perf_counter()
+        try:
+            value, _ = self._local.get(key)
+            if value is not _MISSING:
+                stats.local_hits += 1
+                return value
+
+            redis = await get_client()
+            pipe = redis.pipeline(transaction=False)
+            pipe.get(f"{KEY_PREFIX}{key}")
+            pipe.ttl(f"{KEY_PREFIX}{key}")
+            result, remaining = await pipe.execute()
+            if result:
+                value = json.loads(result)
+                if remaining and remaining > 0:
+                    self._local.set(key, result, self._local_ttl(remaining))
+                stats.remote_hits += 1
+                return value
+            stats.misses += 1
+            return None
+        finally:
+            stats.latency_ms += (time.perf_counter() - start) * 1000
 
     async def set(self, key: str, value: Any, ttl: int = 15 * 60):
+        self._ensure_listener()
+        raw = json.dumps(value)
         redis = await get_client()
-        key = f"cache:{key}"
-        await redis.set(key, json.dumps(value), ex=ttl)
+        await redis.set(f"{KEY_PREFIX}{key}", raw, ex=ttl)
+        self._local.set(key, raw, self._local_ttl(ttl))
+        await self._publish_invalidation(key)
 
     async def invalidate(self, key: str):
+        self._local.delete(key)
         redis = await get_client()
-        key = f"cache:{key}"
-        await redis.delete(key)
+        await redis.delete(f"{KEY_PREFIX}{key}")
+        await self._publish_invalidation(key)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 15 * 60,
+        stale_ttl: int = STALE_GRACE_SECONDS,
+    ):
+        """
+        Return the cached value for ``key`` or compute it with ``loader``.
+
+        Concurrent misses for the same key on this instance share a single
+        loader call. A locally expired value within ``stale_ttl`` is returned
+        immediately while one background refresh repopulates both tiers.
+        ``None`` results are not cached, matching ``get`` semantics.
+        """
+        self._ensure_listener()
+        stats = self._ns(key)
+
+        value, is_stale = self._local.get(key, allow_stale=True)
+        if value is not _MISSING:
+            stats.local_hits += 1
+            if is_stale:
+                stats.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    asyncio.create_task(self._refresh(key, loader, ttl, stale_ttl))
+            return value
+
+        try:
+            value = await self.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            value = None
+        if value is not None:
+            # get() already stored it locally for the key's remaining Redis TTL; add the stale window.
+            self._local.extend_stale(key, stale_ttl)
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats.coalesced += 1
+            # The loading caller gets the original; every waiter gets its own copy
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader, ttl, stale_ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited future doesn't warn.
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _load(self, key: str, loader, ttl: int, stale_ttl: int):
+        stats = self._ns(key)
+        stats.loads += 1
+        try:
+            value = await loader()
+        except Exception:
+            stats.load_errors += 1
+            raise
+        if value is not None:
+            try:
+                await self.set(key, value, ttl=ttl)
+            except Exception as e:
+                logger.warning(f"Cache write failed for {key}: {e}")
+            try:
+                self._local.set(key, json.dumps(value), self._local_ttl(ttl), stale_ttl)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Value for {key} is not JSON serializable, not caching locally: {e}")
+        return value
+
+    async def _refresh(self, key: str, loader, ttl: int, stale_ttl: int):
+        try:
+            await self._load(key, loader, ttl, stale_ttl)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/latency counters per key namespace (the part before the first ':')."""
+        return {
+            "local_size": len(self._local),
+            "namespaces": {ns: s.as_dict() for ns, s in sorted(self._stats.items())},
+        }
 
 
 Cache = _cache()
@@ -210,6 +210,25 @@ class Configuration:
     OR_SITE_URL: Optional[str] = "https://rzvi.ai"
     OR_APP_NAME: Optional[str] = "Rzvi AI"    
     
+    # LLM routing across equivalent deployments (see services/llm_router.py)
+    LLM_ROUTING_ENABLED: bool = True
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: int = 90
+
+    # Knowledge base retrieval (see knowledge_base/retrieval.py)
+    KB_RETRIEVAL_MAX_TOKENS: int = 4000
+    KB_EMBEDDING_MODEL: Optional[str] = None
+
+    # Per-trigger webhook deliveries accepted per minute (0 disables the limit)
+    TRIGGER_WEBHOOK_RATE_LIMIT_PER_MINUTE: int = 60
+
+    # Fire schedule triggers from the API process (leader-elected) instead of Supabase Cron
+    SCHEDULE_DISPATCHER_ENABLED: bool = False
+
+    # Browser tool screenshots: capture format in the sandbox ("jpeg" or "png") and JPEG quality
+    BROWSER_SCREENSHOT_FORMAT: str = "jpeg"
+    BROWSER_SCREENSHOT_QUALITY: int = 70
+
     # AWS Bedrock credentials
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
@@ -221,6 +240,7 @@ class Configuration:
     SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_ROLE_KEY: str
+    SUPABASE_JWT_SECRET: Optional[str] = None
     
     # Redis configuration
     REDIS_HOST: str
@@ -239,6 +259,9 @@ class Configuration:
     CLOUDFLARE_API_TOKEN: Optional[str] = None
     FIRECRAWL_API_KEY: str
     FIRECRAWL_URL: Optional[str] = "https://api.firecrawl.dev"
+    # How long scraped pages and search results are reused across agents (seconds, 0 disables)
+    WEB_SCRAPE_CACHE_TTL: int = 60 * 60
+    WEB_SEARCH_CACHE_TTL: int = 15 * 60
     
     # Stripe configuration
     STRIPE_SECRET_KEY: Optional[str] = None
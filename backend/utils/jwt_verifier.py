@@ -0,0 +1,169 @@
+"""
+Supabase JWT signature verification with cached keys and verified-claims memoization.
+
+Symmetric (HS256) tokens are verified with ``SUPABASE_JWT_SECRET``. Asymmetric
+tokens (RS256/ES256) are verified against the project's JWKS, fetched once and
+refreshed only when an unknown ``kid`` shows up (and at most every
+``JWKS_MIN_REFRESH_SECONDS``). Verified claims are memoized in a bounded LRU
+keyed by the token digest until the token expires, so repeat requests with the
+same bearer token cost a hash and a dict lookup.
+
+Every token must carry ``exp``, including the HS256 tokens the backend mints
+for its own tools (``create_user_jwt``).
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from jwt import PyJWK
+from jwt.exceptions import PyJWTError, InvalidTokenError
+
+from utils.config import config, EnvMode
+from utils.logger import logger
+
+JWKS_MIN_REFRESH_SECONDS = 60
+CLAIMS_CACHE_MAX_SIZE = 10_000
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"}
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+# Tool tokens are minted once per agent run and reused for its whole duration
+TOOL_JWT_TTL_SECONDS = 6 * 60 * 60
+
+
+class JWTVerifier:
+    def __init__(self, jwks_url: Optional[str], secret: Optional[str], allow_unverified: bool = False):
+        self.jwks_url = jwks_url
+        self.secret = secret
+        self.allow_unverified = allow_unverified
+        self._keys: Dict[str, PyJWK] = {}
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = asyncio.Lock()
+        self._claims: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._warned_unverified = False
+
+    async def _refresh_jwks(self):
+        if not self.jwks_url:
+            return
+        async with self._jwks_lock:
+            if time.monotonic() - self._jwks_fetched_at < JWKS_MIN_REFRESH_SECONDS:
+                return
+            self._jwks_fetched_at = time.monotonic()
+            import httpx
+            try:
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                    keys = response.json().get("keys", [])
+            except Exception as e:
+                logger.warning(f"Failed to fetch JWKS from {self.jwks_url}: {e}")
+                return
+            parsed = {}
+            for key_data in keys:
+                try:
+                    parsed[key_data.get("kid", "")] = PyJWK(key_data)
+                except PyJWTError as e:
+                    logger.warning(f"Skipping unusable JWK {key_data.get('kid')}: {e}")
+            self._keys = parsed
+
+    async def _signing_key(self, kid: str):
+        key = self._keys.get(kid)
+        if key is None:
+            await self._refresh_jwks()
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError(f"Unknown signing key: {kid}")
+        return key.key
+
+    def _cache_get(self, digest: str) -> Optional[Dict[str, Any]]:
+        entry = self._claims.get(digest)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._claims[digest]
+            return None
+        self._claims.move_to_end(digest)
+        return claims
+
+    def _cache_put(self, digest: str, claims: Dict[str, Any]):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        self._claims[digest] = (claims, float(exp))
+        if len(self._claims) > CLAIMS_CACHE_MAX_SIZE:
+            self._claims.popitem(last=False)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a JWT and return its claims.
+
+        Raises:
+            PyJWTError: If the token is malformed, expired or its signature is invalid
+        """
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        cached = self._cache_get(digest)
+        if cached is not None:
+            return cached
+
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+        options = {"verify_aud": False, "require": ["exp", "sub"]}
+
+        if alg in ASYMMETRIC_ALGORITHMS:
+            key = await self._signing_key(header.get("kid", ""))
+            claims = jwt.decode(token, key, algorithms=[alg], options=options)
+        elif alg in SYMMETRIC_ALGORITHMS and self.secret:
+            claims = jwt.decode(token, self.secret, algorithms=[alg], options=options)
+        elif alg in SYMMETRIC_ALGORITHMS and self.allow_unverified:
+            if not self._warned_unverified:
+                logger.warning("SUPABASE_JWT_SECRET is not set; accepting HS256 tokens without signature verification (local mode only)")
+                self._warned_unverified = True
+            claims = jwt.decode(token, options={**options, "verify_signature": False})
+        else:
+            raise InvalidTokenError(f"Cannot verify token signed with {alg}")
+
+        self._cache_put(digest, claims)
+        return claims
+
+
+_verifier: Optional[JWTVerifier] = None
+
+
+def get_jwt_verifier() -> JWTVerifier:
+    global _verifier
+    if _verifier is None:
+        jwks_url = f"{config.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if config.SUPABASE_URL else None
+        _verifier = JWTVerifier(
+            jwks_url=jwks_url,
+            secret=config.SUPABASE_JWT_SECRET,
+            allow_unverified=config.ENV_MODE == EnvMode.LOCAL,
+        )
+    return _verifier
+
+
+async def verify_jwt(token: str) -> Dict[str, Any]:
+    return await get_jwt_verifier().verify(token)
+
+
+def validate_jwt_config():
+    """Fail at startup instead of rejecting every HS256 login at request time."""
+    if not config.SUPABASE_JWT_SECRET and config.ENV_MODE != EnvMode.LOCAL:
+        raise RuntimeError("SUPABASE_JWT_SECRET must be set outside local mode to verify HS256 tokens")
+
+
+def create_user_jwt(user_id: str, ttl: int = TOOL_JWT_TTL_SECONDS) -> Optional[str]:
+    """HS256 token for ``user_id`` that the backend's own tools send to its API; None without a secret."""
+    if not config.SUPABASE_JWT_SECRET or not user_id:
+        return None
+    now = int(time.time())
+    payload = {
+        "sub": user_id,
+        "user_id": user_id,
+        "role": "authenticated",
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(payload, config.SUPABASE_JWT_SECRET, algorithm="HS256")